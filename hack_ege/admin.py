@@ -4,8 +4,7 @@ from django.utils.html import format_html
 from django.urls import path
 from django.shortcuts import render
 from django.contrib.auth import get_user_model
-from django.contrib import messages
-from django.http import HttpResponseRedirect
+from users.admin import bulk_create_view
 
 User = get_user_model()
 
@@ -33,43 +32,6 @@ class CustomAdminSite(AdminSite):
         return render(request, 'admin/statistics.html', context)
     
     def bulk_create_view(self, request):
-        if request.method == 'POST':
-            users_data = request.POST.get('users_data', '')
-            role = request.POST.get('role', 'student')
-            
-            if users_data:
-                users_list = [line.strip() for line in users_data.split('\n') if line.strip()]
-                created_count = 0
-                
-                for user_data in users_list:
-                    try:
-                        last_name, first_name = user_data.split(' ', 1)
-                        username = f"{last_name.lower()}_{first_name.lower().replace(' ', '_')}"
-                        
-                        # Проверяем уникальность логина
-                        counter = 1
-                        original_username = username
-                        while User.objects.filter(username=username).exists():
-                            username = f"{original_username}{counter}"
-                            counter += 1
-                        
-                        User.objects.create_user(
-                            username=username,
-                            first_name=first_name,
-                            last_name=last_name,
-                            role=role,
-                            created_by=request.user,
-                            password=f"{role}_psw"
-                        )
-                        created_count += 1
-                    except ValueError:
-                        messages.error(request, f'Неверный формат данных: {user_data}')
-                        continue
-                
-                if created_count > 0:
-                    messages.success(request, f'Успешно создано {created_count} пользователей')
-                    return HttpResponseRedirect('..')
-        
-        return render(request, 'admin/bulk_create.html')
+        return bulk_create_view(request, self.each_context(request))
 
 admin_site = CustomAdminSite(name='custom_admin')
@@ -49,7 +49,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'users.middleware.ThrottledSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -105,7 +105,17 @@ SESSION_COOKIE_AGE = 3600  # 1 hour
 SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
-SESSION_SAVE_EVERY_REQUEST = True
+SESSION_SAVE_EVERY_REQUEST = False
+# Неизмененная сессия продлевается не чаще раза в интервал (секунд), см. users.middleware
+SESSION_REFRESH_INTERVAL = 300
+# Сводка ученика для статистики варианта при автосохранении ответов обновляется
+# не чаще раза в интервал (секунд), см. VariantExecution.refresh_progress_stats
+STATS_REFRESH_INTERVAL = 10
+# Сколько запросов long-poll статистики одновременно ждут изменений в процессе
+# (меньше числа потоков сервера), см. variants.monitoring
+LONG_POLL_MAX_WAITERS = 4
+# При общем кэше (Redis, Memcached) сессии можно читать из кэша:
+# SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 
 # Messages configuration
 MESSAGE_TAGS = {
@@ -141,12 +151,21 @@ AUTH_PASSWORD_VALIDATORS = [
 
 # Password hashers
 PASSWORD_HASHERS = [
-    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'users.hashers.ConfiguredPBKDF2PasswordHasher',
     'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
     'django.contrib.auth.hashers.Argon2PasswordHasher',
     'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
 ]
 
+# Итерации PBKDF2-SHA256 (не меньше значения Django по умолчанию);
+# более слабые хеши пересчитываются при входе
+PASSWORD_HASH_ITERATIONS = 1000000
+
+# Очередь входа (users.login_admission): одновременных проверок пароля
+# (None - по числу процессоров без одного) и ожидание в очереди, секунд
+LOGIN_HASH_SLOTS = None
+LOGIN_QUEUE_TIMEOUT = 30
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -232,5 +251,10 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'users': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': True,
+        },
     },
 }
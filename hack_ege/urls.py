@@ -16,7 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.contrib.auth import views as auth_views
+from users import views as users_views
 from django.shortcuts import redirect
 from django.conf import settings
 from django.conf.urls.static import static
@@ -31,7 +31,7 @@ urlpatterns = [
     path('users/', include('users.urls')),
     path('tasks/', include('tasks.urls')),
     path('variants/', include('variants.urls')),
-    path('login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
+    path('login/', users_views.LoginView.as_view(), name='login'),
 ]
 
 if settings.DEBUG:
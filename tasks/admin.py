@@ -23,4 +23,14 @@ class TaskAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         if not change:  # Если это создание нового объекта
             obj.created_by = request.user
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
+        
+        # Изменение правильного ответа требует перепроверки завершенных выполнений
+        if change and Task.GRADING_FIELDS & set(form.changed_data):
+            from variants.regrade import regrade_task_executions
+            processed_count, changed_count = regrade_task_executions(obj)
+            if processed_count:
+                self.message_user(
+                    request,
+                    f'Перепроверено выполнений: {processed_count}, изменился результат: {changed_count}'
+                )
\ No newline at end of file
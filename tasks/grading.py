@@ -0,0 +1,206 @@
+"""Проверка ответов на задания.
+
+Для каждого типа (и при необходимости подтипа) задания выбирается способ
+сравнения ответа ученика с правильным ответом. Правильный ответ приводится
+к нормализованному ключу один раз и кешируется, ответ ученика нормализуется
+тем же способом и сравнивается с ключом.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+# Запятая между цифрами - десятичный разделитель (2,5), а не граница значений
+TOKEN_SEPARATORS_RE = re.compile(r'(?:\s|;|(?<!\d),|,(?!\d))+')
+NUMBER_RE = re.compile(r'^[+-]?\d+(?:[.,]\d+)?$')
+
+
+def _parse_number(value):
+    """Преобразовать строку в число или вернуть None"""
+    if not NUMBER_RE.match(value):
+        return None
+    try:
+        return Decimal(value.replace(',', '.'))
+    except InvalidOperation:
+        return None
+
+
+def _normalize_token(token):
+    """Нормализовать отдельное значение ответа: число или строка без учета регистра"""
+    number = _parse_number(token)
+    if number is not None:
+        return number
+    return token.casefold()
+
+
+def _split_tokens(value):
+    """Разбить ответ на значения по пробелам, переносам строк, запятым (кроме десятичных) и точкам с запятой"""
+    return [token for token in TOKEN_SEPARATORS_RE.split(value.strip()) if token]
+
+
+COMPARATORS = {}
+
+
+def register_comparator(comparator_class):
+    """Зарегистрировать способ сравнения под его именем (декоратор класса)"""
+    if comparator_class.name in COMPARATORS:
+        # Ключи ответов, скомпилированные прежним способом, больше не годятся
+        compile_answer_key.cache_clear()
+    COMPARATORS[comparator_class.name] = comparator_class()
+    return comparator_class
+
+
+class Comparator:
+    """Базовый способ сравнения ответов.
+
+    Наследники реализуют normalize(), возвращающий хешируемый ключ;
+    ответ считается правильным, если ключи совпадают.
+    """
+    name = None
+
+    def normalize(self, value):
+        raise NotImplementedError
+
+    def is_correct(self, user_answer, answer_key):
+        if answer_key is None or user_answer is None:
+            return False
+        normalized = self.normalize(str(user_answer))
+        if normalized is None:
+            return False
+        return normalized == answer_key
+
+
+@register_comparator
+class CaseFoldComparator(Comparator):
+    """Строка без учета регистра и лишних пробелов"""
+    name = 'casefold'
+
+    def normalize(self, value):
+        normalized = ' '.join(value.split()).casefold()
+        return normalized or None
+
+
+@register_comparator
+class NumericComparator(Comparator):
+    """Одно число (допускается десятичная запятая); нечисловые ответы сравниваются как строки"""
+    name = 'numeric'
+
+    def normalize(self, value):
+        value = value.strip()
+        if not value:
+            return None
+        number = _parse_number(value)
+        if number is not None:
+            return number
+        return ' '.join(value.split()).casefold()
+
+
+@register_comparator
+class TokenListComparator(Comparator):
+    """Последовательность значений в заданном порядке (например, «87 184328»)"""
+    name = 'token_list'
+
+    def normalize(self, value):
+        tokens = tuple(_normalize_token(token) for token in _split_tokens(value))
+        return tokens or None
+
+
+@register_comparator
+class UnorderedSetComparator(Comparator):
+    """Набор значений, порядок которых не важен"""
+    name = 'unordered_set'
+
+    def normalize(self, value):
+        tokens = [_normalize_token(token) for token in _split_tokens(value)]
+        if not tokens:
+            return None
+        return tuple(sorted(tokens, key=lambda token: (isinstance(token, str), str(token))))
+
+
+DEFAULT_COMPARATOR = 'token_list'
+
+# Способ сравнения по типу задания
+TASK_TYPE_COMPARATORS = {
+    '1': 'numeric',
+    '2': 'casefold',
+    '3': 'numeric',
+    '4': 'numeric',
+    '5': 'numeric',
+    '6': 'numeric',
+    '7': 'numeric',
+    '8': 'numeric',
+    '9': 'numeric',
+    '10': 'numeric',
+    '11': 'numeric',
+    '12': 'numeric',
+    '13': 'numeric',
+    '14': 'casefold',
+    '15': 'numeric',
+    '16': 'numeric',
+    '17': 'token_list',
+    '18': 'token_list',
+    '19-21': 'token_list',
+    '1921': 'token_list',
+    '22': 'numeric',
+    '23': 'numeric',
+    '24': 'token_list',
+    '25': 'token_list',
+    '26': 'token_list',
+    '27': 'token_list',
+}
+
+# Уточнения по подтипу (имеют приоритет над типом)
+SUBTYPE_COMPARATORS = {
+    # В задании 20 значения записываются в порядке возрастания
+    '20': 'token_list',
+}
+
+
+def get_comparator(task_type, subtype=None):
+    """Получить способ сравнения для типа и подтипа задания"""
+    name = SUBTYPE_COMPARATORS.get(subtype) or TASK_TYPE_COMPARATORS.get(task_type) or DEFAULT_COMPARATOR
+    return COMPARATORS[name]
+
+
+@lru_cache(maxsize=8192)
+def compile_answer_key(task_type, subtype, correct_answer):
+    """Нормализованный ключ правильного ответа (вычисляется один раз для задания)"""
+    return get_comparator(task_type, subtype).normalize(correct_answer or '')
+
+
+def check_answer(task_type, subtype, correct_answer, user_answer):
+    """Проверить ответ ученика на задание"""
+    comparator = get_comparator(task_type, subtype)
+    answer_key = compile_answer_key(task_type, subtype, correct_answer)
+    return comparator.is_correct(user_answer, answer_key)
+
+
+def bulk_grade(task_keys, answers_list):
+    """Проверить ответы сразу многих выполнений.
+
+    task_keys - список (task_id, task_type, subtype, correct_answer) в порядке заданий,
+    answers_list - итерируемый набор словарей ответов {str(task_id): ответ}.
+    Возвращает список строк правильности ('1' - верно, '0' - неверно) для каждого
+    набора ответов. Ключи заданий компилируются один раз, одинаковые ответы
+    на одно задание нормализуются один раз на весь набор.
+    """
+    columns = []
+    for task_id, task_type, subtype, correct_answer in task_keys:
+        columns.append((
+            str(task_id),
+            get_comparator(task_type, subtype),
+            compile_answer_key(task_type, subtype, correct_answer),
+            {},
+        ))
+
+    grade_maps = []
+    for answers in answers_list:
+        bits = []
+        for task_id, comparator, answer_key, memo in columns:
+            user_answer = (answers or {}).get(task_id)
+            user_answer = '' if user_answer is None else str(user_answer)
+            is_correct = memo.get(user_answer)
+            if is_correct is None:
+                is_correct = memo[user_answer] = comparator.is_correct(user_answer, answer_key)
+            bits.append('1' if is_correct else '0')
+        grade_maps.append(''.join(bits))
+    return grade_maps
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from .grading import check_answer
 import uuid
 
 User = get_user_model()
@@ -103,6 +104,9 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
 
+    # Поля, от которых зависит результат проверки ответов
+    GRADING_FIELDS = {'correct_answer', 'task_type', 'subtype'}
+
     class Meta:
         verbose_name = 'Задание'
         verbose_name_plural = 'Задания'
@@ -123,6 +127,10 @@ class Task(models.Model):
                 return choice_display
         return self.subtype
 
+    def check_answer(self, user_answer):
+        """Проверяет ответ ученика с учетом типа задания"""
+        return check_answer(self.task_type, self.subtype, self.correct_answer, user_answer)
+
 
 class ImportSession(models.Model):
     """Сессия импорта заданий из JSON файла"""
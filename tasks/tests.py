@@ -1,3 +1,69 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
+from .grading import check_answer, bulk_grade, compile_answer_key
 
-# Create your tests here.
+
+class AnswerGradingTest(SimpleTestCase):
+    def test_token_list_ignores_separators(self):
+        self.assertTrue(check_answer('17', '17', '87 184328', '87   184328'))
+        self.assertTrue(check_answer('17', '17', '87 184328', '87, 184328'))
+        self.assertTrue(check_answer('17', '17', '87 184328', '87;184328'))
+        # Запятая между цифрами - десятичная, а не разделитель
+        self.assertFalse(check_answer('17', '17', '87 184328', '87,184328'))
+        self.assertTrue(check_answer('27', '27', '2.5 3', '2,5 3'))
+        self.assertTrue(check_answer('17', '17', '87 184328', ' 87\n184328 '))
+        self.assertFalse(check_answer('17', '17', '87 184328', '184328 87'))
+
+    def test_game_theory_answers(self):
+        key = '31\n29 30\n28'
+        self.assertTrue(check_answer('1921', '19_21_1', key, '31 29 30 28'))
+        self.assertFalse(check_answer('1921', '19_21_1', key, '31 29 28'))
+        # В задании 20 порядок значений важен (по возрастанию)
+        self.assertTrue(check_answer('19-21', '20', '29 30', '29 30'))
+        self.assertFalse(check_answer('19-21', '20', '29 30', '30 29'))
+
+    def test_numeric(self):
+        self.assertTrue(check_answer('11', '11', '2.5', '2,5'))
+        self.assertTrue(check_answer('11', '11', '10', '10.0'))
+        self.assertFalse(check_answer('11', '11', '10', '100'))
+
+    def test_case_fold(self):
+        self.assertTrue(check_answer('2', '2', 'zxyw', ' ZXYW '))
+        self.assertFalse(check_answer('2', '2', 'zxyw', 'zxwy'))
+
+    def test_empty_answer_is_wrong(self):
+        self.assertFalse(check_answer('1', '1', '42', ''))
+        self.assertFalse(check_answer('17', '17', '87 184328', '   '))
+        self.assertFalse(check_answer('1', '1', '42', None))
+
+    def test_key_is_compiled_once(self):
+        compile_answer_key.cache_clear()
+        check_answer('17', '17', '1 2', '1 2')
+        check_answer('17', '17', '1 2', '2 1')
+        self.assertEqual(compile_answer_key.cache_info().misses, 1)
+
+    def test_bulk_grade(self):
+        task_keys = [(1, '1', '1', '42'), (2, '17', '17', '87 184328')]
+        grade_maps = bulk_grade(task_keys, [
+            {'1': '42', '2': '87 184328'},
+            {'1': '41'},
+            {},
+            {'1': 42, '2': '87, 184328'},
+        ])
+        self.assertEqual(grade_maps, ['11', '00', '00', '11'])
+
+    def test_registered_comparator_replaces_builtin(self):
+        from unittest import mock
+        from . import grading
+        with mock.patch.dict(grading.COMPARATORS):
+            self.assertTrue(check_answer('2', '2', 'zxyw', 'ZXYW'))
+            
+            @grading.register_comparator
+            class CaseSensitiveComparator(grading.Comparator):
+                name = 'casefold'
+                
+                def normalize(self, value):
+                    return value.strip() or None
+            
+            self.assertFalse(check_answer('2', '2', 'zxyw', 'ZXYW'))
+        compile_answer_key.cache_clear()
+        self.assertTrue(check_answer('2', '2', 'zxyw', 'ZXYW'))
@@ -123,8 +123,18 @@ def edit_task(request, task_id):
     if request.method == 'POST':
         form = TaskForm(request.POST, request.FILES, instance=task)
         if form.is_valid():
-            form.save()
+            task = form.save()
             messages.success(request, 'Задание успешно обновлено')
+            
+            # Если изменился правильный ответ (или способ проверки), перепроверяем выполнения
+            if Task.GRADING_FIELDS & set(form.changed_data):
+                from variants.regrade import regrade_task_executions
+                processed_count, changed_count = regrade_task_executions(task)
+                if processed_count:
+                    messages.info(
+                        request,
+                        f'Перепроверено выполнений: {processed_count}, изменился результат: {changed_count}'
+                    )
             return redirect('task_list')
     else:
         form = TaskForm(instance=task)
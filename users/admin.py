@@ -4,8 +4,35 @@ from django.utils.html import format_html
 from django.urls import path
 from django.shortcuts import render
 from django.contrib import messages
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse
 from .models import User, Group, UserGroup
+from .enrollment import enroll_from_csv, write_credentials_sheet
+from .forms import BulkEnrollmentForm
+
+
+def bulk_create_view(request, context):
+    """Массовое создание пользователей из CSV с выдачей листа учетных данных"""
+    if request.method == 'POST':
+        form = BulkEnrollmentForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                # Каждая порция сохраняется своей транзакцией, пароли хешируются вне ее
+                sheet, created_count = enroll_from_csv(form.cleaned_data['csv_file'], request.user)
+            except UnicodeDecodeError:
+                messages.error(request, 'Файл должен быть в кодировке UTF-8')
+            else:
+                if created_count:
+                    response = HttpResponse(content_type='text/csv; charset=utf-8')
+                    response['Content-Disposition'] = 'attachment; filename="credentials.csv"'
+                    write_credentials_sheet(sheet, response)
+                    return response
+                messages.error(request, 'Ни одного пользователя не создано: проверьте формат файла')
+    else:
+        form = BulkEnrollmentForm()
+    
+    context.update({'title': 'Массовое создание пользователей', 'form': form})
+    return render(request, 'admin/bulk_create.html', context)
+
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -37,44 +64,7 @@ class UserAdmin(BaseUserAdmin):
         return custom_urls + urls
     
     def bulk_create_view(self, request):
-        if request.method == 'POST':
-            users_data = request.POST.get('users_data', '')
-            role = request.POST.get('role', 'student')
-            
-            if users_data:
-                users_list = [line.strip() for line in users_data.split('\n') if line.strip()]
-                created_count = 0
-                
-                for user_data in users_list:
-                    try:
-                        last_name, first_name = user_data.split(' ', 1)
-                        username = f"{last_name.lower()}_{first_name.lower().replace(' ', '_')}"
-                        
-                        # Проверяем уникальность логина
-                        counter = 1
-                        original_username = username
-                        while User.objects.filter(username=username).exists():
-                            username = f"{original_username}{counter}"
-                            counter += 1
-                        
-                        User.objects.create_user(
-                            username=username,
-                            first_name=first_name,
-                            last_name=last_name,
-                            role=role,
-                            created_by=request.user,
-                            password=f"{role}_psw"
-                        )
-                        created_count += 1
-                    except ValueError:
-                        messages.error(request, f'Неверный формат данных: {user_data}')
-                        continue
-                
-                if created_count > 0:
-                    messages.success(request, f'Успешно создано {created_count} пользователей')
-                    return HttpResponseRedirect('..')
-        
-        return render(request, 'admin/bulk_create.html')
+        return bulk_create_view(request, self.admin_site.each_context(request))
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
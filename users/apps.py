@@ -5,3 +5,7 @@ class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
     verbose_name = 'Управление пользователями'
+    
+    def ready(self):
+        # Подключаем обработчики сигналов (сброс кеша панели групп)
+        from . import signals
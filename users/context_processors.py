@@ -1,16 +1,18 @@
-from .views import get_user_groups
+from django.utils.functional import SimpleLazyObject
+
+from .sidebar import get_group_sidebar
 
 
 def user_groups_context(request):
-    """Контекстный процессор для добавления групп пользователя в каждый шаблон"""
+    """Контекстный процессор для меню групп пользователя в навигации (users/base.html).
+
+    Группы загружаются (из кеша или БД) только при отрисовке меню.
+    """
     if request.user.is_authenticated and request.user.role in ['admin', 'teacher']:
+        user = request.user
         return {
-            'user_groups': get_user_groups(request.user),
+            'user_groups': SimpleLazyObject(lambda: get_group_sidebar(user)),
         }
     return {
         'user_groups': [],
     }
-
-
-
-
@@ -0,0 +1,301 @@
+"""Массовое создание пользователей.
+
+Логины вида <роль><номер> выделяются одним запросом максимального номера,
+пароли хешируются в пуле процессов (PBKDF2 занимает основное время)
+до начала транзакции, пользователи вставляются одним bulk_create в короткой
+транзакции. Время каждого этапа записывается в журнал и возвращается
+вместе с результатом.
+
+Загрузка из CSV (фамилия, имя, роль, группа) читает файл потоком
+и создает пользователей и членство в группах порциями: каждая порция
+сохраняется своей транзакцией, поэтому блокировка записи в БД не держится
+во время хеширования и другие запросы (автосохранение ответов, вход)
+не ждут всю загрузку.
+"""
+import csv
+import io
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+
+from django.contrib.auth.hashers import get_hasher
+from django.db import IntegrityError, transaction
+from django.db.models import IntegerField, Max
+from django.db.models.functions import Cast, Substr
+from django.utils.crypto import get_random_string
+
+from .models import User, Group, UserGroup
+from .sidebar import invalidate_group_sidebar
+
+logger = logging.getLogger(__name__)
+
+# Меньше этого количества паролей хешируются в текущем процессе:
+# запуск пула обходится дороже
+HASH_POOL_MIN_PASSWORDS = 8
+
+# Количество процессов для хеширования (None - по числу процессоров)
+HASH_POOL_WORKERS = None
+
+# Сколько раз повторить выделение логинов, если их одновременно занял другой запрос
+USERNAME_ALLOCATION_ATTEMPTS = 3
+
+# Размер порции строк CSV при массовой загрузке
+ENROLLMENT_CHUNK_SIZE = 500
+
+# Случайные пароли для листа учетных данных (без похожих символов)
+GENERATED_PASSWORD_LENGTH = 8
+GENERATED_PASSWORD_CHARS = 'abcdefghjkmnpqrstuvwxyz23456789'
+
+# Роли, которые можно создать загрузкой: значение или название роли
+ENROLLMENT_ROLES = {
+    'student': 'student',
+    'ученик': 'student',
+    'teacher': 'teacher',
+    'учитель': 'teacher',
+}
+
+# Заголовки листа учетных данных
+CREDENTIALS_HEADER = ['Строка', 'Фамилия', 'Имя', 'Роль', 'Группа', 'Логин', 'Пароль', 'Ошибка']
+
+
+class EnrollmentResult:
+    """Результат массового создания: пользователи, пароли и время этапов"""
+
+    def __init__(self):
+        self.users = []
+        self.passwords = {}  # {username: пароль}
+        self.timings = {}  # {этап: секунд}
+
+    def get_timings_display(self):
+        """Время этапов для сообщений и журнала"""
+        return ', '.join(f'{phase}: {seconds:.2f} с' for phase, seconds in self.timings.items())
+
+
+def get_default_password(role):
+    """Начальный пароль пользователя с ролью"""
+    return f'{role}_psw'
+
+
+def generate_passwords(count):
+    """Случайные начальные пароли"""
+    return [get_random_string(GENERATED_PASSWORD_LENGTH, GENERATED_PASSWORD_CHARS) for _ in range(count)]
+
+
+def allocate_usernames(prefix, count):
+    """Свободные логины <prefix>N, N после максимального занятого номера (один запрос)"""
+    max_suffix = User.objects.filter(username__regex=rf'^{re.escape(prefix)}[0-9]+$').aggregate(
+        max_suffix=Max(Cast(Substr('username', len(prefix) + 1), IntegerField()))
+    )['max_suffix'] or 0
+    return [f'{prefix}{max_suffix + number}' for number in range(1, count + 1)]
+
+
+def encode_password(hasher, password):
+    """Хеш пароля со случайной солью (выполняется в процессе пула)"""
+    return hasher.encode(password, hasher.salt())
+
+
+def hash_passwords(passwords, workers=HASH_POOL_WORKERS):
+    """Хеши паролей в том же порядке.
+
+    Хешер передается в процессы целиком, поэтому им не нужны настройки Django.
+    """
+    hasher = get_hasher()
+    if len(passwords) < HASH_POOL_MIN_PASSWORDS:
+        return [encode_password(hasher, password) for password in passwords]
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(passwords) // (workers * 4))
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(encode_password, [hasher] * len(passwords), passwords, chunksize=chunksize))
+    except (OSError, NotImplementedError):
+        # Окружение без поддержки процессов: хешируем последовательно
+        logger.warning('Пул процессов недоступен, пароли хешируются последовательно')
+        return [encode_password(hasher, password) for password in passwords]
+
+
+def enroll_users(people, role, created_by, password=None, username_prefix=None, passwords=None,
+                 password_hashes=None):
+    """Создать пользователей с ролью по списку (фамилия, имя).
+
+    Логины выделяются как <username_prefix>N (по умолчанию - по роли).
+    Пароли - список passwords по порядку людей, иначе общий password,
+    по умолчанию стандартный для роли. password_hashes - уже вычисленные
+    хеши этих паролей (чтобы хешировать до открытия внешней транзакции).
+    Возвращает EnrollmentResult.
+    """
+    result = EnrollmentResult()
+    if not people:
+        return result
+    passwords = passwords or [password or get_default_password(role)] * len(people)
+    username_prefix = username_prefix or role
+
+    if password_hashes is None:
+        started = time.perf_counter()
+        password_hashes = hash_passwords(passwords)
+        result.timings['хеширование паролей'] = time.perf_counter() - started
+
+    for attempt in range(1, USERNAME_ALLOCATION_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                usernames = allocate_usernames(username_prefix, len(people))
+                result.timings['выделение логинов'] = time.perf_counter() - started
+
+                started = time.perf_counter()
+                users = [
+                    User(
+                        username=username,
+                        last_name=last_name,
+                        first_name=first_name,
+                        role=role,
+                        created_by=created_by,
+                        password=password_hash,
+                    )
+                    for username, (last_name, first_name), password_hash in zip(usernames, people, password_hashes)
+                ]
+                result.users = User.objects.bulk_create(users)
+                result.timings['сохранение'] = time.perf_counter() - started
+            break
+        except IntegrityError:
+            if attempt == USERNAME_ALLOCATION_ATTEMPTS:
+                raise
+
+    result.passwords = {user.username: user_password for user, user_password in zip(result.users, passwords)}
+    logger.info('Создано пользователей (%s): %s; %s', role, len(result.users), result.get_timings_display())
+    return result
+
+
+def read_enrollment_csv(uploaded_file):
+    """Строки загруженного CSV: (номер строки, ячейки) без заголовка.
+
+    Файл читается потоком; разделитель (";" или ",") определяется по первой строке.
+    """
+    text = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
+    first_line = text.readline()
+    delimiter = ';' if first_line.count(';') >= first_line.count(',') else ','
+    rows = csv.reader(chain([first_line], text), delimiter=delimiter)
+    for line_number, row in enumerate(rows, start=1):
+        cells = [cell.strip() for cell in row]
+        if not any(cells):
+            continue
+        if line_number == 1 and cells[0].lower() in ('фамилия', 'last_name'):
+            continue
+        yield line_number, cells
+
+
+def validate_enrollment_row(cells):
+    """Проверить строку CSV: (фамилия, имя, роль, группа) или текст ошибки"""
+    last_name, first_name, role, group_name = (cells + [''] * 4)[:4]
+    role = ENROLLMENT_ROLES.get((role or 'student').lower())
+    if not last_name or not first_name:
+        return None, 'Не указаны фамилия и имя'
+    if len(last_name) > 30 or len(first_name) > 30:
+        return None, 'Фамилия или имя длиннее 30 символов'
+    if role is None:
+        return None, f'Неизвестная роль: {cells[2]}'
+    if len(group_name) > 100:
+        return None, 'Название группы длиннее 100 символов'
+    if group_name and role != 'student':
+        return None, 'Группу можно указать только для ученика'
+    return (last_name, first_name, role, group_name), None
+
+
+def get_or_create_groups(names, created_by):
+    """Группы пользователя по названиям (недостающие создаются одним запросом)"""
+    groups = {}
+    for group in Group.objects.filter(created_by=created_by, name__in=names).order_by('id'):
+        groups.setdefault(group.name, group)
+    missing = [Group(name=name, created_by=created_by) for name in names if name not in groups]
+    for group in Group.objects.bulk_create(missing):
+        groups[group.name] = group
+    return groups
+
+
+def enroll_chunk(rows, created_by):
+    """Создать пользователей порции и добавить учеников в группы.
+
+    rows - список (номер строки, данные строки); возвращает строки листа
+    учетных данных в том же порядке.
+    """
+    by_role = {}
+    for line_number, (last_name, first_name, role, group_name) in rows:
+        by_role.setdefault(role, []).append((line_number, last_name, first_name, group_name))
+
+    # Пароли хешируются до транзакции: хеширование занимает основное время,
+    # а блокировка записи в SQLite не дает сохранять ответы другим ученикам
+    passwords = {role: generate_passwords(len(role_rows)) for role, role_rows in by_role.items()}
+    password_hashes = {role: hash_passwords(role_passwords) for role, role_passwords in passwords.items()}
+
+    credentials = {}
+    with transaction.atomic():
+        groups = get_or_create_groups({data[3] for line_number, data in rows if data[3]}, created_by)
+        memberships = []
+        for role, role_rows in by_role.items():
+            result = enroll_users(
+                [(last_name, first_name) for line_number, last_name, first_name, group_name in role_rows],
+                role, created_by, passwords=passwords[role], password_hashes=password_hashes[role],
+            )
+            for (line_number, last_name, first_name, group_name), user in zip(role_rows, result.users):
+                if group_name:
+                    memberships.append(UserGroup(user=user, group=groups[group_name]))
+                credentials[line_number] = [
+                    line_number, last_name, first_name, dict(User.ROLE_CHOICES)[role], group_name,
+                    user.username, result.passwords[user.username], '',
+                ]
+        UserGroup.objects.bulk_create(memberships, ignore_conflicts=True)
+    if groups:
+        # bulk_create не отправляет сигналы, сбрасываем панель групп явно
+        invalidate_group_sidebar(created_by.id)
+    return [credentials[line_number] for line_number, data in rows]
+
+
+def enroll_from_csv(uploaded_file, created_by, chunk_size=ENROLLMENT_CHUNK_SIZE):
+    """Создать пользователей из CSV (фамилия, имя, роль, группа) порциями.
+
+    Каждая порция сохраняется своей транзакцией. Строки с ошибками
+    не создаются и попадают в лист с текстом ошибки. Если файл оказался
+    не в UTF-8 после уже созданных порций, в лист добавляется строка
+    с ошибкой, а созданные пользователи остаются в нем с паролями.
+    Возвращает строки листа учетных данных (см. CREDENTIALS_HEADER)
+    по порядку файла и количество созданных пользователей.
+    """
+    sheet = []
+    created_count = 0
+    csv_rows = read_enrollment_csv(uploaded_file)
+    while True:
+        try:
+            chunk = list(islice(csv_rows, chunk_size))
+        except UnicodeDecodeError:
+            if not created_count:
+                raise
+            sheet.append(['', '', '', '', '', '', '', 'Файл не в кодировке UTF-8: следующие строки не обработаны'])
+            break
+        if not chunk:
+            break
+        valid_rows = []
+        errors = {}
+        for line_number, cells in chunk:
+            data, error = validate_enrollment_row(cells)
+            if error:
+                errors[line_number] = (cells + [''] * 4)[:4] + ['', '', error]
+            else:
+                valid_rows.append((line_number, data))
+        created = iter(enroll_chunk(valid_rows, created_by) if valid_rows else [])
+        created_count += len(valid_rows)
+        for line_number, cells in chunk:
+            if line_number in errors:
+                sheet.append([line_number] + errors[line_number])
+            else:
+                sheet.append(next(created))
+    return sheet, created_count
+
+
+def write_credentials_sheet(sheet, output):
+    """Записать лист учетных данных в CSV (с BOM для Excel)"""
+    output.write('\ufeff')
+    writer = csv.writer(output, delimiter=';')
+    writer.writerow(CREDENTIALS_HEADER)
+    writer.writerows(sheet)
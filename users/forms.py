@@ -1,5 +1,6 @@
 from django import forms
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
+from .login_admission import LoginQueueTimeout, login_admission
 from .models import User, Group, UserGroup
 
 class AddTeacherForm(forms.Form):
@@ -13,6 +14,12 @@ class AddStudentForm(forms.Form):
         help_text='Введите данные учеников в формате: Фамилия И. (каждый ученик с новой строки)'
     )
 
+class BulkEnrollmentForm(forms.Form):
+    csv_file = forms.FileField(
+        label='Файл CSV',
+        help_text='Столбцы: Фамилия; Имя; Роль (ученик или учитель); Группа (необязательно)'
+    )
+
 class CreateGroupForm(forms.ModelForm):
     class Meta:
         model = Group
@@ -76,3 +83,21 @@ class SimpleGroupEditForm(forms.Form):
         label='Название группы',
         widget=forms.TextInput(attrs={'class': 'form-control form-control-lg'})
     )
+
+class AdmissionAuthenticationForm(AuthenticationForm):
+    """Форма входа, проверяющая пароль в очереди входа (users.login_admission)"""
+
+    error_messages = {
+        **AuthenticationForm.error_messages,
+        'queue_timeout': 'Сейчас входит слишком много пользователей. Попробуйте еще раз через минуту.',
+    }
+
+    queue_timeout = False
+
+    def clean(self):
+        try:
+            with login_admission.admit():
+                return super().clean()
+        except LoginQueueTimeout:
+            self.queue_timeout = True
+            raise forms.ValidationError(self.error_messages['queue_timeout'], code='queue_timeout')
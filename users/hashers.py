@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, must_update_salt
+
+
+class ConfiguredPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 с числом итераций из PASSWORD_HASH_ITERATIONS.
+
+    Хеши с меньшим числом итераций пересчитываются при следующем входе
+    (must_update); более стойкие хеши не ослабляются. Число итераций хранится
+    в объекте, чтобы хешер можно было передать в процесс пула без настроек
+    Django (см. users.enrollment).
+    """
+
+    def __init__(self):
+        self.iterations = getattr(settings, 'PASSWORD_HASH_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        return decoded['iterations'] < self.iterations or must_update_salt(decoded['salt'], self.salt_entropy)
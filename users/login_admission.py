@@ -0,0 +1,83 @@
+"""Очередь входа в систему.
+
+Проверка пароля (PBKDF2) занимает процессор на сотни миллисекунд, поэтому
+при одновременном входе класса в начале урока проверки ставятся в очередь:
+одновременно выполняется не больше LOGIN_HASH_SLOTS проверок, остальные
+ждут в порядке поступления. Запросы уже работающих учеников (автосохранение
+ответов) при этом продолжают обслуживаться свободными потоками сервера.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Сколько секунд запрос входа ждет в очереди, прежде чем получить отказ
+DEFAULT_LOGIN_QUEUE_TIMEOUT = 30
+
+
+def get_login_hash_slots():
+    """Количество одновременных проверок пароля (по умолчанию - процессоры без одного)"""
+    return getattr(settings, 'LOGIN_HASH_SLOTS', None) or max(1, (os.cpu_count() or 1) - 1)
+
+
+class LoginQueueTimeout(Exception):
+    """Очередь входа не подошла за отведенное время"""
+
+
+class LoginAdmission:
+    """Ограниченное число мест с очередью (первым пришел - первым вошел)"""
+
+    def __init__(self, slots=None):
+        self.slots = slots
+        self.condition = threading.Condition()
+        self.queue = deque()
+        self.active = 0
+
+    def get_slots(self):
+        return self.slots or get_login_hash_slots()
+
+    def get_status(self):
+        """Состояние очереди: занято мест, ожидают, всего мест"""
+        with self.condition:
+            return {'active': self.active, 'waiting': len(self.queue), 'slots': self.get_slots()}
+
+    def acquire(self, timeout):
+        """Занять место; возвращает время ожидания в секундах или LoginQueueTimeout"""
+        started = time.monotonic()
+        ticket = object()
+        with self.condition:
+            self.queue.append(ticket)
+            admitted = self.condition.wait_for(
+                lambda: self.queue[0] is ticket and self.active < self.get_slots(), timeout=timeout
+            )
+            if not admitted:
+                self.queue.remove(ticket)
+                self.condition.notify_all()
+                raise LoginQueueTimeout()
+            self.queue.popleft()
+            self.active += 1
+            self.condition.notify_all()
+        return time.monotonic() - started
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+    @contextmanager
+    def admit(self, timeout=None):
+        """Выполнить проверку пароля, заняв место в очереди"""
+        if timeout is None:
+            timeout = getattr(settings, 'LOGIN_QUEUE_TIMEOUT', DEFAULT_LOGIN_QUEUE_TIMEOUT)
+        waited = self.acquire(timeout)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+
+# Общая очередь процесса сервера
+login_admission = LoginAdmission()
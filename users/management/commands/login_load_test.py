@@ -0,0 +1,92 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from users.enrollment import enroll_users
+from users.login_admission import login_admission
+from users.models import User
+
+
+def get_percentile(values, percent):
+    """Перцентиль по ближайшему рангу"""
+    values = sorted(values)
+    if not values:
+        return 0
+    return values[min(len(values) - 1, max(0, -(-len(values) * percent // 100) - 1))]
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочная проверка одновременного входа учеников (внутри процесса, на текущей базе)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=60, help='Количество одновременных входов')
+        parser.add_argument('--slots', type=int, help='Одновременных проверок пароля (по умолчанию из настроек)')
+        parser.add_argument('--prefix', default='loadtest', help='Префикс логинов временных учеников')
+
+    def handle(self, *args, **options):
+        password = 'loadtest_psw'
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            self.stderr.write(self.style.ERROR(f'Пользователи с префиксом {options["prefix"]} уже существуют'))
+            return
+        result = enroll_users(
+            [('Нагрузочный', f'Ученик {number}') for number in range(options['users'])],
+            'student', None, password=password, username_prefix=options['prefix'],
+        )
+        self.stdout.write(f'Создано временных учеников: {len(result.users)} ({result.get_timings_display()})')
+
+        login_admission.slots = options['slots']
+        start = threading.Barrier(len(result.users) + 1)
+        finished = threading.Event()
+        login_times = []
+        statuses = {}
+        probe_times = []
+        lock = threading.Lock()
+
+        def log_in(username):
+            client = Client(HTTP_HOST='localhost')
+            start.wait()
+            started = time.perf_counter()
+            response = client.post(reverse('login'), {'username': username, 'password': password})
+            elapsed = time.perf_counter() - started
+            with lock:
+                login_times.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            client.logout()
+            connection.close()
+
+        def probe():
+            # Легкий запрос во время входа: показывает, обслуживаются ли остальные запросы
+            client = Client(HTTP_HOST='localhost')
+            start.wait()
+            while not finished.is_set():
+                started = time.perf_counter()
+                client.get(reverse('login_queue_status'))
+                probe_times.append(time.perf_counter() - started)
+                time.sleep(0.05)
+
+        threads = [threading.Thread(target=log_in, args=(user.username,)) for user in result.users]
+        probe_thread = threading.Thread(target=probe)
+        for thread in threads + [probe_thread]:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+            finished.set()
+            probe_thread.join()
+        finally:
+            login_admission.slots = None
+            User.objects.filter(id__in=[user.id for user in result.users]).delete()
+
+        self.stdout.write(f'Ответы: {", ".join(f"{status}: {count}" for status, count in sorted(statuses.items()))}')
+        self.stdout.write(
+            f'Вход, с: p50 {get_percentile(login_times, 50):.2f}, p95 {get_percentile(login_times, 95):.2f}, '
+            f'максимум {max(login_times):.2f}'
+        )
+        self.stdout.write(
+            f'Прочие запросы, с: p50 {get_percentile(probe_times, 50):.3f}, p95 {get_percentile(probe_times, 95):.3f}'
+        )
+        self.stdout.write(self.style.SUCCESS('Временные ученики удалены'))
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+
+# Ключ сессии с временем последнего сохранения (секунды Unix)
+SESSION_REFRESHED_AT_KEY = '_refreshed_at'
+
+# Интервал продления сессии по умолчанию, секунд
+DEFAULT_SESSION_REFRESH_INTERVAL = 300
+
+
+class ThrottledSessionMiddleware(SessionMiddleware):
+    """Сессии с продлением срока не чаще SESSION_REFRESH_INTERVAL секунд.
+
+    Заменяет SESSION_SAVE_EVERY_REQUEST: неизмененная сессия сохраняется
+    (и продлевается) только если с прошлого сохранения прошел интервал,
+    поэтому автосохранения ответов не пишут в таблицу сессий на каждый запрос.
+    Сессия истекает не более чем на интервал раньше, чем при сохранении
+    на каждый запрос.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if session is not None and session.accessed and not session.is_empty():
+            now = int(time.time())
+            refresh_interval = getattr(settings, 'SESSION_REFRESH_INTERVAL', DEFAULT_SESSION_REFRESH_INTERVAL)
+            refreshed_at = session.get(SESSION_REFRESHED_AT_KEY)
+            if session.modified or refreshed_at is None or now - refreshed_at >= refresh_interval:
+                session[SESSION_REFRESHED_AT_KEY] = now
+        return super().process_response(request, response)
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import BooleanField, ExpressionWrapper, Q, Value
 from django.core.validators import RegexValidator
 
 class User(AbstractUser):
@@ -26,8 +27,16 @@ class User(AbstractUser):
         if self.role == 'admin':
             return True  # Администратор может управлять всеми пользователями
         elif self.role == 'teacher':
-            return user.role == 'student' and user.created_by == self  # Учитель может управлять только своими учениками
+            return user.role == 'student' and user.created_by_id == self.id  # Учитель может управлять только своими учениками
         return False
+    
+    def get_can_manage_expression(self):
+        """Выражение can_manage_user() для аннотации выборки пользователей"""
+        if self.role == 'admin':
+            return Value(True, output_field=BooleanField())
+        elif self.role == 'teacher':
+            return ExpressionWrapper(Q(role='student', created_by=self), output_field=BooleanField())
+        return Value(False, output_field=BooleanField())
 
 class Group(models.Model):
     name = models.CharField(max_length=100)
@@ -37,6 +46,39 @@ class Group(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def update_students(self, add_ids=(), remove_ids=()):
+        """Добавить и удалить учеников группы по id (по одному запросу на действие).
+        
+        Добавляются только ученики автора группы, которых в ней еще нет.
+        Возвращает (количество добавленных, количество удаленных).
+        """
+        from .sidebar import invalidate_group_sidebar
+        removed_count = 0
+        if remove_ids:
+            removed_count, _ = UserGroup.objects.filter(group=self, user_id__in=remove_ids).delete()
+        new_ids = []
+        if add_ids:
+            new_ids = list(
+                User.objects.filter(id__in=add_ids, role='student', created_by_id=self.created_by_id)
+                .exclude(user_groups__group=self).values_list('id', flat=True)
+            )
+            UserGroup.objects.bulk_create(
+                [UserGroup(user_id=user_id, group=self) for user_id in new_ids], ignore_conflicts=True
+            )
+        # bulk_create не отправляет сигналы (удаление обрабатывает users.signals)
+        if new_ids:
+            invalidate_group_sidebar(self.created_by_id)
+        return len(new_ids), removed_count
+    
+    def get_roster(self):
+        """Состав группы: список словарей id, name, username (по фамилии)"""
+        return [
+            {'id': user_id, 'name': f'{last_name} {first_name}'.strip(), 'username': username}
+            for user_id, last_name, first_name, username in self.students.order_by(
+                'last_name', 'first_name', 'id'
+            ).values_list('id', 'last_name', 'first_name', 'username')
+        ]
 
 class UserGroup(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user_groups')
@@ -0,0 +1,37 @@
+"""Данные боковой панели групп (id, название и количество учеников).
+
+Строятся при первом обращении из шаблона и кешируются для каждого
+пользователя; кеш сбрасывается при изменении групп и их состава
+(см. users.signals).
+"""
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Group
+
+# Время жизни кеша панели групп (в секундах)
+GROUP_SIDEBAR_CACHE_TIMEOUT = 60 * 60
+
+
+def get_group_sidebar_cache_key(user_id):
+    """Ключ кеша панели групп пользователя"""
+    return f'group_sidebar:{user_id}'
+
+
+def get_group_sidebar(user):
+    """Группы пользователя для панели: список словарей id, name, students_count"""
+    cache_key = get_group_sidebar_cache_key(user.id)
+    groups = cache.get(cache_key)
+    if groups is None:
+        groups = list(
+            Group.objects.filter(created_by=user).annotate(
+                students_count=Count('group_users')
+            ).order_by('name', 'id').values('id', 'name', 'students_count')
+        )
+        cache.set(cache_key, groups, GROUP_SIDEBAR_CACHE_TIMEOUT)
+    return groups
+
+
+def invalidate_group_sidebar(user_id):
+    """Сбросить кеш панели групп пользователя"""
+    cache.delete(get_group_sidebar_cache_key(user_id))
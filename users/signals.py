@@ -0,0 +1,47 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Group, UserGroup
+from .sidebar import invalidate_group_sidebar
+
+
+@receiver([post_save, post_delete], sender=Group)
+def group_changed(sender, instance, **kwargs):
+    """Группа создана, переименована или удалена"""
+    invalidate_group_sidebar(instance.created_by_id)
+
+
+def get_group_owner_id(user_group):
+    """Автор группы членства (без запроса, если группа уже загружена)"""
+    if UserGroup.group.is_cached(user_group):
+        return user_group.group.created_by_id
+    return Group.objects.filter(id=user_group.group_id).values_list('created_by_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=UserGroup)
+def user_group_changed(sender, instance, origin=None, **kwargs):
+    """Ученик добавлен в группу или удален из нее (в том числе в админке)"""
+    # Членства удаленной группы обрабатывает group_changed
+    if isinstance(origin, Group):
+        return
+    created_by_id = get_group_owner_id(instance)
+    if created_by_id:
+        invalidate_group_sidebar(created_by_id)
+
+
+@receiver(m2m_changed, sender=Group.students.through)
+def group_students_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Состав группы изменен через group.students или user.student_groups"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_group_sidebar(instance.created_by_id)
+        return
+    # instance - ученик, pk_set - id групп (при очистке группы известны только до нее)
+    if action in ('post_add', 'post_remove'):
+        groups = Group.objects.filter(id__in=pk_set)
+    elif action == 'pre_clear':
+        groups = instance.student_groups.all()
+    else:
+        return
+    for created_by_id in groups.values_list('created_by_id', flat=True).distinct():
+        invalidate_group_sidebar(created_by_id)
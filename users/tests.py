@@ -1,6 +1,9 @@
-from django.test import TestCase
+from unittest import mock
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.urls import reverse
 from .models import Group, UserGroup
+from .enrollment import enroll_users
 
 User = get_user_model()
 
@@ -104,3 +107,265 @@ class GroupModelTest(TestCase):
         
         self.assertEqual(user_group.user, self.student)
         self.assertEqual(user_group.group, group)
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EnrollmentTest(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', role='teacher', password='teacher_psw')
+        for username in ('student', 'student7', 'studentx12'):
+            User.objects.create_user(username=username, role='student', password='student_psw')
+
+    def test_enroll_allocates_usernames_after_max_suffix(self):
+        people = [(f'Фамилия{number}', 'Имя') for number in range(10)]
+        with self.assertNumQueries(4):
+            # Максимальный номер логина и вставка в транзакции
+            result = enroll_users(people, 'student', self.teacher)
+        self.assertEqual([user.username for user in result.users], [f'student{number}' for number in range(8, 18)])
+        self.assertEqual(set(result.timings), {'хеширование паролей', 'выделение логинов', 'сохранение'})
+        
+        student = User.objects.get(username='student17')
+        self.assertEqual((student.last_name, student.role, student.created_by), ('Фамилия9', 'student', self.teacher))
+        self.assertTrue(student.check_password('student_psw'))
+
+    def test_add_student_view(self):
+        self.client.force_login(self.teacher)
+        response = self.client.post(reverse('add_student'), {'students_data': 'Иванов Иван\nПетров Петр\nОшибка'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(User.objects.filter(created_by=self.teacher).values_list('username', 'last_name')),
+            [('student8', 'Иванов'), ('student9', 'Петров')]
+        )
+
+    def test_admin_bulk_create_from_csv(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        admin = User.objects.create_superuser(username='root', password='root_psw', role='admin')
+        Group.objects.create(name='10А', created_by=admin)
+        self.client.force_login(admin)
+        csv_file = SimpleUploadedFile('users.csv', (
+            'Фамилия;Имя;Роль;Группа\n'
+            'Иванов;Иван;ученик;10А\n'
+            'Петров;Петр;;10Б\n'
+            'Сидоров;;ученик;\n'
+            'Смирнова;Анна;учитель;\n'
+        ).encode('utf-8-sig'))
+        response = self.client.post(reverse('admin:bulk_create'), {'csv_file': csv_file})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = response.content.decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(lines[1].startswith('2;Иванов;Иван;Ученик;10А;student8;'))
+        self.assertTrue(lines[3].endswith(';Не указаны фамилия и имя'))
+        self.assertTrue(lines[4].startswith('5;Смирнова;Анна;Учитель;;teacher1;'))
+        
+        password = lines[1].split(';')[6]
+        self.assertTrue(User.objects.get(username='student8').check_password(password))
+        self.assertEqual(
+            sorted(UserGroup.objects.values_list('user__last_name', 'group__name')),
+            [('Иванов', '10А'), ('Петров', '10Б')]
+        )
+        self.assertEqual(Group.objects.filter(created_by=admin).count(), 2)
+
+    def test_csv_passwords_are_hashed_outside_transaction(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.db import connection
+        from . import enrollment
+        outer_blocks = len(connection.atomic_blocks)
+        hashed_in_transaction = []
+        hash_passwords = enrollment.hash_passwords
+        
+        def checked_hash_passwords(passwords, *args, **kwargs):
+            hashed_in_transaction.append(len(connection.atomic_blocks) > outer_blocks)
+            return hash_passwords(passwords, *args, **kwargs)
+        
+        csv_file = SimpleUploadedFile('users.csv', 'Иванов;Иван\nПетров;Петр\nСидоров;Сидор\n'.encode('utf-8'))
+        with mock.patch.object(enrollment, 'hash_passwords', checked_hash_passwords):
+            sheet, created_count = enrollment.enroll_from_csv(csv_file, self.teacher, chunk_size=2)
+        self.assertEqual((created_count, hashed_in_transaction), (3, [False, False]))
+
+    def test_csv_decode_error_keeps_created_chunks(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .enrollment import enroll_from_csv
+        content = ''.join(f'Фамилия{number};Имя;ученик;\n' for number in range(300)).encode('utf-8') + b'\xff\xfe;\n'
+        sheet, created_count = enroll_from_csv(SimpleUploadedFile('users.csv', content), self.teacher, chunk_size=100)
+        self.assertEqual(created_count, User.objects.filter(created_by=self.teacher).count())
+        self.assertGreater(created_count, 0)
+        self.assertTrue(sheet[-1][-1].startswith('Файл не в кодировке UTF-8'))
+
+
+class UserListTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', role='admin', password='admin_psw')
+        self.teacher = User.objects.create_user(username='teacher', role='teacher', password='teacher_psw', created_by=self.admin)
+        self.other_teacher = User.objects.create_user(username='other', role='teacher', password='teacher_psw')
+
+    def create_students(self, count, created_by):
+        User.objects.bulk_create([
+            User(username=f'{created_by.username}_student{number}', last_name=f'Ученик{number:03}', role='student', created_by=created_by)
+            for number in range(count)
+        ])
+
+    def get_queries_count(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('user_list'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_queries_do_not_grow_with_users(self):
+        self.client.force_login(self.admin)
+        self.create_students(3, self.teacher)
+        # Первый запрос после входа продлевает сессию, его не считаем
+        self.get_queries_count()
+        small_count, response = self.get_queries_count()
+        self.create_students(60, self.other_teacher)
+        large_count, response = self.get_queries_count()
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(response.context['users']), 50)
+        self.assertEqual(response.context['page_obj'].paginator.count, 66)
+
+    def test_teacher_can_manage_only_own_students(self):
+        self.create_students(2, self.teacher)
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('user_list'), {'q': 'Ученик001'})
+        users = list(response.context['users'])
+        self.assertEqual([user.last_name for user in users], ['Ученик001'])
+        self.assertTrue(users[0].can_manage)
+        
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('user_list'), {'role': 'teacher'})
+        self.assertEqual({user.username for user in response.context['users']}, {'teacher', 'other'})
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'users-tests'}})
+class GroupSidebarTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.teacher = User.objects.create_user(username='teacher', role='teacher', password='teacher_psw')
+        self.student = User.objects.create_user(username='student', role='student', password='student_psw', created_by=self.teacher)
+        self.group = Group.objects.create(name='10А', created_by=self.teacher)
+
+    def test_sidebar_is_cached_and_invalidated(self):
+        from .sidebar import get_group_sidebar
+        self.assertEqual(get_group_sidebar(self.teacher), [{'id': self.group.id, 'name': '10А', 'students_count': 0}])
+        with self.assertNumQueries(0):
+            get_group_sidebar(self.teacher)
+        
+        UserGroup.objects.create(user=self.student, group=self.group)
+        self.assertEqual(get_group_sidebar(self.teacher)[0]['students_count'], 1)
+        self.group.students.remove(self.student)
+        self.assertEqual(get_group_sidebar(self.teacher)[0]['students_count'], 0)
+        self.group.delete()
+        self.assertEqual(get_group_sidebar(self.teacher), [])
+
+    def test_membership_delete_invalidates_sidebar(self):
+        from .sidebar import get_group_sidebar
+        membership = UserGroup.objects.create(user=self.student, group=self.group)
+        self.assertEqual(get_group_sidebar(self.teacher)[0]['students_count'], 1)
+        # Удаление из админки идет через экземпляр, без Group.update_students()
+        UserGroup.objects.get(id=membership.id).delete()
+        self.assertEqual(get_group_sidebar(self.teacher)[0]['students_count'], 0)
+
+    def test_navbar_renders_cached_groups(self):
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('edit_profile'))
+        self.assertContains(response, reverse('group_detail', args=[self.group.id]))
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('edit_profile'))
+        self.assertFalse([query for query in queries if 'users_group' in query['sql']])
+
+
+class GroupMembershipTest(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', role='teacher', password='teacher_psw')
+        self.other_teacher = User.objects.create_user(username='other', role='teacher', password='teacher_psw')
+        self.students = [
+            User.objects.create_user(username=f'student{number}', last_name=f'Ученик{number}', role='student', created_by=self.teacher)
+            for number in range(3)
+        ]
+        self.foreign_student = User.objects.create_user(username='foreign', role='student', created_by=self.other_teacher)
+        self.group = Group.objects.create(name='10А', created_by=self.teacher)
+        UserGroup.objects.create(user=self.students[0], group=self.group)
+
+    def post_membership(self, data):
+        import json
+        return self.client.post(
+            reverse('group_membership', args=[self.group.id]), json.dumps(data), content_type='application/json'
+        )
+
+    def test_add_and_remove_in_one_request(self):
+        self.client.force_login(self.teacher)
+        response = self.post_membership({
+            'add': [self.students[1].id, self.students[2].id, self.foreign_student.id],
+            'remove': [self.students[0].id],
+        })
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual((data['added'], data['removed']), (2, 1))
+        self.assertEqual({student['id'] for student in data['students']}, {self.students[1].id, self.students[2].id})
+        self.assertEqual(set(self.group.students.all()), {self.students[1], self.students[2]})
+        
+        # Повторное добавление ничего не меняет
+        data = self.post_membership({'add': [self.students[1].id]}).json()
+        self.assertEqual((data['added'], data['removed']), (0, 0))
+
+    def test_invalid_requests(self):
+        self.client.force_login(self.teacher)
+        response = self.post_membership({'add': [self.students[1].id], 'remove': [self.students[1].id]})
+        self.assertEqual(response.status_code, 400)
+        response = self.post_membership({'add': ['x']})
+        self.assertEqual(response.status_code, 400)
+        
+        self.client.force_login(self.other_teacher)
+        self.assertFalse(self.post_membership({'remove': [self.students[0].id]}).json()['success'])
+        self.assertTrue(self.group.students.filter(id=self.students[0].id).exists())
+
+
+# Хешеры кэшируются, поэтому вместе с числом итераций переопределяется и список хешеров
+CONFIGURED_HASHERS = ['users.hashers.ConfiguredPBKDF2PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=CONFIGURED_HASHERS, PASSWORD_HASH_ITERATIONS=1000, LOGIN_QUEUE_TIMEOUT=0.05)
+class LoginAdmissionTest(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='student', role='student', password='student_psw')
+
+    def test_queue_is_bounded(self):
+        from .login_admission import LoginAdmission, LoginQueueTimeout
+        admission = LoginAdmission(slots=1)
+        with admission.admit():
+            self.assertEqual(admission.get_status(), {'active': 1, 'waiting': 0, 'slots': 1})
+            with self.assertRaises(LoginQueueTimeout):
+                admission.acquire(timeout=0.01)
+        self.assertEqual(admission.get_status(), {'active': 0, 'waiting': 0, 'slots': 1})
+
+    def test_login_upgrades_hash(self):
+        self.assertTrue(self.student.password.startswith('pbkdf2_sha256$1000$'))
+        with self.settings(PASSWORD_HASHERS=CONFIGURED_HASHERS, PASSWORD_HASH_ITERATIONS=2000):
+            response = self.client.post(reverse('login'), {'username': 'student', 'password': 'student_psw'})
+        self.assertEqual(response.status_code, 302)
+        self.student.refresh_from_db()
+        self.assertTrue(self.student.password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_login_keeps_stronger_hash(self):
+        from django.contrib.auth.hashers import PBKDF2PasswordHasher
+        hasher = PBKDF2PasswordHasher()
+        password = hasher.encode('student_psw', hasher.salt())
+        User.objects.filter(id=self.student.id).update(password=password)
+        response = self.client.post(reverse('login'), {'username': 'student', 'password': 'student_psw'})
+        self.assertEqual(response.status_code, 302)
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.password, password)
+
+    def test_full_queue_returns_503(self):
+        from .login_admission import login_admission
+        login_admission.slots = 1
+        try:
+            with login_admission.admit():
+                response = self.client.post(reverse('login'), {'username': 'student', 'password': 'student_psw'})
+        finally:
+            login_admission.slots = None
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.client.get(reverse('login_queue_status')).json()['active'], 0)
@@ -18,6 +18,8 @@ urlpatterns = [
     path('edit-user/<int:user_id>/', views.edit_user, name='edit_user'),
     path('reset-password/<int:user_id>/', views.reset_password, name='reset_password'),
     path('logout/', views.logout_view, name='logout'),
+    path('login-queue/', views.login_queue_status, name='login_queue_status'),
+    path('group/<int:group_id>/membership/', views.group_membership, name='group_membership'),
     path('add-student-to-group/<int:group_id>/<int:student_id>/', views.add_student_to_group, name='add_student_to_group'),
     path('remove-student-from-group/<int:group_id>/<int:student_id>/', views.remove_student_from_group, name='remove_student_from_group'),
 ]
@@ -1,11 +1,22 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
+from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Q
 from django.http import JsonResponse
 from django.shortcuts import redirect
-from .models import User, Group, UserGroup
-from .forms import AddTeacherForm, AddStudentForm, CreateGroupForm, AddStudentsToGroupForm, EditGroupForm, RemoveStudentsFromGroupForm, SimpleGroupEditForm
+from .models import User, Group
+from .enrollment import enroll_users
+from .login_admission import login_admission
+from .forms import AdmissionAuthenticationForm, AddTeacherForm, AddStudentForm, CreateGroupForm, AddStudentsToGroupForm, EditGroupForm, RemoveStudentsFromGroupForm, SimpleGroupEditForm
+from urllib.parse import urlencode
+import json
+
+# Количество пользователей на странице списка
+USER_LIST_PAGE_SIZE = 50
 
 @login_required
 def dashboard(request):
@@ -16,33 +27,19 @@ def dashboard(request):
     
     # Для учеников добавляем данные о назначенных вариантах
     if request.user.role == 'student':
-        from variants.models import VariantAssignment
-        assignments = VariantAssignment.objects.filter(
-            student=request.user,
-            is_active=True
-        ).select_related('variant', 'variant__created_by').order_by('-assigned_at')
-        
-        variants_to_do = []
-        variants_completed = []
+        from variants.assignments import get_student_assignments, get_assignments_page, build_assignment_items
         
-        for assignment in assignments:
-            execution = assignment.get_execution()
-            item = {
-                'assignment': assignment,
-                'variant': assignment.variant,
-                'execution': execution,
-                'is_completed': assignment.is_completed(),
-                'is_overdue': assignment.is_overdue(),
-            }
-            
-            # Разделяем на завершенные и к выполнению
-            if execution and execution.status in ['completed', 'timeout']:
-                variants_completed.append(item)
-            else:
-                variants_to_do.append(item)
+        # Состояние выполнений добавляется к назначениям в том же запросе,
+        # завершенные варианты показываются первой страницей архива
+        variants_to_do, to_do_cursor = get_assignments_page(get_student_assignments(request.user))
+        variants_completed, completed_cursor = get_assignments_page(
+            get_student_assignments(request.user, archived=True)
+        )
         
-        context['variants_to_do'] = variants_to_do
-        context['variants_completed'] = variants_completed
+        context['variants_to_do'] = build_assignment_items(variants_to_do)
+        context['variants_completed'] = build_assignment_items(variants_completed)
+        context['to_do_cursor'] = to_do_cursor
+        context['completed_cursor'] = completed_cursor
     
     return render(request, 'users/dashboard.html', context)
 
@@ -51,6 +48,8 @@ def user_list(request):
     """Список пользователей в зависимости от роли текущего пользователя"""
     # Проверяем, запрашивается ли раздел "Мои ученики"
     my_students = request.GET.get('my_students', False)
+    search = request.GET.get('q', '').strip()
+    role = request.GET.get('role', '')
     
     if request.user.role == 'admin':
         if my_students:
@@ -64,14 +63,18 @@ def user_list(request):
     else:
         users = User.objects.none()
     
-    # Добавляем информацию о правах для каждого пользователя
-    users_with_permissions = []
-    for user in users:
-        can_manage = request.user.can_manage_user(user)
-        users_with_permissions.append({
-            'user': user,
-            'can_manage': can_manage
-        })
+    if search:
+        users = users.filter(
+            Q(username__icontains=search) | Q(last_name__icontains=search) | Q(first_name__icontains=search)
+        )
+    if role in dict(User.ROLE_CHOICES):
+        users = users.filter(role=role)
+    
+    # Права на управление вычисляются в том же запросе, что и список
+    users = users.select_related('created_by').annotate(
+        can_manage=request.user.get_can_manage_expression()
+    ).order_by('last_name', 'first_name', 'id')
+    page_obj = Paginator(users, USER_LIST_PAGE_SIZE).get_page(request.GET.get('page'))
     
     # Определяем заголовок страницы
     if request.user.role == 'admin' and my_students:
@@ -83,8 +86,16 @@ def user_list(request):
     else:
         page_title = 'Пользователи'
     
+    # Параметры фильтра для ссылок на страницы
+    filter_params = {'q': search, 'role': role, 'my_students': my_students or ''}
     return render(request, 'users/user_list.html', {
-        'users': users_with_permissions,
+        'users': page_obj.object_list,
+        'page_obj': page_obj,
+        'search': search,
+        'role': role,
+        'role_choices': User.ROLE_CHOICES,
+        'my_students': my_students,
+        'filter_query': urlencode({key: value for key, value in filter_params.items() if value}),
         'current_user': request.user,
         'page_title': page_title
     })
@@ -102,22 +113,8 @@ def add_teacher(request):
             first_name = form.cleaned_data['first_name']
             last_name = form.cleaned_data['last_name']
             
-            # Генерируем логин teacher1, teacher2, и т.д.
-            counter = 1
-            username = 'teacher1'
-            while User.objects.filter(username=username).exists():
-                counter += 1
-                username = f'teacher{counter}'
-            
-            # Создаем пользователя с ролью учителя
-            user = User.objects.create_user(
-                username=username,
-                first_name=first_name,
-                last_name=last_name,
-                role='teacher',
-                created_by=request.user,
-                password='teacher_psw'
-            )
+            # Создаем пользователя с ролью учителя и логином teacher1, teacher2, и т.д.
+            user = enroll_users([(last_name, first_name)], 'teacher', request.user).users[0]
             
             messages.success(request, f'Учитель {user.get_full_name()} успешно добавлен')
             return redirect('user_list')
@@ -139,33 +136,19 @@ def add_student(request):
             students_data = form.cleaned_data['students_data']
             students_list = [line.strip() for line in students_data.split('\n') if line.strip()]
             
-            created_students = []
+            people = []
             for student_data in students_list:
                 try:
                     last_name, first_name = student_data.split(' ', 1)
-                    
-                    # Генерируем логин student1, student2, и т.д.
-                    counter = 1
-                    username = 'student1'
-                    while User.objects.filter(username=username).exists():
-                        counter += 1
-                        username = f'student{counter}'
-                    
-                    user = User.objects.create_user(
-                        username=username,
-                        first_name=first_name,
-                        last_name=last_name,
-                        role='student',
-                        created_by=request.user,
-                        password='student_psw'
-                    )
-                    created_students.append(user)
+                    people.append((last_name, first_name))
                 except ValueError:
                     messages.error(request, f'Неверный формат данных: {student_data}')
                     continue
             
-            if created_students:
-                messages.success(request, f'Успешно добавлено {len(created_students)} учеников')
+            # Логины student1, student2, ... выделяются и создаются одним пакетом
+            result = enroll_users(people, 'student', request.user)
+            if result.users:
+                messages.success(request, f'Успешно добавлено {len(result.users)} учеников')
             
             return redirect('user_list')
     else:
@@ -228,8 +211,7 @@ def add_students_to_group(request, group_id):
         form = AddStudentsToGroupForm(request.POST, user=request.user, group=group)
         if form.is_valid():
             students = form.cleaned_data['students']
-            for student in students:
-                UserGroup.objects.get_or_create(user=student, group=group)
+            group.update_students(add_ids=[student.id for student in students])
             messages.success(request, f'В группу "{group.name}" добавлено {len(students)} учеников')
             return redirect('group_detail', group_id=group.id)
     else:
@@ -356,17 +338,6 @@ def reset_password(request, user_id):
     
     return render(request, 'users/reset_password.html', {'user_to_reset': user_to_reset})
 
-
-def get_user_groups(user):
-    """Получение групп пользователя"""
-    if user.role == 'admin':
-        # Администраторы видят только группы, которые они создали
-        return Group.objects.prefetch_related('students').filter(created_by=user)
-    elif user.role == 'teacher':
-        # Учителя видят только группы, которые они создали
-        return Group.objects.prefetch_related('students').filter(created_by=user)
-    return Group.objects.none()
-
 @login_required
 def edit_group(request, group_id):
     """Редактирование группы с интуитивным интерфейсом"""
@@ -416,8 +387,7 @@ def group_detail(request, group_id):
         form = RemoveStudentsFromGroupForm(request.POST, group=group)
         if form.is_valid():
             students = form.cleaned_data['students']
-            for student in students:
-                UserGroup.objects.filter(user=student, group=group).delete()
+            group.update_students(remove_ids=[student.id for student in students])
             messages.success(request, f'Из группы "{group.name}" удалено {len(students)} учеников')
             return redirect('group_detail', group_id=group.id)
     else:
@@ -445,12 +415,62 @@ def delete_group(request, group_id):
     
     return render(request, 'users/delete_group.html', {'group': group})
 
+class LoginView(auth_views.LoginView):
+    """Вход в систему с проверкой пароля в очереди входа"""
+
+    template_name = 'registration/login.html'
+    form_class = AdmissionAuthenticationForm
+
+    def form_invalid(self, form):
+        response = super().form_invalid(form)
+        if form.queue_timeout:
+            # Сервер перегружен: клиент может повторить попытку позже
+            response.status_code = 503
+            response['Retry-After'] = '10'
+        return response
+
+def login_queue_status(request):
+    """Состояние очереди входа для индикатора на странице входа"""
+    return JsonResponse({'success': True, **login_admission.get_status()})
+
 def logout_view(request):
     """Выход из системы"""
     logout(request)
     messages.success(request, 'Вы успешно вышли из системы')
     return redirect('login')
 
+@login_required
+def group_membership(request, group_id):
+    """Изменение состава группы через AJAX: {"add": [id, ...], "remove": [id, ...]}"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Метод не разрешен'})
+    
+    if request.user.role not in ['admin', 'teacher']:
+        return JsonResponse({'success': False, 'error': 'Нет прав для редактирования групп'})
+    
+    try:
+        data = json.loads(request.body)
+        add_ids = {int(user_id) for user_id in data.get('add') or []}
+        remove_ids = {int(user_id) for user_id in data.get('remove') or []}
+    except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'Неверные данные'}, status=400)
+    if add_ids & remove_ids:
+        return JsonResponse({'success': False, 'error': 'Ученик не может быть одновременно добавлен и удален'}, status=400)
+    
+    try:
+        group = Group.objects.get(id=group_id, created_by=request.user)
+    except Group.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Группа не найдена'})
+    
+    with transaction.atomic():
+        added_count, removed_count = group.update_students(add_ids, remove_ids)
+    return JsonResponse({
+        'success': True,
+        'added': added_count,
+        'removed': removed_count,
+        'students': group.get_roster(),
+    })
+
 @login_required
 def add_student_to_group(request, group_id, student_id):
     """Добавить ученика в группу через AJAX"""
@@ -464,9 +484,9 @@ def add_student_to_group(request, group_id, student_id):
         group = Group.objects.get(id=group_id, created_by=request.user)
         student = User.objects.get(id=student_id, role='student', created_by=request.user)
         
-        # Проверяем, что ученик не в группе
-        if not UserGroup.objects.filter(group=group, user=student).exists():
-            UserGroup.objects.create(group=group, user=student)
+        # Ученик, уже состоящий в группе, не добавляется
+        added_count, removed_count = group.update_students(add_ids=[student.id])
+        if added_count:
             return JsonResponse({
                 'success': True, 
                 'message': f'{student.get_full_name()} добавлен в группу',
@@ -497,9 +517,8 @@ def remove_student_from_group(request, group_id, student_id):
         student = User.objects.get(id=student_id, role='student', created_by=request.user)
         
         # Удаляем связь
-        user_group = UserGroup.objects.filter(group=group, user=student).first()
-        if user_group:
-            user_group.delete()
+        added_count, removed_count = group.update_students(remove_ids=[student.id])
+        if removed_count:
             return JsonResponse({
                 'success': True, 
                 'message': f'{student.get_full_name()} удален из группы',
@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import Variant, VariantTask, VariantExecution, VariantAssignment
+from . import regrade
+from .models import (
+    Variant, VariantTask, VariantExecution, VariantAssignment, VariantStudentStats, TaskItemStats, AnalyticsWatermark,
+    StudentMastery, DailyRollup
+)
 
 
 @admin.register(Variant)
@@ -18,15 +22,59 @@ class VariantTaskAdmin(admin.ModelAdmin):
 
 @admin.register(VariantExecution)
 class VariantExecutionAdmin(admin.ModelAdmin):
-    list_display = ['variant', 'student', 'status', 'started_at', 'completed_at']
+    list_display = ['variant', 'student', 'status', 'score', 'total_tasks', 'started_at', 'completed_at']
     list_filter = ['status', 'started_at']
     search_fields = ['variant__name', 'student__username', 'student__first_name', 'student__last_name']
-    readonly_fields = ['started_at', 'completed_at']
+    readonly_fields = ['started_at', 'completed_at', 'score', 'total_tasks', 'grade_map', 'graded_at', 'navigation_log', 'task_durations']
+    actions = ['regrade_executions']
+    
+    @admin.action(description='Перепроверить выбранные выполнения')
+    def regrade_executions(self, request, queryset):
+        processed_count, changed_count = regrade.regrade_executions(queryset)
+        self.message_user(
+            request, f'Перепроверено выполнений: {processed_count}, изменился результат: {changed_count}'
+        )
 
 
 @admin.register(VariantAssignment)
 class VariantAssignmentAdmin(admin.ModelAdmin):
-    list_display = ['variant', 'student', 'assigned_by', 'assigned_at', 'deadline', 'is_active']
-    list_filter = ['is_active', 'assigned_at', 'deadline']
+    list_display = ['variant', 'student', 'assigned_by', 'assigned_at', 'opens_at', 'deadline', 'is_active', 'is_archived']
+    list_filter = ['is_active', 'is_archived', 'assigned_at', 'deadline']
     search_fields = ['variant__name', 'student__username', 'student__first_name', 'student__last_name']
     readonly_fields = ['assigned_at']
+
+
+@admin.register(VariantStudentStats)
+class VariantStudentStatsAdmin(admin.ModelAdmin):
+    list_display = ['variant', 'student', 'status', 'correct_count', 'total_count', 'task_statuses', 'updated_at']
+    list_filter = ['status']
+    search_fields = ['variant__name', 'student__username', 'student__first_name', 'student__last_name']
+    readonly_fields = [field for field in VariantStudentStats.STATS_FIELDS if field != 'execution'] + ['answered_count']
+    raw_id_fields = ['execution']
+
+
+@admin.register(TaskItemStats)
+class TaskItemStatsAdmin(admin.ModelAdmin):
+    list_display = ['variant', 'task', 'executions_count', 'correct_count', 'answered_count', 'updated_at']
+    list_filter = ['variant']
+    readonly_fields = TaskItemStats.SUM_FIELDS
+
+
+@admin.register(AnalyticsWatermark)
+class AnalyticsWatermarkAdmin(admin.ModelAdmin):
+    list_display = ['name', 'completed_at', 'updated_at']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(StudentMastery)
+class StudentMasteryAdmin(admin.ModelAdmin):
+    list_display = ['student', 'task_type', 'subtype', 'attempts', 'correct_count', 'score', 'last_attempt_at']
+    list_filter = ['task_type']
+    search_fields = ['student__username', 'student__first_name', 'student__last_name']
+
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    list_display = ['day', 'teacher', 'group', 'task_type', 'completions', 'attempts', 'correct_count', 'time_spent_seconds']
+    list_filter = ['task_type', 'day']
+    date_hierarchy = 'day'
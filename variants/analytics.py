@@ -0,0 +1,442 @@
+"""Анализ заданий и дневные итоги по выполнениям вариантов.
+
+Для каждого задания варианта накапливаются достаточные суммы (TaskItemStats):
+количество выполнений и правильных ответов, суммы общих баллов и их квадратов,
+сумма баллов решивших задание, а также частоты неправильных ответов.
+Новые завершенные выполнения обрабатываются порциями после отметки
+(AnalyticsWatermark), поэтому повторный запуск обрабатывает только
+выполнения, завершенные с прошлого раза (и зафиксированные с опозданием).
+
+Дневные итоги (DailyRollup) обновляются так же, по своей отметке.
+Обновление выполняется командами refresh_item_analysis и refresh_rollups
+по расписанию (например, cron раз в несколько минут), страницы отчетов
+только читают накопленные данные.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from tasks.grading import bulk_grade
+from tasks.models import Task
+from users.models import UserGroup
+from .models import Variant, VariantExecution, TaskItemStats, AnalyticsWatermark, DailyRollup
+from .regrade import FINISHED_STATUSES
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен, без него суммы считаются на Python
+    np = None
+
+ITEM_ANALYSIS_WATERMARK = 'item_analysis'
+
+ITEM_ANALYSIS_CHUNK_SIZE = 1000
+
+ROLLUPS_WATERMARK = 'daily_rollups'
+
+# Насколько позже своего времени завершения может зафиксироваться выполнение
+# (длительность транзакции и расхождение часов серверов)
+LATE_COMMIT_WINDOW = timedelta(minutes=10)
+
+# Сколько самых частых неправильных ответов хранить для задания
+WRONG_ANSWERS_LIMIT = 100
+
+# Максимальная длина неправильного ответа в статистике
+WRONG_ANSWER_MAX_LENGTH = 100
+
+
+def get_watermark(name):
+    """Получить (или создать) отметку обработанных выполнений"""
+    watermark, created = AnalyticsWatermark.objects.get_or_create(name=name)
+    return watermark
+
+
+def get_refreshed_at(name):
+    """Время последнего обновления аналитики по отметке (None, если обновлений не было)"""
+    return AnalyticsWatermark.objects.filter(name=name).values_list('updated_at', flat=True).first()
+
+
+def get_window_start(watermark):
+    """Начало окна повторного просмотра перед отметкой"""
+    return watermark.completed_at - LATE_COMMIT_WINDOW
+
+
+def get_executions_after(watermark):
+    """Необработанные завершенные выполнения в порядке (completed_at, id).
+
+    Время завершения выставляется до фиксации транзакции, поэтому выполнение
+    может стать видимым уже после того, как отметка прошла его время.
+    Такие выполнения находятся повторным просмотром окна перед отметкой,
+    а уже учтенные выполнения окна исключаются по id.
+    """
+    executions = VariantExecution.objects.filter(status__in=FINISHED_STATUSES, completed_at__isnull=False)
+    if watermark.completed_at:
+        executions = executions.filter(completed_at__gte=get_window_start(watermark)).exclude(
+            id__in=watermark.recent_execution_ids
+        )
+    return executions.order_by('completed_at', 'id')
+
+
+def get_executions_until(watermark):
+    """Завершенные выполнения, уже учтенные по отметке"""
+    executions = VariantExecution.objects.filter(status__in=FINISHED_STATUSES, completed_at__isnull=False)
+    if not watermark.completed_at:
+        return executions.none()
+    return executions.filter(
+        Q(completed_at__lt=get_window_start(watermark)) | Q(id__in=watermark.recent_execution_ids)
+    )
+
+
+def advance_watermark(watermark, chunk):
+    """Сдвинуть отметку после обработки порции выполнений и сохранить ее"""
+    # Порция упорядочена по времени завершения, а опоздавшие выполнения отметку не сдвигают назад
+    if not watermark.completed_at or chunk[-1].completed_at > watermark.completed_at:
+        watermark.completed_at = chunk[-1].completed_at
+    # В отметке остаются только выполнения, попадающие в окно повторного просмотра
+    watermark.recent_execution_ids = list(
+        VariantExecution.objects.filter(
+            id__in=watermark.recent_execution_ids + [execution.id for execution in chunk],
+            completed_at__gte=get_window_start(watermark),
+        ).order_by('id').values_list('id', flat=True)
+    )
+    watermark.save()
+
+
+def sum_answers_matrix(grade_maps, scores):
+    """Суммы по столбцам матрицы правильности (строки - выполнения, столбцы - задания).
+
+    Возвращает (количество правильных ответов, сумма общих баллов решивших)
+    для каждого задания.
+    """
+    if np is not None:
+        matrix = np.frombuffer(''.join(grade_maps).encode('ascii'), dtype=np.uint8)
+        matrix = (matrix.reshape(len(grade_maps), -1) - ord('0')).astype(np.int64)
+        scores_vector = np.asarray(scores, dtype=np.int64)
+        return matrix.sum(axis=0).tolist(), (scores_vector @ matrix).tolist()
+
+    columns_count = len(grade_maps[0])
+    correct_counts = [0] * columns_count
+    correct_score_sums = [0] * columns_count
+    for grade_map, score in zip(grade_maps, scores):
+        for index, is_correct in enumerate(grade_map):
+            if is_correct == '1':
+                correct_counts[index] += 1
+                correct_score_sums[index] += score
+    return correct_counts, correct_score_sums
+
+
+def normalize_wrong_answer(answer):
+    """Привести неправильный ответ к виду для подсчета частот"""
+    return ' '.join(str(answer).split()).casefold()[:WRONG_ANSWER_MAX_LENGTH]
+
+
+def add_executions_to_item_stats(variant_id, executions, grading_keys):
+    """Добавить выполнения одного варианта в статистику его заданий"""
+    if not executions or not grading_keys:
+        return
+
+    # Выполнения, проверенные до изменения состава варианта, проверяются
+    # заново по текущим заданиям (без сохранения результата)
+    grade_maps = [execution.grade_map for execution in executions]
+    stale = [index for index, grade_map in enumerate(grade_maps) if len(grade_map) != len(grading_keys)]
+    if stale:
+        regraded = bulk_grade(grading_keys, [executions[index].answers for index in stale])
+        for index, grade_map in zip(stale, regraded):
+            grade_maps[index] = grade_map
+
+    scores = [grade_map.count('1') for grade_map in grade_maps]
+    correct_counts, correct_score_sums = sum_answers_matrix(grade_maps, scores)
+
+    answered_counts = [0] * len(grading_keys)
+    wrong_answers = [Counter() for _ in grading_keys]
+    for execution, grade_map in zip(executions, grade_maps):
+        answers = execution.answers or {}
+        for index, (task_id, *_) in enumerate(grading_keys):
+            answer = answers.get(str(task_id))
+            if answer is None or not str(answer).strip():
+                continue
+            answered_counts[index] += 1
+            if grade_map[index] != '1':
+                wrong_answers[index][normalize_wrong_answer(answer)] += 1
+
+    existing = {stats.task_id: stats for stats in TaskItemStats.objects.filter(variant_id=variant_id)}
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    for index, (task_id, *_) in enumerate(grading_keys):
+        stats = existing.get(task_id)
+        if stats is None:
+            stats = TaskItemStats(variant_id=variant_id, task_id=task_id, wrong_answers={})
+            to_create.append(stats)
+        else:
+            to_update.append(stats)
+        stats.executions_count += len(executions)
+        stats.correct_count += correct_counts[index]
+        stats.answered_count += answered_counts[index]
+        stats.score_sum += sum(scores)
+        stats.score_sq_sum += sum(score * score for score in scores)
+        stats.correct_score_sum += correct_score_sums[index]
+        counts = Counter(stats.wrong_answers)
+        counts.update(wrong_answers[index])
+        # Храним только самые частые ответы, редкие для анализа не важны
+        stats.wrong_answers = dict(counts.most_common(WRONG_ANSWERS_LIMIT))
+        # bulk_update не обновляет поля auto_now
+        stats.updated_at = now
+
+    TaskItemStats.objects.bulk_create(to_create)
+    TaskItemStats.objects.bulk_update(to_update, TaskItemStats.SUM_FIELDS)
+
+
+def add_executions(executions, grading_keys_cache):
+    """Добавить выполнения разных вариантов в статистику заданий"""
+    executions_by_variant = defaultdict(list)
+    for execution in executions:
+        executions_by_variant[execution.variant_id].append(execution)
+    for variant_id, variant_executions in executions_by_variant.items():
+        if variant_id not in grading_keys_cache:
+            grading_keys_cache[variant_id] = Variant(id=variant_id).get_grading_keys()
+        add_executions_to_item_stats(variant_id, variant_executions, grading_keys_cache[variant_id])
+
+
+def refresh_item_analysis(chunk_size=ITEM_ANALYSIS_CHUNK_SIZE, progress=None):
+    """Обработать выполнения, завершенные после прошлого запуска.
+
+    Каждая порция добавляется в статистику вместе со сдвигом отметки
+    в одной транзакции. progress(обработано) вызывается после каждой порции.
+    Возвращает количество обработанных выполнений.
+    """
+    get_watermark(ITEM_ANALYSIS_WATERMARK)
+    grading_keys_cache = {}
+    processed_count = 0
+    while True:
+        with transaction.atomic():
+            # Блокировка отметки не дает параллельным запускам учесть выполнения дважды
+            watermark = AnalyticsWatermark.objects.select_for_update().get(name=ITEM_ANALYSIS_WATERMARK)
+            chunk = list(
+                get_executions_after(watermark).only(
+                    'id', 'variant_id', 'answers', 'grade_map', 'completed_at'
+                )[:chunk_size]
+            )
+            if not chunk:
+                break
+            add_executions(chunk, grading_keys_cache)
+            advance_watermark(watermark, chunk)
+        processed_count += len(chunk)
+        if progress:
+            progress(processed_count)
+    return processed_count
+
+
+def rebuild_variant_item_analysis(variant_id, chunk_size=ITEM_ANALYSIS_CHUNK_SIZE):
+    """Пересчитать статистику заданий варианта по уже обработанным выполнениям.
+
+    Нужен после перепроверки или изменения состава варианта, когда
+    накопленные суммы перестают соответствовать сохраненным результатам.
+    """
+    get_watermark(ITEM_ANALYSIS_WATERMARK)
+    grading_keys_cache = {}
+    with transaction.atomic():
+        watermark = AnalyticsWatermark.objects.select_for_update().get(name=ITEM_ANALYSIS_WATERMARK)
+        executions = get_executions_until(watermark).filter(variant_id=variant_id).order_by('id').only(
+            'id', 'variant_id', 'answers', 'grade_map'
+        )
+        TaskItemStats.objects.filter(variant_id=variant_id).delete()
+        last_id = 0
+        while True:
+            chunk = list(executions.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            add_executions(chunk, grading_keys_cache)
+
+
+def get_item_analysis(variant):
+    """Анализ заданий варианта для отчета (в порядке заданий)"""
+    stats_by_task = {stats.task_id: stats for stats in TaskItemStats.objects.filter(variant=variant)}
+    report = []
+    for variant_task in variant.variant_tasks.select_related('task').order_by('order'):
+        stats = stats_by_task.get(variant_task.task_id)
+        report.append({
+            'order': variant_task.order,
+            'task': variant_task.task,
+            'stats': stats,
+            'solve_rate': stats.get_solve_rate() if stats else None,
+            'discrimination': stats.get_discrimination() if stats else None,
+            'top_wrong_answers': stats.get_top_wrong_answers() if stats else [],
+        })
+    return report
+
+
+def get_teacher_groups(executions):
+    """Группы учителя, в которые входят ученики выполнений: {(ученик, учитель): [группы]}"""
+    memberships = UserGroup.objects.filter(
+        user_id__in={execution.student_id for execution in executions},
+        group__created_by_id__in={execution.variant.created_by_id for execution in executions},
+    ).values_list('user_id', 'group__created_by_id', 'group_id')
+    groups = defaultdict(list)
+    for student_id, teacher_id, group_id in memberships:
+        groups[(student_id, teacher_id)].append(group_id)
+    return groups
+
+
+def add_executions_to_rollups(executions, grading_keys_cache):
+    """Добавить завершенные выполнения в дневные итоги.
+
+    Итоги относятся к учителю - автору варианта и к его группам,
+    в которых ученик состоит на момент обработки. Время по типу заданий
+    берется из времени по заданиям (task_durations), а для выполнений
+    без него время выполнения делится пропорционально количеству заданий.
+    """
+    teacher_groups = get_teacher_groups(executions)
+    increments = defaultdict(lambda: [0, 0, 0, 0.0])
+    for execution in executions:
+        if execution.variant_id not in grading_keys_cache:
+            grading_keys_cache[execution.variant_id] = Variant(id=execution.variant_id).get_grading_keys()
+        grading_keys = grading_keys_cache[execution.variant_id]
+        if not grading_keys:
+            continue
+        grade_map = execution.grade_map
+        if len(grade_map) != len(grading_keys):
+            grade_map = bulk_grade(grading_keys, [execution.answers])[0]
+
+        elapsed_seconds = 0
+        if execution.started_at:
+            elapsed_seconds = max(0, (execution.completed_at - execution.started_at).total_seconds())
+
+        by_type = defaultdict(lambda: [0, 0, 0.0])
+        for position, ((task_id, task_type, *_), is_correct) in enumerate(zip(grading_keys, grade_map)):
+            by_type[task_type][0] += 1
+            by_type[task_type][1] += is_correct == '1'
+            if execution.task_durations:
+                # Номера заданий в варианте идут подряд, начиная с 1
+                by_type[task_type][2] += execution.task_durations.get(str(position + 1), 0)
+            else:
+                by_type[task_type][2] += elapsed_seconds / len(grading_keys)
+
+        day = timezone.localdate(execution.completed_at)
+        teacher_id = execution.variant.created_by_id
+        group_ids = [None] + teacher_groups.get((execution.student_id, teacher_id), [])
+        for task_type, (attempts, correct_count, time_spent) in by_type.items():
+            for group_id in group_ids:
+                increment = increments[(teacher_id, group_id, task_type, day)]
+                increment[0] += attempts
+                increment[1] += 1
+                increment[2] += correct_count
+                increment[3] += time_spent
+
+    if not increments:
+        return
+
+    existing = {
+        (rollup.teacher_id, rollup.group_id, rollup.task_type, rollup.day): rollup
+        for rollup in DailyRollup.objects.filter(
+            teacher_id__in={key[0] for key in increments},
+            task_type__in={key[2] for key in increments},
+            day__in={key[3] for key in increments},
+        )
+    }
+    to_create = []
+    to_update = []
+    for key, (attempts, completions, correct_count, time_spent) in increments.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            teacher_id, group_id, task_type, day = key
+            rollup = DailyRollup(teacher_id=teacher_id, group_id=group_id, task_type=task_type, day=day)
+            to_create.append(rollup)
+        else:
+            to_update.append(rollup)
+        rollup.attempts += attempts
+        rollup.completions += completions
+        rollup.correct_count += correct_count
+        rollup.time_spent_seconds += round(time_spent)
+
+    DailyRollup.objects.bulk_create(to_create)
+    DailyRollup.objects.bulk_update(to_update, DailyRollup.SUM_FIELDS)
+
+
+def refresh_rollups(chunk_size=ITEM_ANALYSIS_CHUNK_SIZE, progress=None):
+    """Добавить в дневные итоги выполнения, завершенные после прошлого запуска.
+
+    Возвращает количество обработанных выполнений.
+    """
+    get_watermark(ROLLUPS_WATERMARK)
+    grading_keys_cache = {}
+    processed_count = 0
+    while True:
+        with transaction.atomic():
+            watermark = AnalyticsWatermark.objects.select_for_update().get(name=ROLLUPS_WATERMARK)
+            chunk = list(
+                get_executions_after(watermark).select_related('variant').only(
+                    'id', 'variant_id', 'variant__created_by_id', 'student_id',
+                    'answers', 'grade_map', 'task_durations', 'started_at', 'completed_at'
+                )[:chunk_size]
+            )
+            if not chunk:
+                break
+            add_executions_to_rollups(chunk, grading_keys_cache)
+            advance_watermark(watermark, chunk)
+        processed_count += len(chunk)
+        if progress:
+            progress(processed_count)
+    return processed_count
+
+
+def rebuild_teacher_rollups(teacher_id, days, chunk_size=ITEM_ANALYSIS_CHUNK_SIZE):
+    """Пересчитать дневные итоги учителя за указанные дни по уже обработанным выполнениям.
+
+    Нужен после перепроверки, когда накопленные итоги перестают
+    соответствовать сохраненным результатам.
+    """
+    days = set(days)
+    if not days:
+        return
+    get_watermark(ROLLUPS_WATERMARK)
+    grading_keys_cache = {}
+    with transaction.atomic():
+        watermark = AnalyticsWatermark.objects.select_for_update().get(name=ROLLUPS_WATERMARK)
+        executions = get_executions_until(watermark).filter(
+            variant__created_by_id=teacher_id, completed_at__date__in=days
+        ).select_related('variant').order_by('id').only(
+            'id', 'variant_id', 'variant__created_by_id', 'student_id',
+            'answers', 'grade_map', 'task_durations', 'started_at', 'completed_at'
+        )
+        DailyRollup.objects.filter(teacher_id=teacher_id, day__in=days).delete()
+        last_id = 0
+        while True:
+            chunk = list(executions.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            add_executions_to_rollups(chunk, grading_keys_cache)
+
+
+def reset_rollups():
+    """Удалить дневные итоги и отметку, чтобы следующий запуск пересчитал их заново"""
+    with transaction.atomic():
+        DailyRollup.objects.all().delete()
+        AnalyticsWatermark.objects.filter(name=ROLLUPS_WATERMARK).delete()
+
+
+def get_rollup_report(teacher, date_from, date_to, group=None):
+    """Итоги учителя за период: по типам заданий и по дням.
+
+    Количество завершенных вариантов имеет смысл только в разрезе типа
+    (вариант с заданиями нескольких типов учитывается в каждом из них).
+    """
+    rollups = DailyRollup.objects.filter(teacher=teacher, group=group, day__range=(date_from, date_to))
+    totals = ('attempts', 'completions', 'correct_count', 'time_spent_seconds')
+    by_type = list(rollups.values('task_type').annotate(**{field: Sum(field) for field in totals}))
+    type_labels = dict(Task.TASK_TYPE_CHOICES)
+    type_order = {value: index for index, value in enumerate(type_labels)}
+    by_type.sort(key=lambda row: type_order.get(row['task_type'], len(type_order)))
+    for row in by_type:
+        row['label'] = type_labels.get(row['task_type'], row['task_type'])
+    by_day = list(
+        rollups.values('day').annotate(**{field: Sum(field) for field in totals}).order_by('day')
+    )
+    for row in by_type + by_day:
+        row['solve_rate'] = row['correct_count'] / row['attempts'] if row['attempts'] else None
+        row['seconds_per_task'] = round(row['time_spent_seconds'] / row['attempts']) if row['attempts'] else None
+    return by_type, by_day
@@ -0,0 +1,246 @@
+"""Выгрузка матрицы ответов (ученики × задания) для анализа вне Django.
+
+Результат - каталог с файлами в формате .npy (их можно открыть
+numpy.load(..., mmap_mode='r') без разбора JSON) и манифестом:
+
+- students.npy - id учеников (строки матрицы), int64;
+- tasks.npy - id заданий (столбцы матрицы), int64;
+- responses.npy - коды ответов (см. RESPONSE_CODES), uint8;
+- answer_ids.npy - номера исходных ответов в таблице строк, int32;
+- answer_offsets.npy и answer_strings.bin - таблица строк: ответ с номером i
+  занимает байты [offsets[i], offsets[i + 1]) файла в UTF-8;
+- manifest.json - описание выгрузки.
+
+Выполнения читаются итератором в порядке учеников, строки матрицы
+дописываются в файлы по мере чтения, поэтому в памяти находится только
+текущий ученик и таблица различных ответов. Для ученика берется последнее
+завершенное выполнение каждого варианта.
+"""
+import ast
+import json
+import os
+import sys
+from array import array
+
+from django.utils import timezone
+
+from tasks.grading import bulk_grade
+from .models import Variant, VariantExecution
+from .regrade import FINISHED_STATUSES
+
+ANSWERS_MATRIX_CHUNK_SIZE = 2000
+
+# Коды ответов в responses.npy
+RESPONSE_MISSING = 0  # Ученик не выполнял вариант с этим заданием
+RESPONSE_CORRECT = 1
+RESPONSE_WRONG = 2
+RESPONSE_BLANK = 3  # Вариант выполнен, но ответ не дан
+
+RESPONSE_CODES = {
+    RESPONSE_MISSING: 'нет выполнения',
+    RESPONSE_CORRECT: 'верно',
+    RESPONSE_WRONG: 'неверно',
+    RESPONSE_BLANK: 'нет ответа',
+}
+
+# Размер заголовка .npy: место под форму массива резервируется заранее,
+# так как количество строк известно только в конце выгрузки
+NPY_HEADER_SIZE = 128
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+
+# Типы array и соответствующие им типы NumPy (little-endian)
+NPY_DTYPES = {
+    'q': '<i8',
+    'i': '<i4',
+    'B': '|u1',
+}
+
+
+def format_npy_header(typecode, shape):
+    """Заголовок .npy версии 1.0 фиксированного размера"""
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': %r, }" % (NPY_DTYPES[typecode], tuple(shape))
+    padding = NPY_HEADER_SIZE - len(NPY_MAGIC) - 2 - len(header) - 1
+    if padding < 0:
+        raise ValueError('Форма массива не помещается в заголовок .npy')
+    header = header + ' ' * padding + '\n'
+    return NPY_MAGIC + len(header).to_bytes(2, 'little') + header.encode('latin1')
+
+
+class NpyWriter:
+    """Запись массива .npy построчно (строки дописываются, заголовок - в конце)"""
+
+    def __init__(self, path, typecode, columns=None):
+        self.typecode = typecode
+        self.columns = columns
+        self.rows_count = 0
+        self.file = open(path, 'wb')
+        self.file.write(b'\0' * NPY_HEADER_SIZE)
+
+    def append(self, values):
+        """Дописать строку (или элементы одномерного массива)"""
+        values = array(self.typecode, values)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        values.tofile(self.file)
+        self.rows_count += 1 if self.columns is not None else len(values)
+
+    def close(self):
+        """Записать заголовок с итоговой формой массива и закрыть файл"""
+        shape = (self.rows_count, self.columns) if self.columns is not None else (self.rows_count,)
+        self.file.seek(0)
+        self.file.write(format_npy_header(self.typecode, shape))
+        self.file.close()
+        return shape
+
+
+def read_npy(path):
+    """Прочитать .npy, записанный NpyWriter (форма и array), для проверки без NumPy"""
+    typecodes = {dtype: typecode for typecode, dtype in NPY_DTYPES.items()}
+    with open(path, 'rb') as npy_file:
+        if npy_file.read(len(NPY_MAGIC)) != NPY_MAGIC:
+            raise ValueError(f'{path}: это не файл .npy версии 1.0')
+        header_length = int.from_bytes(npy_file.read(2), 'little')
+        header = ast.literal_eval(npy_file.read(header_length).decode('latin1'))
+        values = array(typecodes[header['descr']])
+        values.frombytes(npy_file.read())
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return header['shape'], values
+
+
+class StringTable:
+    """Таблица различных строк: номер строки и смещения в общем буфере UTF-8"""
+
+    def __init__(self, path):
+        self.ids = {'': 0}
+        self.offsets = array('q', [0, 0])
+        self.file = open(path, 'wb')
+
+    def get_id(self, value):
+        """Номер строки в таблице (строка добавляется при первом появлении)"""
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.ids)
+            data = value.encode('utf-8')
+            self.file.write(data)
+            self.offsets.append(self.offsets[-1] + len(data))
+        return string_id
+
+    def close(self, offsets_path):
+        """Закрыть буфер и записать смещения строк"""
+        self.file.close()
+        writer = NpyWriter(offsets_path, 'q')
+        writer.append(self.offsets)
+        writer.close()
+        return len(self.ids)
+
+
+def get_matrix_columns(variants):
+    """Задания вариантов без повторов: (task_id, task_type, subtype) и ключи проверки вариантов"""
+    columns = []
+    column_index = {}
+    grading_keys = {}
+    for variant in variants:
+        grading_keys[variant.id] = variant.get_grading_keys()
+        for task_id, task_type, subtype, correct_answer in grading_keys[variant.id]:
+            if task_id not in column_index:
+                column_index[task_id] = len(columns)
+                columns.append((task_id, task_type, subtype))
+    return columns, column_index, grading_keys
+
+
+def iter_student_executions(variant_ids, group=None, chunk_size=ANSWERS_MATRIX_CHUNK_SIZE):
+    """Завершенные выполнения, сгруппированные по ученикам: (student_id, список выполнений)"""
+    executions = VariantExecution.objects.filter(
+        variant_id__in=variant_ids, status__in=FINISHED_STATUSES
+    )
+    if group:
+        executions = executions.filter(student__student_groups=group)
+    executions = executions.order_by('student_id', 'completed_at', 'id').only(
+        'id', 'student_id', 'variant_id', 'answers', 'grade_map'
+    )
+    student_id = None
+    student_executions = []
+    for execution in executions.iterator(chunk_size=chunk_size):
+        if execution.student_id != student_id and student_executions:
+            yield student_id, student_executions
+            student_executions = []
+        student_id = execution.student_id
+        student_executions.append(execution)
+    if student_executions:
+        yield student_id, student_executions
+
+
+def export_answers_matrix(output_dir, variant_ids, group=None, chunk_size=ANSWERS_MATRIX_CHUNK_SIZE, progress=None):
+    """Выгрузить матрицу ответов по вариантам (и группе) в каталог.
+
+    Возвращает манифест выгрузки.
+    """
+    variants = list(Variant.objects.filter(id__in=variant_ids).order_by('id'))
+    columns, column_index, grading_keys = get_matrix_columns(variants)
+    os.makedirs(output_dir, exist_ok=True)
+
+    def path(name):
+        return os.path.join(output_dir, name)
+
+    students = NpyWriter(path('students.npy'), 'q')
+    responses = NpyWriter(path('responses.npy'), 'B', len(columns))
+    answer_ids = NpyWriter(path('answer_ids.npy'), 'i', len(columns))
+    strings = StringTable(path('answer_strings.bin'))
+    executions_count = 0
+    for student_id, executions in iter_student_executions(
+        [variant.id for variant in variants], group, chunk_size
+    ):
+        row_responses = [RESPONSE_MISSING] * len(columns)
+        row_answer_ids = [0] * len(columns)
+        # Выполнения идут по времени завершения, поэтому последнее перекрывает предыдущие
+        for execution in executions:
+            keys = grading_keys[execution.variant_id]
+            grade_map = execution.grade_map
+            if len(grade_map) != len(keys):
+                grade_map = bulk_grade(keys, [execution.answers])[0]
+            for (task_id, *_), is_correct in zip(keys, grade_map):
+                column = column_index[task_id]
+                answer = str(execution.answers.get(str(task_id), ''))
+                if not answer.strip():
+                    row_responses[column] = RESPONSE_BLANK
+                elif is_correct == '1':
+                    row_responses[column] = RESPONSE_CORRECT
+                else:
+                    row_responses[column] = RESPONSE_WRONG
+                row_answer_ids[column] = strings.get_id(answer)
+        students.append([student_id])
+        responses.append(row_responses)
+        answer_ids.append(row_answer_ids)
+        executions_count += len(executions)
+        if progress and students.rows_count % chunk_size == 0:
+            progress(students.rows_count)
+
+    tasks = NpyWriter(path('tasks.npy'), 'q')
+    tasks.append([task_id for task_id, task_type, subtype in columns])
+    manifest = {
+        'created_at': timezone.now().isoformat(),
+        'variant_ids': [variant.id for variant in variants],
+        'group_id': group.id if group else None,
+        'students_count': students.close()[0],
+        'tasks_count': tasks.close()[0],
+        'executions_count': executions_count,
+        'strings_count': strings.close(path('answer_offsets.npy')),
+        'shape': list(responses.close()),
+        'task_types': [task_type for task_id, task_type, subtype in columns],
+        'task_subtypes': [subtype or '' for task_id, task_type, subtype in columns],
+        'response_codes': {str(code): label for code, label in RESPONSE_CODES.items()},
+        'files': {
+            'students': 'students.npy',
+            'tasks': 'tasks.npy',
+            'responses': 'responses.npy',
+            'answer_ids': 'answer_ids.npy',
+            'answer_offsets': 'answer_offsets.npy',
+            'answer_strings': 'answer_strings.bin',
+        },
+    }
+    answer_ids.close()
+    with open(path('manifest.json'), 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, ensure_ascii=False, indent=2)
+    return manifest
@@ -0,0 +1,234 @@
+"""Назначения ученика вместе с состоянием последнего выполнения.
+
+Статус, результат и дата завершения последнего выполнения назначения
+добавляются к выборке подзапросами, поэтому список назначений любой длины
+читается одним запросом. Завершенные назначения уходят в архив, оба списка
+листаются по ключу (assigned_at, id) без OFFSET.
+
+Назначение группе и отзыв назначений выполняются наборами: один bulk_create
+и один UPDATE в транзакции, сколько бы учеников ни было в группе.
+"""
+import random
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import BooleanField, Count, Exists, ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import VariantAssignment, VariantExecution, VariantTask
+
+FINISHED_STATUSES = ['completed', 'timeout']
+
+ASSIGNMENTS_PAGE_SIZE = 20
+
+# Архивация назначений (см. sweep_assignments): сколько дней после срока
+# ждать незавершенное назначение и сколько хранить завершенное среди активных
+ASSIGNMENT_DEADLINE_GRACE_DAYS = 7
+ASSIGNMENT_ARCHIVE_AFTER_DAYS = 30
+ASSIGNMENT_SWEEP_BATCH_SIZE = 500
+
+# Режимы назначения, если у ученика уже есть активное назначение выбранного варианта
+ASSIGN_MODE_REUSE = 'reuse'  # Оставить существующее назначение
+ASSIGN_MODE_REPLACE = 'replace'  # Отозвать существующее и назначить заново
+ASSIGN_MODE_NEW = 'new'  # Создать еще одно назначение
+
+# Порядок выполнений назначения от последнего: неначатые (started_at = NULL)
+# идут в конце на любой СУБД (в PostgreSQL NULL при DESC был бы первым)
+LATEST_EXECUTION_ORDER = [F('started_at').desc(nulls_last=True), '-id']
+
+ASSIGN_MODE_CHOICES = [
+    (ASSIGN_MODE_REUSE, 'Не назначать повторно, если вариант уже назначен'),
+    (ASSIGN_MODE_REPLACE, 'Отозвать прежние назначения и назначить заново'),
+    (ASSIGN_MODE_NEW, 'Всегда создавать новое назначение'),
+]
+
+
+def with_execution_status(assignments):
+    """Добавить к назначениям состояние последнего выполнения и количество заданий"""
+    latest_execution = VariantExecution.objects.filter(assignment=OuterRef('pk')).order_by(*LATEST_EXECUTION_ORDER)
+    tasks_count = VariantTask.objects.filter(variant=OuterRef('variant')).values('variant').annotate(
+        count=Count('id')
+    ).values('count')
+    return assignments.annotate(
+        latest_execution_id=Subquery(latest_execution.values('id')[:1]),
+        latest_execution_status=Subquery(latest_execution.values('status')[:1]),
+        latest_execution_score=Subquery(latest_execution.values('score')[:1]),
+        latest_execution_completed_at=Subquery(latest_execution.values('completed_at')[:1]),
+        tasks_count=Coalesce(Subquery(tasks_count, output_field=IntegerField()), 0),
+    ).annotate(
+        is_finished=ExpressionWrapper(
+            Q(latest_execution_status__in=FINISHED_STATUSES), output_field=BooleanField()
+        ),
+    )
+
+
+def get_student_assignments(student, archived=False):
+    """Назначения ученика: активные к выполнению или (archived=True) завершенные и архивные"""
+    if archived:
+        assignments = with_execution_status(
+            VariantAssignment.objects.filter(student=student).filter(Q(is_active=True) | Q(is_archived=True))
+        ).filter(Q(latest_execution_status__in=FINISHED_STATUSES) | Q(is_archived=True))
+    else:
+        assignments = with_execution_status(
+            VariantAssignment.objects.filter(student=student, is_active=True)
+        ).filter(
+            Q(latest_execution_status__isnull=True) | ~Q(latest_execution_status__in=FINISHED_STATUSES)
+        )
+    return assignments.select_related('variant', 'variant__created_by').order_by('-assigned_at', '-id')
+
+
+def format_assignments_cursor(assignment):
+    """Курсор страницы назначений: дата назначения и id последнего показанного"""
+    return f'{assignment.assigned_at.isoformat()}_{assignment.id}'
+
+
+def parse_assignments_cursor(value):
+    """Разобрать курсор страницы назначений (None, если он некорректен)"""
+    if not value:
+        return None
+    assigned_at, separator, assignment_id = value.rpartition('_')
+    try:
+        return datetime.fromisoformat(assigned_at), int(assignment_id)
+    except ValueError:
+        return None
+
+
+def get_assignments_page(assignments, cursor=None, page_size=ASSIGNMENTS_PAGE_SIZE):
+    """Страница назначений после курсора.
+
+    Возвращает (назначения страницы, курсор следующей страницы или None).
+    """
+    position = parse_assignments_cursor(cursor)
+    if position:
+        assigned_at, assignment_id = position
+        assignments = assignments.filter(
+            Q(assigned_at__lt=assigned_at) | Q(assigned_at=assigned_at, id__lt=assignment_id)
+        )
+    page = list(assignments[:page_size + 1])
+    if len(page) > page_size:
+        page = page[:page_size]
+        return page, format_assignments_cursor(page[-1])
+    return page, None
+
+
+def build_assignment_items(assignments):
+    """Элементы списка назначений для шаблонов (без дополнительных запросов)"""
+    now = timezone.now()
+    items = []
+    for assignment in assignments:
+        execution = None
+        if assignment.latest_execution_id:
+            execution = {
+                'id': assignment.latest_execution_id,
+                'status': assignment.latest_execution_status,
+                'score': assignment.latest_execution_score,
+                'completed_at': assignment.latest_execution_completed_at,
+            }
+        items.append({
+            'assignment': assignment,
+            'variant': assignment.variant,
+            'execution': execution,
+            'tasks_count': assignment.tasks_count,
+            'is_completed': assignment.is_finished,
+            'is_open': not assignment.opens_at or now >= assignment.opens_at,
+            'is_overdue': bool(assignment.deadline and now > assignment.deadline and not assignment.is_finished),
+        })
+    return items
+
+
+def revoke_assignments(students, variants):
+    """Отозвать активные назначения вариантов ученикам (одним UPDATE).
+
+    Заранее подготовленные и не начатые выполнения отозванных назначений
+    удаляются. Возвращает количество отозванных назначений.
+    """
+    assignments = VariantAssignment.objects.filter(student__in=students, variant__in=variants, is_active=True)
+    with transaction.atomic():
+        VariantExecution.objects.filter(assignment__in=assignments, status='not_started').delete()
+        return assignments.update(is_active=False)
+
+
+def assign_variants(students, variants, assigned_by, deadline=None, opens_at=None, mode=ASSIGN_MODE_REUSE):
+    """Распределить варианты между учениками по кругу в случайном порядке.
+
+    Назначения создаются одним bulk_create в транзакции; при opens_at
+    выполнения готовятся заранее (см. VariantAssignment.provision_executions).
+    Возвращает (создано, оставлено прежних, отозвано).
+    """
+    students = list(students)
+    variants = list(variants)
+    random.shuffle(variants)
+    pairs = [(variants[i % len(variants)], student) for i, student in enumerate(students)]
+    with transaction.atomic():
+        reused_count = revoked_count = 0
+        if mode == ASSIGN_MODE_REPLACE:
+            revoked_count = revoke_assignments(students, variants)
+        elif mode == ASSIGN_MODE_REUSE:
+            # Пропускаем только тех, кому уже назначен именно выпавший ему вариант
+            assigned_pairs = set(VariantAssignment.objects.filter(
+                student__in=students, variant__in=variants, is_active=True
+            ).values_list('variant_id', 'student_id'))
+            new_pairs = [(variant, student) for variant, student in pairs if (variant.id, student.id) not in assigned_pairs]
+            reused_count = len(pairs) - len(new_pairs)
+            pairs = new_pairs
+        assigned_at = timezone.now()
+        assignments = VariantAssignment.objects.bulk_create([
+            VariantAssignment(
+                variant=variant,
+                student=student,
+                assigned_by=assigned_by,
+                deadline=deadline,
+                opens_at=opens_at,
+                is_active=True,
+                assigned_at=assigned_at,
+            )
+            for variant, student in pairs
+        ])
+        if opens_at:
+            # Контрольная работа по расписанию: выполнения готовятся заранее
+            VariantAssignment.provision_executions(assignments)
+    return len(assignments), reused_count, revoked_count
+
+
+def get_overdue_assignments(teacher):
+    """Просроченные незавершенные активные назначения учителя (для админа - все)"""
+    finished = VariantExecution.objects.filter(assignment=OuterRef('pk'), status__in=FINISHED_STATUSES)
+    assignments = VariantAssignment.objects.filter(is_active=True, deadline__lt=timezone.now())
+    if teacher.role != 'admin':
+        assignments = assignments.filter(assigned_by=teacher)
+    return assignments.filter(~Exists(finished)).select_related('variant', 'student').order_by('deadline', 'id')
+
+
+def archive_in_batches(assignments, batch_size):
+    """Перевести назначения в архив порциями (UPDATE по списку id); возвращает количество"""
+    archived_count = 0
+    while True:
+        with transaction.atomic():
+            ids = list(assignments.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return archived_count
+            archived_count += VariantAssignment.objects.filter(id__in=ids, is_active=True).update(
+                is_active=False, is_archived=True
+            )
+
+
+def sweep_assignments(grace_days=ASSIGNMENT_DEADLINE_GRACE_DAYS, archive_after_days=ASSIGNMENT_ARCHIVE_AFTER_DAYS,
+                      batch_size=ASSIGNMENT_SWEEP_BATCH_SIZE, dry_run=False):
+    """Убрать из активных просроченные и давно завершенные назначения.
+
+    Незавершенные назначения со сроком, истекшим более grace_days дней назад,
+    и назначения, завершенные более archive_after_days дней назад, становятся
+    неактивными и попадают в архив ученика. Возвращает (просрочено, завершено).
+    """
+    now = timezone.now()
+    finished = VariantExecution.objects.filter(assignment=OuterRef('pk'), status__in=FINISHED_STATUSES)
+    expired = VariantAssignment.objects.filter(
+        is_active=True, deadline__lt=now - timedelta(days=grace_days)
+    ).filter(~Exists(finished))
+    completed = VariantAssignment.objects.filter(is_active=True).filter(
+        Exists(finished.filter(completed_at__lt=now - timedelta(days=archive_after_days)))
+    )
+    if dry_run:
+        return expired.count(), completed.count()
+    return archive_in_batches(expired, batch_size), archive_in_batches(completed, batch_size)
@@ -0,0 +1,42 @@
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+# Время жизни закешированного содержимого варианта (в секундах).
+# Ключ кеша включает версию содержимого, поэтому устаревшие записи
+# просто перестают запрашиваться и вытесняются по таймауту.
+VARIANT_CONTENT_CACHE_TIMEOUT = 60 * 60 * 6
+
+
+def get_variant_content_cache_key(variant_id, version):
+    """Ключ кеша для содержимого заданий варианта"""
+    return f'variant_content:{variant_id}:{version}'
+
+
+def get_variant_content(variant, version=None):
+    """Получить отрендеренное содержимое заданий варианта.
+
+    Содержимое общее для всех учеников, выполняющих вариант: HTML заданий
+    и боковой панели рендерится один раз и кешируется по id варианта и версии
+    содержимого. Состояние конкретного ученика (ответы, таймер, текущее задание)
+    в кеш не попадает и подставляется на каждом запросе отдельно.
+    """
+    if version is None:
+        version = variant.get_content_version()
+
+    cache_key = get_variant_content_cache_key(variant.id, version)
+    content = cache.get(cache_key)
+    if content is not None:
+        return content
+
+    tasks = list(variant.variant_tasks.select_related('task').order_by('order'))
+    content = {
+        'version': version,
+        'tasks': [
+            {'task_id': variant_task.task_id, 'order': variant_task.order}
+            for variant_task in tasks
+        ],
+        'sidebar_html': render_to_string('variants/variant_execute_sidebar.html', {'tasks': tasks}),
+        'tasks_html': render_to_string('variants/variant_execute_tasks.html', {'tasks': tasks}),
+    }
+    cache.set(cache_key, content, VARIANT_CONTENT_CACHE_TIMEOUT)
+    return content
@@ -1,4 +1,5 @@
 from django import forms
+from .assignments import ASSIGN_MODE_CHOICES, ASSIGN_MODE_REUSE
 from .models import Variant, VariantAssignment
 from tasks.models import Task
 from users.models import Group
@@ -118,7 +119,19 @@ class VariantFromSpecificTasksForm(forms.ModelForm):
         self.fields['tasks'].widget.attrs['class'] = 'form-check-input'
 
 
-class AssignVariantToStudentForm(forms.Form):
+class AssignmentScheduleMixin:
+    """Проверка времени открытия и срока назначения"""
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        opens_at = cleaned_data.get('opens_at')
+        deadline = cleaned_data.get('deadline')
+        if opens_at and deadline and opens_at >= deadline:
+            self.add_error('opens_at', 'Время открытия должно быть раньше срока выполнения')
+        return cleaned_data
+
+
+class AssignVariantToStudentForm(AssignmentScheduleMixin, forms.Form):
     """Форма для назначения варианта конкретному ученику"""
     variant = forms.ModelChoiceField(
         label='Вариант',
@@ -138,6 +151,18 @@ class AssignVariantToStudentForm(forms.Form):
         widget=forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
         help_text='Оставьте пустым, если срок не установлен'
     )
+    opens_at = forms.DateTimeField(
+        label='Открыть в',
+        required=False,
+        widget=forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
+        help_text='Для контрольной работы: до этого времени вариант нельзя начать'
+    )
+    mode = forms.ChoiceField(
+        label='Если вариант уже назначен',
+        choices=ASSIGN_MODE_CHOICES,
+        initial=ASSIGN_MODE_REUSE,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
     
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
@@ -152,7 +177,7 @@ class AssignVariantToStudentForm(forms.Form):
                 self.fields['student'].queryset = user.__class__.objects.filter(role='student', created_by=user)
 
 
-class AssignVariantsToGroupForm(forms.Form):
+class AssignVariantsToGroupForm(AssignmentScheduleMixin, forms.Form):
     """Форма для назначения вариантов группе"""
     group = forms.ModelChoiceField(
         label='Группа',
@@ -173,6 +198,18 @@ class AssignVariantsToGroupForm(forms.Form):
         widget=forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
         help_text='Оставьте пустым, если срок не установлен'
     )
+    opens_at = forms.DateTimeField(
+        label='Открыть в',
+        required=False,
+        widget=forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
+        help_text='Для контрольной работы: до этого времени вариант нельзя начать'
+    )
+    mode = forms.ChoiceField(
+        label='Если вариант уже назначен',
+        choices=ASSIGN_MODE_CHOICES,
+        initial=ASSIGN_MODE_REUSE,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
     
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
@@ -185,6 +222,31 @@ class AssignVariantsToGroupForm(forms.Form):
         self.fields['variants'].widget.attrs['class'] = 'form-check-input'
 
 
+class RevokeVariantsFromGroupForm(forms.Form):
+    """Форма для отзыва назначений вариантов у группы"""
+    group = forms.ModelChoiceField(
+        label='Группа',
+        queryset=None,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        required=True
+    )
+    variants = forms.ModelMultipleChoiceField(
+        label='Варианты',
+        queryset=Variant.objects.none(),
+        widget=forms.CheckboxSelectMultiple(),
+        required=True,
+        help_text='Активные назначения выбранных вариантов ученикам группы будут отозваны'
+    )
+    
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+        if user:
+            self.fields['group'].queryset = Group.objects.filter(created_by=user)
+            self.fields['variants'].queryset = Variant.objects.filter(created_by=user)
+        self.fields['variants'].widget.attrs['class'] = 'form-check-input'
+
+
 class VariantByNumberForm(forms.Form):
     """Форма для выполнения варианта по номеру"""
     variant_id = forms.IntegerField(
@@ -193,3 +255,31 @@ class VariantByNumberForm(forms.Form):
         required=True,
         help_text='Введите ID варианта для начала выполнения'
     )
+
+
+class AnalyticsPeriodForm(forms.Form):
+    """Форма выбора периода и группы для аналитики учителя"""
+    group = forms.ModelChoiceField(
+        label='Группа',
+        queryset=Group.objects.none(),
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        required=False,
+        empty_label='Все ученики'
+    )
+    date_from = forms.DateField(
+        label='С',
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    date_to = forms.DateField(
+        label='По',
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+        if user:
+            # Показываем только группы, созданные текущим пользователем
+            self.fields['group'].queryset = Group.objects.filter(created_by=user)
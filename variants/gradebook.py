@@ -0,0 +1,122 @@
+"""Выгрузка журнала оценок группы.
+
+Строки журнала - ученики группы, столбцы - варианты учителя (результат,
+статус и отметки по заданиям). Данные берутся из сводок учеников
+(VariantStudentStats) и читаются итератором порциями, поэтому выгрузка
+за учебный год не накапливается в памяти целиком.
+"""
+import csv
+import tempfile
+
+from django.db.models import Count
+
+from .models import Variant, VariantExecution, VariantStudentStats
+
+try:
+    import openpyxl
+except ImportError:  # Выгрузка в XLSX доступна только при установленном openpyxl
+    openpyxl = None
+
+GRADEBOOK_CHUNK_SIZE = 2000
+
+# Обозначения заданий в журнале
+GRADEBOOK_TASK_MARKS = {
+    VariantStudentStats.TASK_CORRECT: '+',
+    VariantStudentStats.TASK_INCORRECT: '-',
+    VariantStudentStats.TASK_NOT_ANSWERED: '',
+}
+
+STATUS_LABELS = dict(VariantExecution.STATUS_CHOICES)
+
+
+def get_gradebook_variants(group, teacher):
+    """Варианты учителя, которые выполняли ученики группы (по порядку создания)"""
+    return list(
+        Variant.objects.filter(
+            created_by=teacher,
+            student_stats__student__student_groups=group,
+            student_stats__execution__isnull=False,
+        ).distinct().annotate(tasks_count=Count('variant_tasks', distinct=True)).order_by('id')
+    )
+
+
+def get_gradebook_header(variants):
+    """Заголовок журнала"""
+    header = ['Ученик', 'Логин']
+    for variant in variants:
+        header.append(f'{variant.name}: результат')
+        header.append(f'{variant.name}: статус')
+        header.extend(f'{variant.name}: №{number}' for number in range(1, variant.tasks_count + 1))
+    return header
+
+
+def get_variant_cells(variant, stat):
+    """Ячейки журнала по одному варианту"""
+    if stat is None or stat.status == 'not_started':
+        return [''] * (2 + variant.tasks_count)
+    marks = [GRADEBOOK_TASK_MARKS[status] for status in stat.task_statuses[:variant.tasks_count]]
+    marks.extend([''] * (variant.tasks_count - len(marks)))
+    return [f'{stat.correct_count}/{stat.total_count}', STATUS_LABELS.get(stat.status, stat.status)] + marks
+
+
+def iter_gradebook_rows(group, variants, chunk_size=GRADEBOOK_CHUNK_SIZE):
+    """Строки журнала (без заголовка).
+
+    Ученики и их сводки читаются двумя итераторами в одинаковом порядке
+    и сливаются, так что в памяти находится только текущий ученик.
+    """
+    order = ['last_name', 'first_name', 'id']
+    students = group.students.order_by(*order).only('id', 'username', 'first_name', 'last_name')
+    stats = VariantStudentStats.objects.filter(
+        student__student_groups=group,
+        variant_id__in=[variant.id for variant in variants],
+    ).order_by(*[f'student__{field}' for field in order]).only(
+        'student_id', 'variant_id', 'status', 'correct_count', 'total_count', 'task_statuses'
+    )
+
+    stats_iterator = stats.iterator(chunk_size=chunk_size)
+    next_stat = next(stats_iterator, None)
+    for student in students.iterator(chunk_size=chunk_size):
+        student_stats = {}
+        while next_stat is not None and next_stat.student_id == student.id:
+            student_stats[next_stat.variant_id] = next_stat
+            next_stat = next(stats_iterator, None)
+
+        row = [student.get_full_name(), student.username]
+        for variant in variants:
+            row.extend(get_variant_cells(variant, student_stats.get(variant.id)))
+        yield row
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает записанную строку вместо сохранения"""
+
+    def write(self, value):
+        return value
+
+
+def stream_gradebook_csv(group, teacher):
+    """Журнал в формате CSV (построчно)"""
+    variants = get_gradebook_variants(group, teacher)
+    writer = csv.writer(Echo(), delimiter=';')
+    # BOM нужен, чтобы Excel распознал кодировку UTF-8
+    yield '\ufeff'
+    yield writer.writerow(get_gradebook_header(variants))
+    for row in iter_gradebook_rows(group, variants):
+        yield writer.writerow(row)
+
+
+def build_gradebook_xlsx(group, teacher):
+    """Журнал в формате XLSX во временном файле (требуется openpyxl)"""
+    variants = get_gradebook_variants(group, teacher)
+    # В режиме write_only строки сразу записываются на диск
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title='Журнал')
+    worksheet.append(get_gradebook_header(variants))
+    for row in iter_gradebook_rows(group, variants):
+        worksheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from users.models import Group
+from variants.answers_matrix import ANSWERS_MATRIX_CHUNK_SIZE, export_answers_matrix
+
+
+class Command(BaseCommand):
+    help = 'Выгружает матрицу ответов (ученики × задания) по вариантам в каталог файлов .npy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help='Каталог для файлов выгрузки')
+        parser.add_argument(
+            '--variant',
+            type=int,
+            action='append',
+            required=True,
+            help='Id варианта (можно указать несколько раз)'
+        )
+        parser.add_argument('--group', type=int, help='Только ученики группы')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=ANSWERS_MATRIX_CHUNK_SIZE,
+            help='Размер порции выполнений'
+        )
+
+    def handle(self, *args, **options):
+        group = None
+        if options['group']:
+            try:
+                group = Group.objects.get(id=options['group'])
+            except Group.DoesNotExist:
+                raise CommandError(f'Группа {options["group"]} не найдена')
+
+        def progress(students_count):
+            self.stdout.write(f'Выгружено учеников: {students_count}')
+
+        manifest = export_answers_matrix(
+            options['output_dir'], options['variant'], group, options['chunk_size'], progress=progress
+        )
+        students_count, tasks_count = manifest['shape']
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружена матрица {students_count} × {tasks_count}, '
+            f'различных ответов: {manifest["strings_count"]}'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from variants.mastery import rebuild_student_mastery
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает профиль освоения типов заданий по истории завершенных выполнений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, help='Пересчитать профиль только указанного ученика')
+
+    def handle(self, *args, **options):
+        student_ids = [options['student']] if options['student'] else None
+        replayed_count, regraded_count = rebuild_student_mastery(student_ids)
+        self.stdout.write(
+            self.style.SUCCESS(f'Учтено выполнений: {replayed_count}, из них проверено заново: {regraded_count}')
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from variants.analytics import refresh_item_analysis, rebuild_variant_item_analysis
+
+
+class Command(BaseCommand):
+    help = 'Добавляет в анализ заданий выполнения, завершенные с прошлого запуска'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild-variant',
+            type=int,
+            help='Пересчитать статистику заданий варианта по уже обработанным выполнениям'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Размер порции выполнений')
+
+    def handle(self, *args, **options):
+        if options['rebuild_variant']:
+            rebuild_variant_item_analysis(options['rebuild_variant'], options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f'Статистика варианта {options["rebuild_variant"]} пересчитана'))
+        
+        def progress(processed_count):
+            self.stdout.write(f'Обработано выполнений: {processed_count}')
+        
+        processed_count = refresh_item_analysis(options['chunk_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'Добавлено выполнений в анализ заданий: {processed_count}'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from variants.analytics import refresh_rollups, reset_rollups
+
+
+class Command(BaseCommand):
+    help = 'Добавляет в дневные итоги выполнения, завершенные с прошлого запуска'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Удалить накопленные итоги и пересчитать их по всей истории'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Размер порции выполнений')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            reset_rollups()
+            self.stdout.write('Накопленные итоги удалены')
+        
+        def progress(processed_count):
+            self.stdout.write(f'Обработано выполнений: {processed_count}')
+        
+        processed_count = refresh_rollups(options['chunk_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'Добавлено выполнений в дневные итоги: {processed_count}'))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from tasks.models import Task
+from variants.models import VariantExecution
+from variants.regrade import regrade_executions, regrade_task_executions
+
+
+class Command(BaseCommand):
+    help = 'Перепроверяет завершенные выполнения вариантов и сохраняет результат'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--variant', type=int, help='Перепроверить только выполнения указанного варианта')
+        parser.add_argument('--task', type=int, help='Перепроверить выполнения всех вариантов, содержащих задание')
+        parser.add_argument(
+            '--ungraded',
+            action='store_true',
+            help='Проверить только выполнения, для которых еще нет сохраненного результата'
+        )
+
+    def handle(self, *args, **options):
+        if options['task'] is not None:
+            self.regrade_task(options['task'])
+            return
+        
+        executions = VariantExecution.objects.all()
+        if options['variant']:
+            executions = executions.filter(variant_id=options['variant'])
+        if options['ungraded']:
+            executions = executions.filter(graded_at__isnull=True)
+        
+        processed_count, changed_count = regrade_executions(executions, progress=self.report_progress)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Перепроверено выполнений: {processed_count}, изменился результат: {changed_count}'
+            )
+        )
+
+    def report_progress(self, processed_count, changed_count, total_count):
+        self.stdout.write(f'Проверено {processed_count}/{total_count}, изменено {changed_count}')
+
+    def regrade_task(self, task_id):
+        try:
+            task = Task.objects.get(id=task_id)
+        except Task.DoesNotExist:
+            raise CommandError(f'Задание {task_id} не найдено')
+        
+        processed_count, changed_count = regrade_task_executions(task, progress=self.report_progress)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Перепроверено выполнений: {processed_count}, изменился результат: {changed_count}'
+            )
+        )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from variants.assignments import (
+    ASSIGNMENT_ARCHIVE_AFTER_DAYS, ASSIGNMENT_DEADLINE_GRACE_DAYS, ASSIGNMENT_SWEEP_BATCH_SIZE, sweep_assignments
+)
+
+
+class Command(BaseCommand):
+    help = 'Переводит в архив просроченные и давно завершенные назначения (запускать по расписанию)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-days',
+            type=int,
+            default=ASSIGNMENT_DEADLINE_GRACE_DAYS,
+            help='Сколько дней после срока ждать незавершенное назначение'
+        )
+        parser.add_argument(
+            '--archive-after-days',
+            type=int,
+            default=ASSIGNMENT_ARCHIVE_AFTER_DAYS,
+            help='Через сколько дней после завершения убирать назначение из активных'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=ASSIGNMENT_SWEEP_BATCH_SIZE,
+            help='Размер порции обновления'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать назначения')
+
+    def handle(self, *args, **options):
+        expired_count, completed_count = sweep_assignments(
+            options['grace_days'], options['archive_after_days'], options['batch_size'], options['dry_run']
+        )
+        action = 'Будет переведено в архив' if options['dry_run'] else 'Переведено в архив'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action}: просроченных {expired_count}, завершенных {completed_count}'
+        ))
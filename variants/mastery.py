@@ -0,0 +1,156 @@
+"""Профиль освоения типов заданий учеником.
+
+При завершении выполнения каждое задание варианта считается попыткой
+по его типу и подтипу. Для каждой пары (ученик, тип, подтип) хранятся
+количество попыток, правильных ответов и экспоненциальное среднее
+правильности, в котором недавние попытки весят больше старых.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from tasks.grading import bulk_grade
+from tasks.models import Task
+from .models import Variant, VariantExecution, StudentMastery
+
+# Вес новой попытки в экспоненциальном среднем
+MASTERY_ALPHA = 0.3
+
+# Границы освоения для раскраски (доля, класс Bootstrap)
+MASTERY_LEVELS = [
+    (0.8, 'success'),
+    (0.5, 'warning'),
+    (0, 'danger'),
+]
+
+
+def get_mastery_level(score):
+    """Класс цвета для значения освоения"""
+    for threshold, level in MASTERY_LEVELS:
+        if score >= threshold:
+            return level
+    return MASTERY_LEVELS[-1][1]
+
+
+def update_mastery_for_execution(execution, grading_keys, grade_map):
+    """Учесть завершенное выполнение в профиле освоения ученика"""
+    results = defaultdict(list)
+    for (task_id, task_type, subtype, correct_answer), is_correct in zip(grading_keys, grade_map):
+        results[(task_type, subtype or '')].append(is_correct == '1')
+    if not results:
+        return
+
+    existing = {
+        (mastery.task_type, mastery.subtype): mastery
+        for mastery in StudentMastery.objects.filter(
+            student_id=execution.student_id,
+            task_type__in={task_type for task_type, subtype in results}
+        )
+    }
+    now = execution.completed_at or timezone.now()
+    to_create = []
+    to_update = []
+    for key, attempts in results.items():
+        mastery = existing.get(key)
+        if mastery is None:
+            mastery = StudentMastery(student_id=execution.student_id, task_type=key[0], subtype=key[1])
+            to_create.append(mastery)
+        else:
+            to_update.append(mastery)
+        for is_correct in attempts:
+            if mastery.attempts:
+                mastery.score = MASTERY_ALPHA * is_correct + (1 - MASTERY_ALPHA) * mastery.score
+            else:
+                mastery.score = float(is_correct)
+            mastery.attempts += 1
+            mastery.correct_count += is_correct
+        mastery.last_attempt_at = now
+
+    StudentMastery.objects.bulk_create(to_create)
+    StudentMastery.objects.bulk_update(to_update, ['attempts', 'correct_count', 'score', 'last_attempt_at'])
+
+
+def rebuild_student_mastery(student_ids=None):
+    """Пересчитать профиль освоения по истории завершенных выполнений.
+
+    Экспоненциальное среднее зависит от порядка попыток, поэтому после
+    перепроверки профиль ученика строится заново, а не исправляется.
+    student_ids ограничивает пересчет указанными учениками.
+    Возвращает (количество учтенных выполнений, из них проверено заново).
+    """
+    executions = VariantExecution.objects.filter(
+        status__in=['completed', 'timeout']
+    ).order_by('completed_at', 'id').only('id', 'variant_id', 'student_id', 'answers', 'grade_map', 'completed_at')
+    mastery = StudentMastery.objects.all()
+    if student_ids is not None:
+        executions = executions.filter(student_id__in=student_ids)
+        mastery = mastery.filter(student_id__in=student_ids)
+
+    grading_keys_cache = {}
+    replayed_count = 0
+    regraded_count = 0
+    # Профиль не остается пустым или частичным, если пересчет прервется
+    with transaction.atomic():
+        mastery.delete()
+        for execution in executions.iterator(chunk_size=1000):
+            if execution.variant_id not in grading_keys_cache:
+                grading_keys_cache[execution.variant_id] = Variant(id=execution.variant_id).get_grading_keys()
+            grading_keys = grading_keys_cache[execution.variant_id]
+            grade_map = execution.grade_map
+            # Выполнения без проверки или проверенные до изменения состава варианта
+            # проверяются заново по текущим заданиям (без сохранения результата)
+            if len(grade_map) != len(grading_keys):
+                grade_map = bulk_grade(grading_keys, [execution.answers])[0]
+                regraded_count += 1
+            update_mastery_for_execution(execution, grading_keys, grade_map)
+            replayed_count += 1
+    return replayed_count, regraded_count
+
+
+def get_student_mastery(student):
+    """Профиль освоения ученика по типам и подтипам (в порядке типов заданий)"""
+    type_order = {value: index for index, (value, label) in enumerate(Task.TASK_TYPE_CHOICES)}
+    mastery_list = list(StudentMastery.objects.filter(student=student))
+    mastery_list.sort(key=lambda mastery: (type_order.get(mastery.task_type, len(type_order)), mastery.subtype))
+    for mastery in mastery_list:
+        mastery.level = get_mastery_level(mastery.score)
+    return mastery_list
+
+
+def get_group_heatmap(group):
+    """Тепловая карта освоения группы: ученики по строкам, типы заданий по столбцам.
+
+    Подтипы объединяются в тип с весом по количеству попыток.
+    Возвращает (список типов [(значение, название)], список строк).
+    """
+    students = list(group.students.order_by('last_name', 'first_name'))
+    cells = defaultdict(lambda: [0, 0.0, 0])
+    for mastery in StudentMastery.objects.filter(student__student_groups=group).only(
+        'student_id', 'task_type', 'attempts', 'correct_count', 'score'
+    ):
+        cell = cells[(mastery.student_id, mastery.task_type)]
+        cell[0] += mastery.attempts
+        cell[1] += mastery.score * mastery.attempts
+        cell[2] += mastery.correct_count
+
+    used_types = {task_type for student_id, task_type in cells}
+    task_types = [(value, label) for value, label in Task.TASK_TYPE_CHOICES if value in used_types]
+
+    rows = []
+    for student in students:
+        row_cells = []
+        for task_type, label in task_types:
+            attempts, weighted_score, correct_count = cells.get((student.id, task_type), (0, 0.0, 0))
+            if attempts:
+                score = weighted_score / attempts
+                row_cells.append({
+                    'score_percent': round(score * 100),
+                    'level': get_mastery_level(score),
+                    'attempts': attempts,
+                    'correct_count': correct_count,
+                })
+            else:
+                row_cells.append(None)
+        rows.append({'student': student, 'cells': row_cells})
+    return task_types, rows
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('variants', '0005_add_assignment_to_execution'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variantexecution',
+            name='grade_map',
+            field=models.TextField(blank=True, default='', verbose_name='Правильность по заданиям'),
+        ),
+        migrations.AddField(
+            model_name='variantexecution',
+            name='graded_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Проверено'),
+        ),
+        migrations.AddField(
+            model_name='variantexecution',
+            name='score',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Правильных ответов'),
+        ),
+        migrations.AddField(
+            model_name='variantexecution',
+            name='total_tasks',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Всего заданий'),
+        ),
+    ]
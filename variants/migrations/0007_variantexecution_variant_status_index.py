@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('variants', '0006_variantexecution_grade'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='variantexecution',
+            index=models.Index(fields=['variant', 'status'], name='variants_exec_variant_status'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('variants', '0007_variantexecution_variant_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variantexecution',
+            name='client_seqs',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Синхронизация клиентов'),
+        ),
+    ]
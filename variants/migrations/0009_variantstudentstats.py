@@ -0,0 +1,88 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_student_stats(apps, schema_editor):
+    """Заполняет сводки учеников по последним выполнениям вариантов"""
+    from tasks.grading import bulk_grade
+    
+    Variant = apps.get_model('variants', 'Variant')
+    VariantTask = apps.get_model('variants', 'VariantTask')
+    VariantExecution = apps.get_model('variants', 'VariantExecution')
+    VariantStudentStats = apps.get_model('variants', 'VariantStudentStats')
+    
+    for variant_id in Variant.objects.values_list('id', flat=True):
+        grading_keys = list(
+            VariantTask.objects.filter(variant_id=variant_id).order_by('order').values_list(
+                'task_id', 'task__task_type', 'task__subtype', 'task__correct_answer'
+            )
+        )
+        # Последнее выполнение каждого ученика
+        latest = {}
+        executions = VariantExecution.objects.filter(variant_id=variant_id).order_by('student_id', '-started_at', '-id')
+        for execution in executions.iterator():
+            latest.setdefault(execution.student_id, execution)
+        
+        stats_list = []
+        grade_maps = bulk_grade(grading_keys, [execution.answers for execution in latest.values()])
+        for execution, grade_map in zip(latest.values(), grade_maps):
+            statuses = []
+            for (task_id, *_), is_correct in zip(grading_keys, grade_map):
+                user_answer = (execution.answers or {}).get(str(task_id))
+                if user_answer is None or not str(user_answer).strip():
+                    statuses.append('.')
+                else:
+                    statuses.append('+' if is_correct == '1' else '-')
+            task_statuses = ''.join(statuses)
+            stats_list.append(VariantStudentStats(
+                variant_id=variant_id,
+                student_id=execution.student_id,
+                execution_id=execution.id,
+                status=execution.status,
+                correct_count=task_statuses.count('+'),
+                answered_count=len(task_statuses) - task_statuses.count('.'),
+                total_count=len(grading_keys),
+                task_statuses=task_statuses,
+                current_task_order=execution.current_task_order,
+                started_at=execution.started_at,
+                completed_at=execution.completed_at,
+            ))
+        VariantStudentStats.objects.bulk_create(stats_list, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('variants', '0008_variantexecution_client_seqs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VariantStudentStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('not_started', 'Не начато'), ('in_progress', 'В процессе'), ('completed', 'Завершено'), ('timeout', 'Завершено по времени')], default='not_started', max_length=20, verbose_name='Статус')),
+                ('correct_count', models.PositiveIntegerField(default=0, verbose_name='Правильных ответов')),
+                ('answered_count', models.PositiveIntegerField(default=0, verbose_name='Дано ответов')),
+                ('total_count', models.PositiveIntegerField(default=0, verbose_name='Всего заданий')),
+                ('task_statuses', models.TextField(blank=True, default='', verbose_name='Статусы заданий')),
+                ('current_task_order', models.PositiveIntegerField(blank=True, null=True, verbose_name='Текущее задание')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начато')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('execution', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='variants.variantexecution', verbose_name='Последнее выполнение')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variant_stats', to=settings.AUTH_USER_MODEL, verbose_name='Ученик')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_stats', to='variants.variant', verbose_name='Вариант')),
+            ],
+            options={
+                'verbose_name': 'Статистика ученика по варианту',
+                'verbose_name_plural': 'Статистика учеников по вариантам',
+                'unique_together': {('variant', 'student')},
+            },
+        ),
+        migrations.RunPython(fill_student_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('variants', '0009_variantstudentstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='variantstudentstats',
+            index=models.Index(fields=['variant', 'updated_at'], name='variants_stats_variant_upd'),
+        ),
+    ]
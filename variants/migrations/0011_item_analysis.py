@@ -0,0 +1,67 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_alter_task_options'),
+        ('variants', '0010_variantstudentstats_updated_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+                ('execution_id', models.PositiveBigIntegerField(default=0, verbose_name='Выполнение')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Отметка аналитики',
+                'verbose_name_plural': 'Отметки аналитики',
+            },
+        ),
+        migrations.CreateModel(
+            name='TaskItemStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('executions_count', models.PositiveIntegerField(default=0, verbose_name='Выполнений')),
+                ('correct_count', models.PositiveIntegerField(default=0, verbose_name='Правильных ответов')),
+                ('answered_count', models.PositiveIntegerField(default=0, verbose_name='Дано ответов')),
+                ('score_sum', models.BigIntegerField(default=0, verbose_name='Сумма баллов')),
+                ('score_sq_sum', models.BigIntegerField(default=0, verbose_name='Сумма квадратов баллов')),
+                ('correct_score_sum', models.BigIntegerField(default=0, verbose_name='Сумма баллов решивших')),
+                ('wrong_answers', models.JSONField(blank=True, default=dict, verbose_name='Неправильные ответы')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Статистика задания в варианте',
+                'verbose_name_plural': 'Статистика заданий в вариантах',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='variantexecution',
+            index=models.Index(fields=['completed_at', 'id'], name='variants_exec_completed'),
+        ),
+        migrations.AddField(
+            model_name='taskitemstats',
+            name='task',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='item_stats', to='tasks.task', verbose_name='Задание'),
+        ),
+        migrations.AddField(
+            model_name='taskitemstats',
+            name='variant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='item_stats', to='variants.variant', verbose_name='Вариант'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='taskitemstats',
+            unique_together={('variant', 'task')},
+        ),
+    ]
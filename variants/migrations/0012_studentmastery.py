@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('variants', '0011_item_analysis'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentMastery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_type', models.CharField(choices=[('1', '1. Анализ информационных моделей'), ('2', '2. Построение таблиц истинности логических выражений'), ('3', '3. Поиск информации в реляционных базах данных'), ('4', '4. Кодирование и декодирование данных. Условие Фано'), ('5', '5. Анализ алгоритмов для исполнителей'), ('6', '6. Циклические алгоритмы для исполнителя'), ('7', '7. Кодирование графической и звуковой информации'), ('8', '8. Комбинаторика'), ('9', '9. Обработка числовой информации в электронных таблицах'), ('10', '10. Поиск слова в текстовом документе'), ('11', '11. Вычисление количества информации'), ('12', '12. Алгоритмы для исполнителей с циклами и ветвлениями'), ('13', '13. IP адресация'), ('14', '14. Позиционные системы счисления'), ('15', '15. Истинность логического выражения'), ('16', '16. Вычисление значения рекурсивной функции'), ('17', '17. Обработка целочисленных данных'), ('18', '18. Робот-сборщик монет'), ('19-21', '19-21. Теория игр'), ('1921', '19-21. Теория игр'), ('22', '22. Многопоточные вычисления'), ('23', '23. Динамическое программирование. Количество программ'), ('24', '24. Обработка тестовых файлов'), ('25', '25. Обработка целочисленных данных. Поиск делителей'), ('26', '26. Обработка данных с помощью сортировки'), ('27', '27. Анализ данных. Кластеризация')], max_length=10, verbose_name='Тип задания')),
+                ('subtype', models.CharField(blank=True, default='', max_length=20, verbose_name='Подтип задания')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток')),
+                ('correct_count', models.PositiveIntegerField(default=0, verbose_name='Правильных ответов')),
+                ('score', models.FloatField(default=0, verbose_name='Освоение')),
+                ('last_attempt_at', models.DateTimeField(blank=True, null=True, verbose_name='Последняя попытка')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mastery', to=settings.AUTH_USER_MODEL, verbose_name='Ученик')),
+            ],
+            options={
+                'verbose_name': 'Освоение типа заданий',
+                'verbose_name_plural': 'Освоение типов заданий',
+                'unique_together': {('student', 'task_type', 'subtype')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_group_students'),
+        ('variants', '0012_studentmastery'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_type', models.CharField(choices=[('1', '1. Анализ информационных моделей'), ('2', '2. Построение таблиц истинности логических выражений'), ('3', '3. Поиск информации в реляционных базах данных'), ('4', '4. Кодирование и декодирование данных. Условие Фано'), ('5', '5. Анализ алгоритмов для исполнителей'), ('6', '6. Циклические алгоритмы для исполнителя'), ('7', '7. Кодирование графической и звуковой информации'), ('8', '8. Комбинаторика'), ('9', '9. Обработка числовой информации в электронных таблицах'), ('10', '10. Поиск слова в текстовом документе'), ('11', '11. Вычисление количества информации'), ('12', '12. Алгоритмы для исполнителей с циклами и ветвлениями'), ('13', '13. IP адресация'), ('14', '14. Позиционные системы счисления'), ('15', '15. Истинность логического выражения'), ('16', '16. Вычисление значения рекурсивной функции'), ('17', '17. Обработка целочисленных данных'), ('18', '18. Робот-сборщик монет'), ('19-21', '19-21. Теория игр'), ('1921', '19-21. Теория игр'), ('22', '22. Многопоточные вычисления'), ('23', '23. Динамическое программирование. Количество программ'), ('24', '24. Обработка тестовых файлов'), ('25', '25. Обработка целочисленных данных. Поиск делителей'), ('26', '26. Обработка данных с помощью сортировки'), ('27', '27. Анализ данных. Кластеризация')], max_length=10, verbose_name='Тип задания')),
+                ('day', models.DateField(verbose_name='День')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Решено заданий')),
+                ('completions', models.PositiveIntegerField(default=0, verbose_name='Завершено вариантов')),
+                ('correct_count', models.PositiveIntegerField(default=0, verbose_name='Правильных ответов')),
+                ('time_spent_seconds', models.PositiveBigIntegerField(default=0, verbose_name='Затрачено времени (сек)')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='users.group', verbose_name='Группа')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL, verbose_name='Учитель')),
+            ],
+            options={
+                'verbose_name': 'Дневные итоги',
+                'verbose_name_plural': 'Дневные итоги',
+                'indexes': [models.Index(fields=['teacher', 'group', 'day'], name='variants_rollup_period')],
+                'constraints': [models.UniqueConstraint(fields=('teacher', 'group', 'task_type', 'day'), name='variants_rollup_unique')],
+            },
+        ),
+    ]
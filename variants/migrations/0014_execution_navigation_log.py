@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('variants', '0013_dailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variantexecution',
+            name='navigation_log',
+            field=models.TextField(blank=True, default='', verbose_name='Журнал переходов'),
+        ),
+        migrations.AddField(
+            model_name='variantexecution',
+            name='task_durations',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Время по заданиям'),
+        ),
+    ]
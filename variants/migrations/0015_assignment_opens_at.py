@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('variants', '0014_execution_navigation_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variantassignment',
+            name='opens_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Открывается'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('variants', '0015_assignment_opens_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variantassignment',
+            name='is_archived',
+            field=models.BooleanField(default=False, verbose_name='В архиве'),
+        ),
+        migrations.AddIndex(
+            model_name='variantassignment',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['student', '-assigned_at', '-id'], name='variants_assign_live'),
+        ),
+        migrations.AddIndex(
+            model_name='variantassignment',
+            index=models.Index(condition=models.Q(('deadline__isnull', False), ('is_active', True)), fields=['assigned_by', 'deadline'], name='variants_assign_deadline'),
+        ),
+    ]
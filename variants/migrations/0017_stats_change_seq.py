@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('variants', '0016_assignment_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VariantStatsVersion',
+            fields=[
+                ('variant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats_version', serialize=False, to='variants.variant', verbose_name='Вариант')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия статистики варианта',
+                'verbose_name_plural': 'Версии статистики вариантов',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='variantstudentstats',
+            name='variants_stats_variant_upd',
+        ),
+        migrations.AddField(
+            model_name='variantstudentstats',
+            name='change_seq',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Номер изменения'),
+        ),
+        migrations.AddIndex(
+            model_name='variantstudentstats',
+            index=models.Index(fields=['variant', 'change_seq'], name='variants_stats_variant_seq'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def merge_duplicate_rollups(apps, schema_editor):
+    """Объединить повторяющиеся итоги без группы, которые пропускал прежний индекс"""
+    DailyRollup = apps.get_model('variants', 'DailyRollup')
+    kept = {}
+    for rollup in DailyRollup.objects.filter(group__isnull=True).order_by('id'):
+        key = (rollup.teacher_id, rollup.task_type, rollup.day)
+        if key not in kept:
+            kept[key] = rollup
+            continue
+        target = kept[key]
+        for field in ('attempts', 'completions', 'correct_count', 'time_spent_seconds'):
+            setattr(target, field, getattr(target, field) + getattr(rollup, field))
+        target.save()
+        rollup.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_group_students'),
+        ('variants', '0017_stats_change_seq'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='dailyrollup',
+            name='variants_rollup_unique',
+        ),
+        migrations.RunPython(merge_duplicate_rollups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('group__isnull', False)), fields=('teacher', 'group', 'task_type', 'day'), name='variants_rollup_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('group__isnull', True)), fields=('teacher', 'task_type', 'day'), name='variants_rollup_unique_all'),
+        ),
+    ]
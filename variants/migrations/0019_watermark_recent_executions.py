@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:01
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def fill_recent_executions(apps, schema_editor):
+    """Запомнить выполнения окна перед отметкой, учтенные по прежней отметке (completed_at, id)"""
+    AnalyticsWatermark = apps.get_model('variants', 'AnalyticsWatermark')
+    VariantExecution = apps.get_model('variants', 'VariantExecution')
+    for watermark in AnalyticsWatermark.objects.exclude(completed_at__isnull=True):
+        watermark.recent_execution_ids = list(
+            VariantExecution.objects.filter(
+                status__in=['completed', 'timeout'],
+                completed_at__gte=watermark.completed_at - timedelta(minutes=10),
+            ).filter(
+                Q(completed_at__lt=watermark.completed_at) |
+                Q(completed_at=watermark.completed_at, id__lte=watermark.execution_id)
+            ).order_by('id').values_list('id', flat=True)
+        )
+        watermark.save(update_fields=['recent_execution_ids'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('variants', '0018_rollup_unique_without_group'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticswatermark',
+            name='recent_execution_ids',
+            field=models.JSONField(blank=True, default=list, verbose_name='Недавно обработанные выполнения'),
+        ),
+        migrations.RunPython(fill_recent_executions, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='analyticswatermark',
+            name='execution_id',
+        ),
+    ]
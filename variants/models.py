@@ -1,11 +1,20 @@
-from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Sum, Value
+from django.db.models.functions import Concat
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from tasks.models import Task
+from tasks.grading import bulk_grade
+import hashlib
 import random
 
 User = get_user_model()
 
+# Интервал обновления сводки ученика при автосохранении ответов по умолчанию, секунд
+DEFAULT_STATS_REFRESH_INTERVAL = 10
+
 
 class Variant(models.Model):
     """Вариант задания"""
@@ -71,6 +80,29 @@ class Variant(models.Model):
         """Возвращает количество заданий в варианте"""
         return self.variant_tasks.count()
     
+    def get_content_version(self):
+        """Версия содержимого заданий варианта.
+
+        Меняется при изменении любого задания варианта (по updated_at),
+        а также при добавлении, удалении или перестановке заданий.
+        """
+        stats = self.variant_tasks.aggregate(
+            tasks_count=Count('id'),
+            last_id=Max('id'),
+            orders_sum=Sum('order'),
+            last_updated=Max('task__updated_at'),
+        )
+        raw = '|'.join(str(stats[key]) for key in ('tasks_count', 'last_id', 'orders_sum', 'last_updated'))
+        return hashlib.md5(raw.encode('utf-8')).hexdigest()[:16]
+    
+    def get_grading_keys(self):
+        """Данные для проверки ответов: (task_id, task_type, subtype, correct_answer) по порядку заданий"""
+        return list(
+            self.variant_tasks.order_by('order').values_list(
+                'task_id', 'task__task_type', 'task__subtype', 'task__correct_answer'
+            )
+        )
+    
     def get_variant_type_display_short(self):
         """Короткое название типа варианта"""
         # Поддержка старых значений для обратной совместимости
@@ -148,32 +180,125 @@ class VariantExecution(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True, verbose_name='Завершено')
     answers = models.JSONField(default=dict, verbose_name='Ответы')  # {task_id: answer}
     current_task_order = models.PositiveIntegerField(null=True, blank=True, verbose_name='Текущее задание')
+    # Результат проверки, вычисляется один раз при завершении (см. grade())
+    score = models.PositiveIntegerField(null=True, blank=True, verbose_name='Правильных ответов')
+    total_tasks = models.PositiveIntegerField(null=True, blank=True, verbose_name='Всего заданий')
+    grade_map = models.TextField(blank=True, default='', verbose_name='Правильность по заданиям')  # '1'/'0' по порядку заданий
+    graded_at = models.DateTimeField(null=True, blank=True, verbose_name='Проверено')
+    # Последний примененный номер операции для каждого клиента (см. apply_client_ops())
+    client_seqs = models.JSONField(default=dict, blank=True, verbose_name='Синхронизация клиентов')
+    # Журнал событий "<вид><номер задания>:<секунд от начала>;", только дописывается (см. record_event())
+    navigation_log = models.TextField(blank=True, default='', verbose_name='Журнал переходов')
+    # Время на каждом задании в секундах {номер задания: секунд}, вычисляется при завершении
+    task_durations = models.JSONField(default=dict, blank=True, verbose_name='Время по заданиям')
+    
+    GRADE_FIELDS = ['score', 'total_tasks', 'grade_map', 'graded_at']
+    
+    # Виды событий журнала
+    EVENT_NAVIGATION = 'n'
+    EVENT_ANSWER = 'a'
     
     class Meta:
         verbose_name = 'Выполнение варианта'
         verbose_name_plural = 'Выполнения вариантов'
         ordering = ['-started_at']
+        indexes = [
+            # Поиск выполнений варианта по статусу (перепроверка, статистика)
+            models.Index(fields=['variant', 'status'], name='variants_exec_variant_status'),
+            # Выборка выполнений, завершенных после отметки аналитики
+            models.Index(fields=['completed_at', 'id'], name='variants_exec_completed'),
+        ]
     
     def __str__(self):
         return f"{self.variant.name} - {self.student.get_full_name()}"
     
     def start(self):
-        """Начать выполнение варианта"""
+        """Начать выполнение варианта.
+
+        Статус меняется одним условным UPDATE, поэтому повторный или одновременный
+        запуск не сбрасывает время начала. Сводка ученика (VariantStudentStats)
+        здесь не обновляется: начало выполнения не меняет баллов, и статус
+        попадет в сводку при сохранении ответов или завершении.
+        Возвращает True, если выполнение начато этим вызовом.
+        """
+        started_at = timezone.now()
+        started = VariantExecution.objects.filter(id=self.id, status='not_started').update(
+            status='in_progress', started_at=started_at
+        )
+        if not started:
+            self.refresh_from_db(fields=['status', 'started_at'])
+            return False
         self.status = 'in_progress'
-        self.started_at = timezone.now()
-        self.save()
+        self.started_at = started_at
+        return True
     
     def complete(self):
         """Завершить выполнение варианта"""
-        self.status = 'completed'
-        self.completed_at = timezone.now()
-        self.save()
+        self.finish('completed')
     
     def timeout(self):
         """Завершить по истечении времени"""
-        self.status = 'timeout'
+        self.finish('timeout')
+    
+    def finish(self, status):
+        """Завершить выполнение: проверить ответы, сохранить и обновить сводки ученика"""
+        self.status = status
         self.completed_at = timezone.now()
+        # Журнал дописывается в обход экземпляра, поэтому перечитываем его перед сохранением
+        self.refresh_from_db(fields=['navigation_log'])
+        self.task_durations = self.get_task_durations()
+        grading_keys = self.variant.get_grading_keys()
+        self.apply_grade_map(bulk_grade(grading_keys, [self.answers])[0])
         self.save()
+        VariantStudentStats.update_for_execution(self, grading_keys)
+        from .mastery import update_mastery_for_execution
+        update_mastery_for_execution(self, grading_keys, self.grade_map)
+    
+    def grade(self):
+        """Проверить ответы и записать результат в поля выполнения (без сохранения)"""
+        self.apply_grade_map(bulk_grade(self.variant.get_grading_keys(), [self.answers])[0])
+    
+    def apply_grade_map(self, grade_map):
+        """Записать результат проверки в поля выполнения (без сохранения)"""
+        self.grade_map = grade_map
+        self.score = grade_map.count('1')
+        self.total_tasks = len(grade_map)
+        self.graded_at = timezone.now()
+    
+    def regrade(self):
+        """Перепроверить ответы и сохранить результат"""
+        self.grade()
+        self.save(update_fields=self.GRADE_FIELDS)
+        self.refresh_stats()
+    
+    def refresh_stats(self):
+        """Обновить сводку ученика по варианту (см. VariantStudentStats)"""
+        return VariantStudentStats.update_for_execution(self)
+    
+    def refresh_progress_stats(self):
+        """Обновить сводку при сохранении ответов не чаще STATS_REFRESH_INTERVAL секунд.
+
+        Сводка выполнения в процессе отстает от ответов не больше чем на интервал,
+        при завершении и перепроверке она обновляется всегда. Возвращает
+        сводку или None, если обновление пропущено.
+        """
+        refresh_interval = getattr(settings, 'STATS_REFRESH_INTERVAL', DEFAULT_STATS_REFRESH_INTERVAL)
+        if not cache.add(f'variant_stats_refresh:{self.id}', True, refresh_interval):
+            return None
+        return self.refresh_stats()
+    
+    def is_graded(self):
+        """Проверено ли выполнение"""
+        return self.graded_at is not None
+    
+    def get_grade_map(self):
+        """Получить правильность ответов по порядку заданий ('1' - верно, '0' - неверно)"""
+        if not self.completed_at:
+            return ''
+        if not self.is_graded():
+            # Выполнения, завершенные до появления проверки при завершении
+            self.regrade()
+        return self.grade_map
     
     def get_elapsed_time(self):
         """Получить прошедшее время"""
@@ -205,16 +330,13 @@ class VariantExecution(models.Model):
         """Получить количество правильных ответов"""
         if not self.completed_at:
             return 0
-        correct = 0
-        for variant_task in self.variant.variant_tasks.all():
-            task = variant_task.task
-            user_answer = self.answers.get(str(task.id), '')
-            if user_answer.strip() == task.correct_answer.strip():
-                correct += 1
-        return correct
+        self.get_grade_map()
+        return self.score
     
     def get_total_tasks_count(self):
         """Получить общее количество заданий"""
+        if self.is_graded():
+            return self.total_tasks
         return self.variant.get_tasks_count()
     
     def get_task_answer(self, task_id):
@@ -224,8 +346,113 @@ class VariantExecution(models.Model):
     def is_answer_correct(self, task_id):
         """Проверить, правильный ли ответ на задание"""
         task = Task.objects.get(id=task_id)
-        user_answer = self.get_task_answer(task_id)
-        return user_answer.strip() == task.correct_answer.strip()
+        return task.check_answer(self.get_task_answer(task_id))
+    
+    def apply_client_ops(self, client_id, ops):
+        """Применить очередь операций клиента (без сохранения).
+
+        Каждая операция содержит порядковый номер seq, уникальный в пределах
+        клиента. Операции с номером не больше последнего примененного
+        пропускаются, поэтому повторная отправка той же очереди безопасна.
+        Ответы и переходы попадают в журнал событий со временем операции
+        на клиенте (at), если оно передано. Возвращает номер последней
+        примененной операции.
+        """
+        client_seqs = dict(self.client_seqs or {})
+        last_seq = client_seqs.get(client_id, 0)
+        answers = dict(self.answers or {})
+        for op in sorted(ops, key=lambda op: op['seq']):
+            if op['seq'] <= last_seq:
+                continue
+            if op.get('task_id'):
+                answers[str(op['task_id'])] = op.get('answer', '')
+                self.record_event(self.EVENT_ANSWER, op.get('current_task_order'), op.get('at'))
+            self.move_to_task(op.get('current_task_order'), op.get('at'))
+            last_seq = op['seq']
+        self.answers = answers
+        client_seqs[client_id] = last_seq
+        self.client_seqs = client_seqs
+        return last_seq
+    
+    def get_event_offset(self, at=None):
+        """Секунд от начала выполнения до события (в пределах от начала до текущего момента)"""
+        if not self.started_at:
+            return 0
+        now = timezone.now()
+        if at is None or at > now:
+            at = now
+        return max(0, round((at - self.started_at).total_seconds()))
+    
+    def record_event(self, kind, order, at=None):
+        """Добавить событие в журнал (без сохранения, см. save_progress())"""
+        if not order:
+            return
+        pending_events = getattr(self, '_pending_events', [])
+        pending_events.append(f'{kind}{order}:{self.get_event_offset(at)};')
+        self._pending_events = pending_events
+    
+    def move_to_task(self, order, at=None):
+        """Перейти к заданию (без сохранения). Возвращает True, если задание сменилось"""
+        if not order or order == self.current_task_order:
+            return False
+        self.current_task_order = order
+        self.record_event(self.EVENT_NAVIGATION, order, at)
+        return True
+    
+    def save_progress(self):
+        """Сохранить ответы и текущее задание одним запросом.
+        
+        Новые события дописываются в конец журнала на стороне БД, поэтому
+        сохранение не переписывает историю и не требует ее чтения.
+        """
+        fields = {
+            'answers': self.answers,
+            'current_task_order': self.current_task_order,
+            'client_seqs': self.client_seqs,
+        }
+        pending_events = getattr(self, '_pending_events', [])
+        if pending_events:
+            fields['navigation_log'] = Concat(F('navigation_log'), Value(''.join(pending_events)))
+            self._pending_events = []
+        VariantExecution.objects.filter(pk=self.pk).update(**fields)
+    
+    @classmethod
+    def parse_navigation_log(cls, navigation_log):
+        """События журнала: список (вид, номер задания, секунд от начала)"""
+        events = []
+        for entry in navigation_log.split(';'):
+            if not entry:
+                continue
+            order, separator, offset = entry[1:].partition(':')
+            try:
+                events.append((entry[0], int(order), int(offset)))
+            except ValueError:
+                continue
+        return events
+    
+    def get_task_durations(self):
+        """Время на каждом задании в секундах по журналу событий.
+        
+        Выполнение начинается с первого задания; промежуток между событиями
+        относится к заданию предыдущего события, последнее задание длится
+        до завершения. Ответ на задание тоже означает, что ученик на нем.
+        """
+        if not self.started_at:
+            return {}
+        end_offset = self.get_event_offset(self.completed_at)
+        durations = {}
+        order, offset = 1, 0
+        for kind, event_order, event_offset in self.parse_navigation_log(self.navigation_log):
+            # Время событий из офлайн-очереди может идти не по порядку
+            event_offset = min(max(event_offset, offset), end_offset)
+            durations[str(order)] = durations.get(str(order), 0) + event_offset - offset
+            order, offset = event_order, event_offset
+        durations[str(order)] = durations.get(str(order), 0) + end_offset - offset
+        return {key: seconds for key, seconds in durations.items() if seconds}
+    
+    def get_task_duration(self, order):
+        """Время на задании в секундах (после завершения)"""
+        return (self.task_durations or {}).get(str(order), 0)
     
     def get_current_task(self):
         """Получить текущее задание, которое выполняет ученик"""
@@ -259,20 +486,61 @@ class VariantAssignment(models.Model):
     )
     assigned_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата назначения')
     deadline = models.DateTimeField(null=True, blank=True, verbose_name='Срок выполнения')
+    opens_at = models.DateTimeField(null=True, blank=True, verbose_name='Открывается')
     is_active = models.BooleanField(default=True, verbose_name='Активно')
+    # Неактивно, но показывается ученику в архиве (см. команду sweep_assignments)
+    is_archived = models.BooleanField(default=False, verbose_name='В архиве')
     
     class Meta:
         verbose_name = 'Назначение варианта'
         verbose_name_plural = 'Назначения вариантов'
         ordering = ['-assigned_at']
+        indexes = [
+            # Частичные индексы только по активным назначениям: их немного,
+            # архив и отозванные назначения не увеличивают горячие запросы
+            models.Index(
+                fields=['student', '-assigned_at', '-id'],
+                condition=models.Q(is_active=True),
+                name='variants_assign_live',
+            ),
+            models.Index(
+                fields=['assigned_by', 'deadline'],
+                condition=models.Q(is_active=True, deadline__isnull=False),
+                name='variants_assign_deadline',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.variant.name} - {self.student.get_full_name()}"
     
+    @classmethod
+    def provision_executions(cls, assignments):
+        """Заранее создать не начатые выполнения назначений (одним запросом).
+
+        Для контрольной работы по расписанию: в момент начала ученику остается
+        только условный UPDATE в VariantExecution.start().
+        """
+        return VariantExecution.objects.bulk_create([
+            VariantExecution(
+                variant_id=assignment.variant_id,
+                student_id=assignment.student_id,
+                assignment=assignment,
+                status='not_started',
+            )
+            for assignment in assignments
+        ])
+    
+    def is_open(self):
+        """Можно ли начать выполнение (наступило ли время открытия)"""
+        return not self.opens_at or timezone.now() >= self.opens_at
+    
     def get_execution(self):
         """Получить выполнение варианта для этого назначения"""
         # Используем filter().first() вместо get(), так как может быть несколько выполнений
-        return VariantExecution.objects.filter(assignment=self).order_by('-started_at').first()
+        # Не начатые выполнения (started_at IS NULL) идут после начатых на любой СУБД
+        return VariantExecution.objects.filter(assignment=self).order_by(
+            models.F('started_at').desc(nulls_last=True)
+        ).first()
     
     def is_completed(self):
         """Проверить, выполнен ли вариант"""
@@ -284,3 +552,393 @@ class VariantAssignment(models.Model):
         if self.deadline:
             return timezone.now() > self.deadline and not self.is_completed()
         return False
+
+
+class VariantStatsVersion(models.Model):
+    """Счетчик изменений сводок варианта в БД (общий для всех процессов сервера).
+
+    Увеличивается в одной транзакции с сохранением сводки, поэтому номера
+    изменений одного варианта фиксируются по порядку: строка счетчика
+    блокируется до конца транзакции (в SQLite запись и так последовательна).
+    """
+    variant = models.OneToOneField(
+        Variant,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats_version',
+        verbose_name='Вариант'
+    )
+    version = models.PositiveBigIntegerField(default=0, verbose_name='Версия')
+    
+    class Meta:
+        verbose_name = 'Версия статистики варианта'
+        verbose_name_plural = 'Версии статистики вариантов'
+    
+    def __str__(self):
+        return f"{self.variant_id}: {self.version}"
+    
+    @classmethod
+    def get_version(cls, variant_id):
+        """Текущая версия сводок варианта (0, если изменений не было)"""
+        return cls.objects.filter(variant_id=variant_id).values_list('version', flat=True).first() or 0
+    
+    @classmethod
+    def next_version(cls, variant_id):
+        """Увеличить версию и вернуть ее (вызывать в транзакции сохранения сводок)"""
+        from .monitoring import notify_stats_changed
+        transaction.on_commit(lambda: notify_stats_changed(variant_id))
+        if not cls.objects.filter(variant_id=variant_id).update(version=F('version') + 1):
+            cls.objects.get_or_create(variant_id=variant_id)
+            cls.objects.filter(variant_id=variant_id).update(version=F('version') + 1)
+        return cls.get_version(variant_id)
+
+
+class VariantStudentStats(models.Model):
+    """Сводка по последнему выполнению варианта учеником (для статистики варианта).
+
+    Обновляется при сохранении ответов (не чаще STATS_REFRESH_INTERVAL),
+    завершении и перепроверке, поэтому страница статистики читает ее
+    одним запросом.
+    """
+    STATUS_CHOICES = VariantExecution.STATUS_CHOICES
+    
+    # Обозначения в строке статусов заданий
+    TASK_CORRECT = '+'
+    TASK_INCORRECT = '-'
+    TASK_NOT_ANSWERED = '.'
+    
+    variant = models.ForeignKey(
+        Variant,
+        on_delete=models.CASCADE,
+        related_name='student_stats',
+        verbose_name='Вариант'
+    )
+    student = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='variant_stats',
+        verbose_name='Ученик'
+    )
+    execution = models.ForeignKey(
+        VariantExecution,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        verbose_name='Последнее выполнение'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='not_started',
+        verbose_name='Статус'
+    )
+    correct_count = models.PositiveIntegerField(default=0, verbose_name='Правильных ответов')
+    answered_count = models.PositiveIntegerField(default=0, verbose_name='Дано ответов')
+    total_count = models.PositiveIntegerField(default=0, verbose_name='Всего заданий')
+    task_statuses = models.TextField(blank=True, default='', verbose_name='Статусы заданий')  # '+', '-', '.' по порядку
+    current_task_order = models.PositiveIntegerField(null=True, blank=True, verbose_name='Текущее задание')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начато')
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name='Завершено')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    
+    # Номер изменения из VariantStatsVersion: курсор ленты изменений (см. monitoring.py)
+    change_seq = models.PositiveBigIntegerField(default=0, verbose_name='Номер изменения')
+    
+    STATS_FIELDS = [
+        'execution', 'status', 'correct_count', 'answered_count', 'total_count', 'task_statuses',
+        'current_task_order', 'started_at', 'completed_at', 'updated_at', 'change_seq',
+    ]
+    
+    class Meta:
+        verbose_name = 'Статистика ученика по варианту'
+        verbose_name_plural = 'Статистика учеников по вариантам'
+        unique_together = ['variant', 'student']
+        indexes = [
+            # Журнал изменений для наблюдения за выполнением (см. monitoring.py)
+            models.Index(fields=['variant', 'change_seq'], name='variants_stats_variant_seq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.variant_id} - {self.student_id}: {self.correct_count}/{self.total_count}"
+    
+    @classmethod
+    def build_task_statuses(cls, grading_keys, answers, grade_map):
+        """Строка статусов заданий по ответам и результату проверки"""
+        answers = answers or {}
+        statuses = []
+        for (task_id, *_), is_correct in zip(grading_keys, grade_map):
+            user_answer = answers.get(str(task_id))
+            if user_answer is None or not str(user_answer).strip():
+                statuses.append(cls.TASK_NOT_ANSWERED)
+            elif is_correct == '1':
+                statuses.append(cls.TASK_CORRECT)
+            else:
+                statuses.append(cls.TASK_INCORRECT)
+        return ''.join(statuses)
+    
+    def apply_execution(self, execution, grading_keys):
+        """Заполнить сводку по выполнению (без сохранения)"""
+        if execution.is_graded() and len(execution.grade_map) == len(grading_keys):
+            grade_map = execution.grade_map
+        else:
+            grade_map = bulk_grade(grading_keys, [execution.answers])[0]
+        self.execution = execution
+        self.status = execution.status
+        self.task_statuses = self.build_task_statuses(grading_keys, execution.answers, grade_map)
+        self.correct_count = self.task_statuses.count(self.TASK_CORRECT)
+        self.answered_count = len(self.task_statuses) - self.task_statuses.count(self.TASK_NOT_ANSWERED)
+        self.total_count = len(grading_keys)
+        self.current_task_order = execution.current_task_order
+        self.started_at = execution.started_at
+        self.completed_at = execution.completed_at
+    
+    def is_newer_than(self, execution):
+        """Сводка относится к более позднему выполнению, чем указанное"""
+        if not self.execution_id or self.execution_id == execution.id:
+            return False
+        if self.started_at and execution.started_at:
+            return self.started_at > execution.started_at
+        return self.execution_id > execution.id
+    
+    @classmethod
+    def update_for_execution(cls, execution, grading_keys=None):
+        """Обновить сводку ученика по варианту после изменения выполнения"""
+        if grading_keys is None:
+            grading_keys = Variant(id=execution.variant_id).get_grading_keys()
+        stats, created = cls.objects.get_or_create(
+            variant_id=execution.variant_id,
+            student_id=execution.student_id,
+        )
+        if stats.is_newer_than(execution):
+            return stats
+        stats.apply_execution(execution, grading_keys)
+        with transaction.atomic():
+            stats.change_seq = VariantStatsVersion.next_version(execution.variant_id)
+            stats.save()
+        return stats
+    
+    @classmethod
+    def update_for_executions(cls, executions, grading_keys):
+        """Обновить сводки, ссылающиеся на указанные выполнения одного варианта (одним запросом)"""
+        executions_by_id = {execution.id: execution for execution in executions}
+        stats_list = list(cls.objects.filter(execution_id__in=executions_by_id))
+        if not stats_list:
+            return stats_list
+        now = timezone.now()
+        with transaction.atomic():
+            change_seq = VariantStatsVersion.next_version(stats_list[0].variant_id)
+            for stats in stats_list:
+                stats.apply_execution(executions_by_id[stats.execution_id], grading_keys)
+                # bulk_update не обновляет поля auto_now
+                stats.updated_at = now
+                stats.change_seq = change_seq
+            cls.objects.bulk_update(stats_list, cls.STATS_FIELDS)
+        return stats_list
+    
+    def get_task_status_list(self, tasks_count=None):
+        """Статусы заданий в виде списка ('correct', 'incorrect', 'not_started')"""
+        names = {
+            self.TASK_CORRECT: 'correct',
+            self.TASK_INCORRECT: 'incorrect',
+            self.TASK_NOT_ANSWERED: 'not_started',
+        }
+        if tasks_count is None:
+            tasks_count = self.total_count
+        statuses = [names[status] for status in self.task_statuses[:tasks_count]]
+        # Строка может быть короче, если в вариант добавили задания после выполнения
+        return statuses + ['not_started'] * (tasks_count - len(statuses))
+    
+    def get_remaining_time(self):
+        """Оставшееся время в секундах для выполнения в процессе"""
+        if self.status != 'in_progress' or not self.variant.time_limit_minutes or not self.started_at:
+            return None
+        elapsed = timezone.now() - self.started_at
+        return max(0, int(self.variant.time_limit_minutes * 60 - elapsed.total_seconds()))
+    
+    def get_elapsed_time_formatted(self):
+        """Время выполнения в виде '1ч 5м 3с'"""
+        if not self.started_at or not self.completed_at:
+            return None
+        total_seconds = int((self.completed_at - self.started_at).total_seconds())
+        hours = total_seconds // 3600
+        minutes = (total_seconds % 3600) // 60
+        seconds = total_seconds % 60
+        
+        time_parts = []
+        if hours > 0:
+            time_parts.append(f"{hours}ч")
+        if minutes > 0:
+            time_parts.append(f"{minutes}м")
+        time_parts.append(f"{seconds}с")
+        return " ".join(time_parts)
+
+
+class TaskItemStats(models.Model):
+    """Накопленная статистика для анализа задания в варианте (см. analytics.py).
+
+    Хранятся достаточные суммы, из которых вычисляются решаемость
+    и точечно-бисериальная корреляция с общим баллом, поэтому новые
+    выполнения добавляются без пересчета истории.
+    """
+    variant = models.ForeignKey(
+        Variant,
+        on_delete=models.CASCADE,
+        related_name='item_stats',
+        verbose_name='Вариант'
+    )
+    task = models.ForeignKey(
+        Task,
+        on_delete=models.CASCADE,
+        related_name='item_stats',
+        verbose_name='Задание'
+    )
+    executions_count = models.PositiveIntegerField(default=0, verbose_name='Выполнений')
+    correct_count = models.PositiveIntegerField(default=0, verbose_name='Правильных ответов')
+    answered_count = models.PositiveIntegerField(default=0, verbose_name='Дано ответов')
+    score_sum = models.BigIntegerField(default=0, verbose_name='Сумма баллов')
+    score_sq_sum = models.BigIntegerField(default=0, verbose_name='Сумма квадратов баллов')
+    correct_score_sum = models.BigIntegerField(default=0, verbose_name='Сумма баллов решивших')
+    wrong_answers = models.JSONField(default=dict, blank=True, verbose_name='Неправильные ответы')  # {ответ: количество}
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    
+    SUM_FIELDS = [
+        'executions_count', 'correct_count', 'answered_count',
+        'score_sum', 'score_sq_sum', 'correct_score_sum', 'wrong_answers', 'updated_at',
+    ]
+    
+    class Meta:
+        verbose_name = 'Статистика задания в варианте'
+        verbose_name_plural = 'Статистика заданий в вариантах'
+        unique_together = ['variant', 'task']
+    
+    def __str__(self):
+        return f"{self.variant_id} - {self.task_id}: {self.correct_count}/{self.executions_count}"
+    
+    def get_solve_rate(self):
+        """Доля правильных ответов"""
+        if not self.executions_count:
+            return None
+        return self.correct_count / self.executions_count
+    
+    def get_discrimination(self):
+        """Точечно-бисериальная корреляция правильности ответа с общим баллом"""
+        n = self.executions_count
+        numerator = n * self.correct_score_sum - self.correct_count * self.score_sum
+        denominator = (n * self.correct_count - self.correct_count ** 2) * (n * self.score_sq_sum - self.score_sum ** 2)
+        if denominator <= 0:
+            return None
+        return numerator / denominator ** 0.5
+    
+    def get_top_wrong_answers(self, limit=5):
+        """Самые частые неправильные ответы [(ответ, количество)]"""
+        return sorted(self.wrong_answers.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+class AnalyticsWatermark(models.Model):
+    """Отметка, до какого времени завершения обработана инкрементальная аналитика.
+
+    Выполнения, завершенные незадолго до отметки, запоминаются по id: они
+    просматриваются повторно, чтобы учесть транзакции, зафиксированные позже
+    (см. analytics.LATE_COMMIT_WINDOW).
+    """
+    name = models.CharField(max_length=50, unique=True, verbose_name='Название')
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name='Завершено')
+    recent_execution_ids = models.JSONField(default=list, blank=True, verbose_name='Недавно обработанные выполнения')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    
+    class Meta:
+        verbose_name = 'Отметка аналитики'
+        verbose_name_plural = 'Отметки аналитики'
+    
+    def __str__(self):
+        return f"{self.name}: {self.completed_at}"
+
+
+class StudentMastery(models.Model):
+    """Освоение учеником типа (и подтипа) заданий, обновляется при завершении выполнений"""
+    student = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='mastery',
+        verbose_name='Ученик'
+    )
+    task_type = models.CharField(max_length=10, choices=Task.TASK_TYPE_CHOICES, verbose_name='Тип задания')
+    subtype = models.CharField(max_length=20, blank=True, default='', verbose_name='Подтип задания')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    correct_count = models.PositiveIntegerField(default=0, verbose_name='Правильных ответов')
+    score = models.FloatField(default=0, verbose_name='Освоение')  # экспоненциальное среднее правильности, 0..1
+    last_attempt_at = models.DateTimeField(null=True, blank=True, verbose_name='Последняя попытка')
+    
+    class Meta:
+        verbose_name = 'Освоение типа заданий'
+        verbose_name_plural = 'Освоение типов заданий'
+        unique_together = ['student', 'task_type', 'subtype']
+    
+    def __str__(self):
+        return f"{self.student_id} - {self.task_type}/{self.subtype}: {self.score:.2f}"
+    
+    def get_subtype_display(self):
+        """Отображаемое название подтипа"""
+        for choice_value, choice_display in Task.SUBTYPE_CHOICES.get(self.task_type, []):
+            if choice_value == self.subtype:
+                return choice_display
+        return self.subtype
+    
+    def get_score_percent(self):
+        """Освоение в процентах"""
+        return round(self.score * 100)
+
+
+class DailyRollup(models.Model):
+    """Дневные итоги по учителю, группе и типу заданий (см. analytics.py).
+
+    Строка без группы содержит итоги по всем ученикам учителя, строки
+    с группой - по ученикам этой группы (ученик может входить в несколько групп).
+    """
+    teacher = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='daily_rollups',
+        verbose_name='Учитель'
+    )
+    group = models.ForeignKey(
+        'users.Group',
+        on_delete=models.CASCADE,
+        related_name='daily_rollups',
+        null=True,
+        blank=True,
+        verbose_name='Группа'
+    )
+    task_type = models.CharField(max_length=10, choices=Task.TASK_TYPE_CHOICES, verbose_name='Тип задания')
+    day = models.DateField(verbose_name='День')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Решено заданий')
+    completions = models.PositiveIntegerField(default=0, verbose_name='Завершено вариантов')
+    correct_count = models.PositiveIntegerField(default=0, verbose_name='Правильных ответов')
+    time_spent_seconds = models.PositiveBigIntegerField(default=0, verbose_name='Затрачено времени (сек)')
+    
+    SUM_FIELDS = ['attempts', 'completions', 'correct_count', 'time_spent_seconds']
+    
+    class Meta:
+        verbose_name = 'Дневные итоги'
+        verbose_name_plural = 'Дневные итоги'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['teacher', 'group', 'task_type', 'day'],
+                condition=models.Q(group__isnull=False),
+                name='variants_rollup_unique'
+            ),
+            # NULL в уникальном индексе не совпадает с NULL, поэтому итоги
+            # без группы ограничиваются отдельным частичным индексом
+            models.UniqueConstraint(
+                fields=['teacher', 'task_type', 'day'],
+                condition=models.Q(group__isnull=True),
+                name='variants_rollup_unique_all'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['teacher', 'group', 'day'], name='variants_rollup_period'),
+        ]
+    
+    def __str__(self):
+        return f"{self.teacher_id}/{self.group_id} {self.task_type} {self.day}: {self.correct_count}/{self.attempts}"
@@ -0,0 +1,246 @@
+"""Наблюдение за выполнением варианта в реальном времени.
+
+Журналом изменений служит таблица сводок учеников (VariantStudentStats):
+каждая сохраненная сводка получает номер изменения из счетчика варианта
+в БД (VariantStatsVersion), а клиент хранит курсор - последний полученный
+номер. Номера фиксируются в порядке транзакций, поэтому изменение не может
+оказаться позади курсора. Сводки читаются только когда счетчик превысил курсор.
+
+Счетчик читается из кэша (ключ variant_stats_version:<id>, не дольше
+FEED_VERSION_CACHE_TIMEOUT секунд), поэтому все учителя, следящие за
+вариантом, обращаются к БД не чаще раза в этот интервал. После фиксации
+нового номера ключ сбрасывается, а ожидающие запросы этого процесса
+будятся через stats_notifier; изменения из других процессов замечаются
+при очередной проверке кэша раз в FEED_POLL_INTERVAL.
+
+Запрос long-poll занимает поток сервера на время ожидания (до
+LONG_POLL_TIMEOUT), поэтому одновременно ждут не больше LONG_POLL_MAX_WAITERS
+запросов на процесс: остальные получают ответ сразу и повторяют запрос через
+LONG_POLL_BUSY_RETRY_AFTER секунд. Значение нужно держать меньше числа
+потоков сервера, чтобы ученикам всегда оставались свободные потоки.
+SSE под ASGI потоков не занимает и не ограничивается.
+"""
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+from operator import attrgetter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import VariantStatsVersion, VariantStudentStats
+
+# Интервал проверки счетчика изменений (в секундах)
+FEED_POLL_INTERVAL = 1
+
+# Сколько держать запрос long-poll без изменений (в секундах)
+LONG_POLL_TIMEOUT = 20
+
+# Сколько запросов long-poll одновременно ждут изменений в одном процессе
+DEFAULT_LONG_POLL_MAX_WAITERS = 4
+
+# Через сколько секунд повторить запрос, если мест для ожидания нет
+LONG_POLL_BUSY_RETRY_AFTER = 5
+
+# Сколько хранить счетчик изменений варианта в кэше (в секундах)
+FEED_VERSION_CACHE_TIMEOUT = 5
+
+# Время жизни одного SSE-подключения; браузер переподключается сам
+# с заголовком Last-Event-ID (в секундах)
+SSE_STREAM_LIFETIME = 300
+
+# Интервал комментариев-пингов, чтобы прокси не закрывали соединение (в секундах)
+SSE_HEARTBEAT_INTERVAL = 15
+
+
+def get_version_cache_key(variant_id):
+    return f'variant_stats_version:{variant_id}'
+
+
+def get_stats_version(variant_id):
+    """Номер последнего изменения сводок варианта (из кэша, если он там есть).
+
+    Значение из кэша может отставать не больше чем на FEED_VERSION_CACHE_TIMEOUT:
+    клиент тогда получит изменения при следующей проверке.
+    """
+    key = get_version_cache_key(variant_id)
+    version = cache.get(key)
+    if version is None:
+        version = VariantStatsVersion.get_version(variant_id)
+        cache.set(key, version, FEED_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+class StatsNotifier:
+    """Пробуждение ожидающих изменений запросов процесса"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+
+    def notify(self):
+        with self.condition:
+            self.condition.notify_all()
+
+    def wait(self, timeout):
+        with self.condition:
+            self.condition.wait(timeout)
+
+
+# Общий для потоков процесса сервера
+stats_notifier = StatsNotifier()
+
+
+def notify_stats_changed(variant_id):
+    """Сообщить о новом номере изменения (после фиксации транзакции)"""
+    cache.delete(get_version_cache_key(variant_id))
+    stats_notifier.notify()
+
+
+class LongPollWaiters:
+    """Ограничение числа одновременно ожидающих запросов long-poll"""
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.active = 0
+
+    def get_limit(self):
+        return self.limit or getattr(settings, 'LONG_POLL_MAX_WAITERS', DEFAULT_LONG_POLL_MAX_WAITERS)
+
+    @contextmanager
+    def admit(self):
+        """Занять место ожидания; возвращает False, если мест нет (без ожидания)"""
+        with self.lock:
+            admitted = self.active < self.get_limit()
+            if admitted:
+                self.active += 1
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                with self.lock:
+                    self.active -= 1
+
+
+long_poll_waiters = LongPollWaiters()
+
+
+def get_stats_queryset(variant, group=None):
+    """Сводки учеников для статистики варианта (всей или по группе)"""
+    stats = VariantStudentStats.objects.filter(variant=variant).select_related('student')
+    if group:
+        return stats.filter(student__student_groups=group)
+    # Без группы показываем всех, кто выполнял или выполняет вариант
+    return stats.filter(student__role='student', execution__isnull=False)
+
+
+def get_group_stats(variant, group, order_by):
+    """Сводки всех учеников группы, в том числе не начинавших вариант.
+
+    Ученикам без сводки соответствуют несохраненные пустые сводки, поэтому
+    страница статистики ничего не записывает. Список упорядочивается
+    по полям order_by (как в QuerySet.order_by) в Python: группа невелика.
+    """
+    stats = list(get_stats_queryset(variant, group))
+    missing_students = group.students.exclude(variant_stats__variant=variant)
+    stats += [VariantStudentStats(variant=variant, student=student) for student in missing_students]
+    # Устойчивая сортировка по полям с конца дает порядок по всем полям сразу
+    for field in reversed(order_by):
+        stats.sort(key=attrgetter(field.lstrip('-').replace('__', '.')), reverse=field.startswith('-'))
+    return stats
+
+
+def serialize_stats(stat, variant, tasks_count):
+    """Строка таблицы статистики по сводке ученика"""
+    stat.variant = variant
+    return {
+        'student_id': stat.student_id,
+        'student_name': stat.student.get_full_name(),
+        'status': stat.status,
+        'execution_id': stat.execution_id,
+        'task_statuses': stat.get_task_status_list(tasks_count),
+        'current_task_order': stat.current_task_order if stat.status == 'in_progress' else None,
+        'remaining_time': stat.get_remaining_time(),
+        'elapsed_time_formatted': (
+            stat.get_elapsed_time_formatted() if variant.variant_type == 'control' else None
+        ),
+        'answered_count': stat.answered_count,
+        'correct_count': stat.correct_count,
+        'total_count': tasks_count,
+    }
+
+
+def format_cursor(change_seq):
+    """Курсор журнала изменений в виде строки"""
+    return str(change_seq)
+
+
+def parse_cursor(value):
+    """Разобрать курсор журнала изменений (None, если он некорректен)"""
+    try:
+        change_seq = int(value)
+    except (TypeError, ValueError):
+        return None
+    return change_seq if change_seq >= 0 else None
+
+
+def get_stats_changes(variant, group, since, version=None):
+    """Изменения сводок после курсора.
+
+    version - счетчик изменений, прочитанный до запроса: курсор переводится
+    на него, даже если изменения относятся к ученикам вне группы.
+    Возвращает (список строк таблицы, новый курсор).
+    """
+    tasks_count = variant.variant_tasks.count()
+    stats = list(get_stats_queryset(variant, group).filter(change_seq__gt=since).order_by('change_seq'))
+    cursor = max([since, version or 0] + [stat.change_seq for stat in stats[-1:]])
+    return [serialize_stats(stat, variant, tasks_count) for stat in stats], cursor
+
+
+def wait_for_stats_changes(variant, group, since, timeout=None):
+    """Дождаться изменений сводок (long-poll).
+
+    Счетчик изменений проверяется при пробуждении от stats_notifier
+    и не реже раза в FEED_POLL_INTERVAL, сводки читаются только когда
+    он превысил курсор.
+    """
+    if timeout is None:
+        timeout = LONG_POLL_TIMEOUT
+    deadline = time.monotonic() + timeout
+    while True:
+        version = get_stats_version(variant.id)
+        if version > since:
+            changes, since = get_stats_changes(variant, group, since, version)
+            if changes:
+                return changes, since
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return [], since
+        stats_notifier.wait(min(FEED_POLL_INTERVAL, remaining))
+
+
+def format_sse_event(changes, cursor):
+    """Событие SSE с изменениями сводок"""
+    data = json.dumps({'cursor': format_cursor(cursor), 'changes': changes}, ensure_ascii=False)
+    return f'id: {format_cursor(cursor)}\nevent: stats\ndata: {data}\n\n'
+
+
+async def stream_stats_events(variant, group, since):
+    """Поток событий SSE с изменениями сводок (для запуска под ASGI)"""
+    deadline = time.monotonic() + SSE_STREAM_LIFETIME
+    last_sent = time.monotonic()
+    yield f'retry: {FEED_POLL_INTERVAL * 1000}\n\n'
+    while time.monotonic() < deadline:
+        version = await sync_to_async(get_stats_version)(variant.id)
+        if version > since:
+            changes, since = await sync_to_async(get_stats_changes)(variant, group, since, version)
+            if changes:
+                last_sent = time.monotonic()
+                yield format_sse_event(changes, since)
+        if time.monotonic() - last_sent >= SSE_HEARTBEAT_INTERVAL:
+            last_sent = time.monotonic()
+            yield ': ping\n\n'
+        await asyncio.sleep(FEED_POLL_INTERVAL)
@@ -0,0 +1,140 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from tasks.grading import bulk_grade
+from .models import Variant, VariantTask, VariantExecution, VariantStudentStats
+
+REGRADE_CHUNK_SIZE = 500
+
+FINISHED_STATUSES = ['completed', 'timeout']
+
+
+def get_affected_variant_ids(task):
+    """Варианты, в которые входит задание"""
+    return list(
+        VariantTask.objects.filter(task=task).values_list('variant_id', flat=True).distinct()
+    )
+
+
+def get_affected_executions(variant_ids):
+    """Завершенные выполнения указанных вариантов (по индексу variant + status)"""
+    return VariantExecution.objects.filter(variant_id__in=variant_ids, status__in=FINISHED_STATUSES)
+
+
+def regrade_variant_chunks(variant_id, affected, chunk_size=REGRADE_CHUNK_SIZE, progress=None, selected=None):
+    """Перепроверить завершенные выполнения варианта порциями.
+
+    Ключи заданий варианта компилируются один раз, выполнения читаются
+    порциями по возрастанию id, а в БД записываются только те выполнения,
+    результат которых изменился (или еще не был сохранен), одним bulk_update
+    на порцию, вместе со сводками учеников, которые на них ссылаются.
+    Ученики и дни измененных выполнений собираются в affected
+    (см. rebuild_affected_stats). selected ограничивает перепроверку
+    выполнениями из этой выборки.
+    Возвращает (количество проверенных, количество измененных).
+    """
+    grading_keys = Variant(id=variant_id).get_grading_keys()
+    executions = get_affected_executions([variant_id])
+    if selected is not None:
+        executions = executions.filter(id__in=selected.values('id'))
+    executions = executions.select_related('variant').order_by('id').only(
+        'id', 'variant_id', 'variant__created_by_id', 'student_id', 'status', 'answers', 'grade_map',
+        'graded_at', 'current_task_order', 'started_at', 'completed_at',
+    )
+
+    processed_count = 0
+    changed_count = 0
+    last_id = 0
+    while True:
+        chunk = list(executions.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+
+        grade_maps = bulk_grade(grading_keys, [execution.answers for execution in chunk])
+        changed = []
+        for execution, grade_map in zip(chunk, grade_maps):
+            if execution.grade_map != grade_map or execution.graded_at is None:
+                execution.apply_grade_map(grade_map)
+                changed.append(execution)
+
+        if changed:
+            with transaction.atomic():
+                VariantExecution.objects.bulk_update(changed, VariantExecution.GRADE_FIELDS)
+                VariantStudentStats.update_for_executions(changed, grading_keys)
+            affected['variant_ids'].add(variant_id)
+            for execution in changed:
+                affected['student_ids'].add(execution.student_id)
+                if execution.completed_at:
+                    affected['days'][execution.variant.created_by_id].add(timezone.localdate(execution.completed_at))
+
+        processed_count += len(chunk)
+        changed_count += len(changed)
+        if progress:
+            progress(processed_count, changed_count)
+
+    return processed_count, changed_count
+
+
+def get_empty_affected():
+    """Пустой набор затронутых перепроверкой данных"""
+    return {'variant_ids': set(), 'student_ids': set(), 'days': defaultdict(set)}
+
+
+def rebuild_affected_stats(affected):
+    """Пересчитать накопленную аналитику, построенную по старым результатам"""
+    from .analytics import rebuild_variant_item_analysis, rebuild_teacher_rollups
+    from .mastery import rebuild_student_mastery
+    for variant_id in affected['variant_ids']:
+        rebuild_variant_item_analysis(variant_id)
+    if affected['student_ids']:
+        rebuild_student_mastery(affected['student_ids'])
+    for teacher_id, days in affected['days'].items():
+        rebuild_teacher_rollups(teacher_id, days)
+
+
+def regrade_executions(executions, chunk_size=REGRADE_CHUNK_SIZE, progress=None):
+    """Перепроверить завершенные выполнения из выборки (любых вариантов).
+
+    Выполнения перепроверяются порциями по вариантам, аналитика
+    (статистика заданий, освоение, дневные итоги) пересчитывается
+    один раз после всех вариантов.
+    progress(проверено, изменено, всего) вызывается после каждой порции.
+    Возвращает (количество проверенных, количество измененных).
+    """
+    executions = executions.filter(status__in=FINISHED_STATUSES)
+    variant_ids = list(executions.order_by().values_list('variant_id', flat=True).distinct())
+    if not variant_ids:
+        return 0, 0
+
+    total_count = executions.count()
+    affected = get_empty_affected()
+    processed_count = 0
+    changed_count = 0
+    for variant_id in variant_ids:
+        def report(variant_processed, variant_changed):
+            if progress:
+                progress(processed_count + variant_processed, changed_count + variant_changed, total_count)
+
+        variant_processed, variant_changed = regrade_variant_chunks(
+            variant_id, affected, chunk_size, report, selected=executions
+        )
+        processed_count += variant_processed
+        changed_count += variant_changed
+
+    rebuild_affected_stats(affected)
+    return processed_count, changed_count
+
+
+def regrade_task_executions(task, chunk_size=REGRADE_CHUNK_SIZE, progress=None):
+    """Перепроверить выполнения всех вариантов, содержащих задание.
+
+    Вызывается после изменения правильного ответа (или типа) задания.
+    progress(проверено, изменено, всего) вызывается после каждой порции.
+    Возвращает (количество проверенных, количество измененных).
+    """
+    variant_ids = get_affected_variant_ids(task)
+    if not variant_ids:
+        return 0, 0
+    return regrade_executions(VariantExecution.objects.filter(variant_id__in=variant_ids), chunk_size, progress)
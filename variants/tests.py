@@ -1,3 +1,860 @@
-from django.test import TestCase
+import io
+import time
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from tasks.models import Task
+from users.models import Group
+from .models import Variant, VariantTask, VariantExecution, VariantAssignment, VariantStudentStats
+from .content import get_variant_content
 
-# Create your tests here.
+User = get_user_model()
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'variants-tests',
+    }
+}
+
+
+class VariantTestMixin:
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(
+            username='teacher',
+            first_name='Учитель',
+            last_name='Тестовый',
+            role='teacher',
+            password='teacher_psw'
+        )
+        self.student = User.objects.create_user(
+            username='student',
+            first_name='Ученик',
+            last_name='Тестовый',
+            role='student',
+            password='student_psw',
+            created_by=self.teacher
+        )
+        self.variant = Variant.objects.create(name='Вариант 1', created_by=self.teacher)
+        self.tasks = []
+        for order, answer in enumerate(['42', '87 184328', 'zxyw'], start=1):
+            task = Task.objects.create(
+                text=f'Задание {order}',
+                task_type='1',
+                correct_answer=answer,
+                created_by=self.teacher
+            )
+            VariantTask.objects.create(variant=self.variant, task=task, order=order)
+            self.tasks.append(task)
+        self.assignment = VariantAssignment.objects.create(
+            variant=self.variant,
+            student=self.student,
+            assigned_by=self.teacher
+        )
+
+    def create_execution(self, answers=None):
+        execution = VariantExecution.objects.create(
+            variant=self.variant,
+            student=self.student,
+            assignment=self.assignment,
+            answers=answers or {}
+        )
+        execution.start()
+        return execution
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class VariantContentCacheTest(VariantTestMixin, TestCase):
+    def test_content_is_rendered_once_per_version(self):
+        version = self.variant.get_content_version()
+        get_variant_content(self.variant)
+        with self.assertNumQueries(1):
+            # Остается только запрос версии, задания не перечитываются
+            content = get_variant_content(self.variant)
+        self.assertEqual(content['version'], version)
+        self.assertEqual([t['order'] for t in content['tasks']], [1, 2, 3])
+
+    def test_version_changes_when_task_updated(self):
+        version = self.variant.get_content_version()
+        self.tasks[0].text = 'Новый текст'
+        self.tasks[0].save()
+        self.assertNotEqual(self.variant.get_content_version(), version)
+        self.assertIn('Новый текст', get_variant_content(self.variant)['tasks_html'])
+
+    def test_execute_page_injects_student_answers(self):
+        execution = self.create_execution({str(self.tasks[0].id): '42'})
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('variants:variant_execute', args=[execution.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '"42"')
+        self.assertNotContains(response, 'Задание 1</div>')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ExecutionPayloadApiTest(VariantTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.execution = self.create_execution({str(self.tasks[0].id): '42'})
+        self.client.force_login(self.student)
+
+    def test_content_is_revalidated_with_etag(self):
+        url = reverse('variants:execution_content', args=[self.execution.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'id="answer_{self.tasks[2].id}"', response.json()['tasks_html'])
+        etag = response['ETag']
+        
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        self.tasks[1].text = 'Исправленный текст'
+        self.tasks[1].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_content_requires_own_execution(self):
+        other = User.objects.create_user(username='other', role='student', password='student_psw')
+        self.client.force_login(other)
+        response = self.client.get(reverse('variants:execution_content', args=[self.execution.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_state(self):
+        self.execution.current_task_order = 2
+        self.execution.save()
+        response = self.client.get(reverse('variants:execution_state', args=[self.execution.id]))
+        state = response.json()
+        self.assertEqual(state['status'], 'in_progress')
+        self.assertEqual(state['answers'], {str(self.tasks[0].id): '42'})
+        self.assertEqual(state['current_task_order'], 2)
+
+
+class VariantExecutionGradeTest(VariantTestMixin, TestCase):
+    def test_complete_stores_grade(self):
+        execution = self.create_execution({
+            str(self.tasks[0].id): ' 42 ',
+            str(self.tasks[1].id): '1',
+        })
+        execution.complete()
+        execution.refresh_from_db()
+        self.assertEqual(execution.score, 1)
+        self.assertEqual(execution.total_tasks, 3)
+        self.assertEqual(execution.grade_map, '100')
+        self.assertIsNotNone(execution.graded_at)
+
+    def test_result_reads_stored_grade(self):
+        execution = self.create_execution({str(self.tasks[0].id): '42'})
+        execution.complete()
+        execution = VariantExecution.objects.get(id=execution.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(execution.get_correct_answers_count(), 1)
+            self.assertEqual(execution.get_total_tasks_count(), 3)
+
+    def test_regrade_is_explicit(self):
+        execution = self.create_execution({str(self.tasks[0].id): '43'})
+        execution.complete()
+        self.tasks[0].correct_answer = '43'
+        self.tasks[0].save()
+        execution.refresh_from_db()
+        self.assertEqual(execution.get_correct_answers_count(), 0)
+        execution.regrade()
+        self.assertEqual(execution.get_correct_answers_count(), 1)
+
+
+class RegradePipelineTest(VariantTestMixin, TestCase):
+    def test_edit_task_regrades_completed_executions(self):
+        execution = self.create_execution({str(self.tasks[0].id): '43'})
+        execution.complete()
+        untouched = self.create_execution({str(self.tasks[0].id): '42'})
+        untouched.complete()
+        
+        self.client.force_login(self.teacher)
+        response = self.client.post(reverse('edit_task', args=[self.tasks[0].id]), {
+            'text': self.tasks[0].text,
+            'task_type': '1',
+            'subtype': '1',
+            'difficulty': 'easy',
+            'correct_answer': '43',
+        })
+        self.assertEqual(response.status_code, 302)
+        execution.refresh_from_db()
+        untouched.refresh_from_db()
+        self.assertEqual(execution.score, 1)
+        self.assertEqual(untouched.score, 0)
+
+    def test_regrade_reports_progress_in_chunks(self):
+        from .regrade import regrade_task_executions
+        for answer in ['43', '42', '43']:
+            self.create_execution({str(self.tasks[0].id): answer}).complete()
+        self.tasks[0].correct_answer = '43'
+        self.tasks[0].save()
+        
+        reports = []
+        processed_count, changed_count = regrade_task_executions(
+            self.tasks[0], chunk_size=2, progress=lambda *args: reports.append(args)
+        )
+        self.assertEqual((processed_count, changed_count), (3, 3))
+        self.assertEqual(reports, [(2, 2, 3), (3, 3, 3)])
+
+    def test_regrade_rebuilds_mastery_and_rollups(self):
+        from .analytics import refresh_rollups
+        from .models import DailyRollup, StudentMastery
+        from .regrade import regrade_task_executions
+        self.create_execution({str(self.tasks[0].id): '43'}).complete()
+        refresh_rollups()
+        self.tasks[0].correct_answer = '43'
+        self.tasks[0].save()
+        regrade_task_executions(self.tasks[0])
+        
+        mastery = StudentMastery.objects.get(student=self.student, task_type='1')
+        self.assertEqual((mastery.attempts, mastery.correct_count), (3, 1))
+        rollup = DailyRollup.objects.get(teacher=self.teacher, group__isnull=True)
+        self.assertEqual((rollup.attempts, rollup.correct_count), (3, 1))
+
+    def test_variant_regrade_command_rebuilds_stats(self):
+        from django.core.management import call_command
+        from .analytics import refresh_item_analysis
+        from .models import StudentMastery, TaskItemStats
+        execution = self.create_execution({str(self.tasks[0].id): '43'})
+        execution.complete()
+        refresh_item_analysis()
+        Task.objects.filter(id=self.tasks[0].id).update(correct_answer='43')
+        call_command('regrade_executions', variant=self.variant.id, stdout=io.StringIO())
+        
+        execution.refresh_from_db()
+        self.assertEqual(execution.score, 1)
+        mastery = StudentMastery.objects.get(student=self.student, task_type='1')
+        self.assertEqual(mastery.correct_count, 1)
+        self.assertEqual(TaskItemStats.objects.get(variant=self.variant, task=self.tasks[0]).correct_count, 1)
+
+    def test_regrade_command_rejects_unknown_task(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        with self.assertRaises(CommandError):
+            call_command('regrade_executions', task=self.tasks[-1].id + 1, stdout=io.StringIO())
+
+
+class SessionWriteThrottleTest(VariantTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.execution = self.create_execution()
+        self.client.login(username='student', password='student_psw')
+        self.url = reverse('variants:save_answer', args=[self.execution.id])
+
+    def count_session_writes(self, requests_count):
+        with CaptureQueriesContext(connection) as queries:
+            for number in range(requests_count):
+                response = self.client.post(
+                    self.url, data={'task_id': self.tasks[0].id, 'answer': str(number), 'current_task_order': 1},
+                    content_type='application/json'
+                )
+                self.assertTrue(response.json()['success'])
+        return len([
+            query for query in queries
+            if 'django_session' in query['sql'] and not query['sql'].startswith('SELECT')
+        ])
+
+    def test_autosaves_do_not_write_session(self):
+        # Первый запрос после входа отмечает время продления, дальше записей нет
+        self.assertEqual(self.count_session_writes(20), 1)
+        self.assertEqual(self.count_session_writes(20), 0)
+        with mock.patch('time.time', return_value=time.time() + 301):
+            self.assertEqual(self.count_session_writes(20), 1)
+
+
+class SyncAnswersTest(VariantTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.execution = self.create_execution()
+        self.client.force_login(self.student)
+        self.url = reverse('variants:sync_answers', args=[self.execution.id])
+
+    def sync(self, ops, client_id='device-1'):
+        return self.client.post(
+            self.url, data={'client_id': client_id, 'ops': ops}, content_type='application/json'
+        ).json()
+
+    def test_replay_is_idempotent(self):
+        task_id = self.tasks[0].id
+        ops = [
+            {'seq': 1, 'task_id': task_id, 'answer': '41', 'current_task_order': 1},
+            {'seq': 2, 'task_id': task_id, 'answer': '42', 'current_task_order': 1},
+            {'seq': 3, 'task_id': None, 'answer': '', 'current_task_order': 2},
+        ]
+        self.assertEqual(self.sync(ops), {'success': True, 'acked_seq': 3})
+        # Повторная отправка (ответ сервера потерялся) ничего не меняет
+        self.assertEqual(self.sync(ops[:2]), {'success': True, 'acked_seq': 3})
+        self.execution.refresh_from_db()
+        self.assertEqual(self.execution.answers, {str(task_id): '42'})
+        self.assertEqual(self.execution.current_task_order, 2)
+
+    def test_ops_are_applied_in_order(self):
+        task_id = self.tasks[1].id
+        self.sync([
+            {'seq': 5, 'task_id': task_id, 'answer': 'новый'},
+            {'seq': 4, 'task_id': task_id, 'answer': 'старый'},
+        ])
+        self.execution.refresh_from_db()
+        self.assertEqual(self.execution.answers[str(task_id)], 'новый')
+
+    def test_navigation_log_and_task_durations(self):
+        self.execution.started_at = timezone.now() - timezone.timedelta(seconds=200)
+        self.execution.save(update_fields=['started_at'])
+        started_ms = int(self.execution.started_at.timestamp() * 1000)
+        self.sync([
+            {'seq': 1, 'task_id': self.tasks[0].id, 'answer': '42', 'current_task_order': 1, 'at': started_ms + 30000},
+            {'seq': 2, 'task_id': None, 'answer': '', 'current_task_order': 2, 'at': started_ms + 40000},
+        ])
+        # Повторная отправка не дописывает журнал
+        self.sync([{'seq': 2, 'task_id': None, 'answer': '', 'current_task_order': 2, 'at': started_ms + 40000}])
+        self.sync([{'seq': 3, 'task_id': None, 'answer': '', 'current_task_order': 3, 'at': started_ms + 100000}])
+        self.execution.refresh_from_db()
+        self.assertEqual(self.execution.navigation_log, 'a1:30;n1:30;n2:40;n3:100;')
+
+        with mock.patch('django.utils.timezone.now', return_value=self.execution.started_at + timezone.timedelta(seconds=130)):
+            self.execution.complete()
+        self.execution.refresh_from_db()
+        self.assertEqual(self.execution.task_durations, {'1': 40, '2': 60, '3': 30})
+        self.assertEqual(self.execution.navigation_log, 'a1:30;n1:30;n2:40;n3:100;')
+
+    def test_malformed_payload_is_rejected(self):
+        payloads = [
+            [1, 2],
+            {'client_id': 'device-1', 'ops': 'seq'},
+            {'client_id': 'device-1', 'ops': [[1, 2]]},
+            {'client_id': 'device-1', 'ops': [{'seq': 1, 'at': 'вчера'}]},
+            {'client_id': 'device-1', 'ops': [{'seq': 1, 'at': 10 ** 20}]},
+        ]
+        for payload in payloads:
+            response = self.client.post(self.url, data=payload, content_type='application/json')
+            self.assertEqual(response.status_code, 400, payload)
+
+    def test_completed_execution_rejects_ops(self):
+        self.execution.complete()
+        result = self.sync([{'seq': 1, 'task_id': self.tasks[0].id, 'answer': '42'}])
+        self.assertFalse(result['success'])
+        self.assertTrue(result['completed'])
+
+
+class VariantStudentStatsTest(VariantTestMixin, TestCase):
+    def test_stats_follow_execution(self):
+        execution = self.create_execution()
+        # Начало выполнения не меняет баллов, сводка обновляется с первым ответом
+        self.assertFalse(VariantStudentStats.objects.filter(variant=self.variant, student=self.student).exists())
+        
+        self.client.force_login(self.student)
+        self.client.post(
+            reverse('variants:save_answer', args=[execution.id]),
+            data={'task_id': self.tasks[1].id, 'answer': '1', 'current_task_order': 2},
+            content_type='application/json'
+        )
+        stats = VariantStudentStats.objects.get(variant=self.variant, student=self.student)
+        self.assertEqual((stats.status, stats.task_statuses, stats.current_task_order), ('in_progress', '.-.', 2))
+        
+        execution.refresh_from_db()
+        execution.answers[str(self.tasks[0].id)] = '42'
+        execution.complete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.status, stats.correct_count, stats.task_statuses), ('completed', 1, '+-.'))
+
+    def test_regrade_updates_stats(self):
+        from .regrade import regrade_task_executions
+        self.create_execution({str(self.tasks[0].id): '43'}).complete()
+        self.tasks[0].correct_answer = '43'
+        self.tasks[0].save()
+        regrade_task_executions(self.tasks[0])
+        stats = VariantStudentStats.objects.get(variant=self.variant, student=self.student)
+        self.assertEqual((stats.correct_count, stats.task_statuses), (1, '+..'))
+
+    def test_statistics_page_query_count_does_not_grow(self):
+        group = Group.objects.create(name='Группа', created_by=self.teacher)
+        group.students.add(self.student)
+        self.create_execution({str(self.tasks[0].id): '42'}).complete()
+        self.client.force_login(self.teacher)
+        url = reverse('variants:variant_statistics', args=[self.variant.id])
+        
+        response = self.client.get(url, {'group': group.id, 'sort': 'score'})
+        first_stat = response.context['students_statistics'][0]
+        self.assertEqual(first_stat['task_statuses'], ['correct', 'not_started', 'not_started'])
+        
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(url, {'group': group.id})
+        for index in range(10):
+            student = User.objects.create_user(username=f'student{index}', role='student', password='student_psw')
+            group.students.add(student)
+            self.client.get(url, {'group': group.id})
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url, {'group': group.id})
+        self.assertEqual(len(response.context['students_statistics']), 11)
+        self.assertEqual(len(many), len(single))
+        # Ученики без сводки показываются, но страница ничего не записывает
+        self.assertFalse([query for query in many if not query['sql'].startswith('SELECT')])
+        self.assertEqual(VariantStudentStats.objects.filter(variant=self.variant).count(), 1)
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_autosave_refreshes_stats_once_per_interval(self):
+        execution = self.create_execution()
+        self.client.force_login(self.student)
+        url = reverse('variants:save_answer', args=[execution.id])
+        for index, answer in enumerate(['1', '87 184328']):
+            self.client.post(url, data={'task_id': self.tasks[index].id, 'answer': answer}, content_type='application/json')
+        stats = VariantStudentStats.objects.get(variant=self.variant, student=self.student)
+        self.assertEqual(stats.task_statuses, '-..')
+        
+        execution.refresh_from_db()
+        execution.complete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.status, stats.task_statuses), ('completed', '-+.'))
+
+
+class StatisticsFeedTest(VariantTestMixin, TestCase):
+    # Счетчик изменений хранится в БД, поэтому лента работает и без общего кеша
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.teacher)
+        self.url = reverse('variants:variant_statistics_feed', args=[self.variant.id])
+
+    def test_long_poll_returns_changes_after_cursor(self):
+        from .monitoring import format_cursor, get_stats_version
+        cursor = format_cursor(get_stats_version(self.variant.id))
+        execution = self.create_execution({str(self.tasks[0].id): '42'})
+        # Сводка обновляется при сохранении ответов, а не при начале выполнения
+        self.assertEqual(get_stats_version(self.variant.id), int(cursor))
+        execution.refresh_stats()
+        self.assertGreater(get_stats_version(self.variant.id), int(cursor))
+        
+        data = self.client.get(self.url, {'since': cursor}).json()
+        self.assertEqual(len(data['changes']), 1)
+        row = data['changes'][0]
+        self.assertEqual((row['student_id'], row['status'], row['answered_count']), (self.student.id, 'in_progress', 1))
+        
+        execution.complete()
+        data = self.client.get(self.url, {'since': data['cursor']}).json()
+        self.assertEqual(data['changes'][0]['status'], 'completed')
+        self.assertEqual(data['changes'][0]['task_statuses'], ['correct', 'not_started', 'not_started'])
+
+    def test_long_poll_times_out_without_changes(self):
+        from .monitoring import format_cursor, get_stats_version
+        self.create_execution()
+        cursor = format_cursor(get_stats_version(self.variant.id))
+        with mock.patch('variants.monitoring.LONG_POLL_TIMEOUT', 0):
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(self.url, {'since': cursor}).json()
+        self.assertEqual((data['changes'], data['cursor']), ([], cursor))
+        # Без изменений читается только счетчик, сводки не запрашиваются
+        self.assertFalse([query for query in queries if 'variants_variantstudentstats' in query['sql']])
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_stats_version_is_cached_until_commit(self):
+        from .monitoring import get_stats_version
+        cache.clear()
+        execution = self.create_execution({str(self.tasks[0].id): '42'})
+        version = get_stats_version(self.variant.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_stats_version(self.variant.id), version)
+        with self.captureOnCommitCallbacks(execute=True):
+            execution.refresh_stats()
+        # После фиксации ключ кеша сбрасывается, новый номер виден сразу
+        self.assertGreater(get_stats_version(self.variant.id), version)
+        cache.clear()
+
+    def test_long_poll_answers_at_once_when_waiters_limit_reached(self):
+        from .monitoring import format_cursor, get_stats_version, long_poll_waiters
+        cursor = format_cursor(get_stats_version(self.variant.id))
+        with mock.patch.object(long_poll_waiters, 'limit', 1), long_poll_waiters.admit() as admitted:
+            self.assertTrue(admitted)
+            started = time.monotonic()
+            data = self.client.get(self.url, {'since': cursor}).json()
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual((data['changes'], data['cursor']), ([], cursor))
+        self.assertIn('retry_after', data)
+
+    def test_feed_requires_variant_owner(self):
+        other = User.objects.create_user(username='other_teacher', role='teacher', password='teacher_psw')
+        self.client.force_login(other)
+        response = self.client.get(self.url, {'since': '0'})
+        self.assertEqual(response.status_code, 403)
+
+
+class ItemAnalysisTest(VariantTestMixin, TestCase):
+    def complete_execution(self, answers):
+        execution = self.create_execution({str(self.tasks[index].id): answer for index, answer in answers.items()})
+        execution.complete()
+        return execution
+
+    def test_refresh_is_incremental(self):
+        from .analytics import refresh_item_analysis
+        from .models import TaskItemStats
+        self.complete_execution({0: '42', 1: '87 184328', 2: 'zxyw'})
+        self.complete_execution({0: '42', 2: 'abc'})
+        self.complete_execution({0: '1'})
+        self.assertEqual(refresh_item_analysis(chunk_size=2), 3)
+        self.assertEqual(refresh_item_analysis(), 0)
+        
+        stats = TaskItemStats.objects.get(variant=self.variant, task=self.tasks[0])
+        self.assertEqual((stats.executions_count, stats.correct_count), (3, 2))
+        self.assertAlmostEqual(stats.get_discrimination(), 4 / 28 ** 0.5)
+        
+        self.complete_execution({2: 'ABC '})
+        self.assertEqual(refresh_item_analysis(), 1)
+        stats = TaskItemStats.objects.get(variant=self.variant, task=self.tasks[2])
+        self.assertEqual(stats.get_top_wrong_answers(), [('abc', 2)])
+        self.assertAlmostEqual(stats.get_solve_rate(), 0.25)
+
+    def test_regrade_rebuilds_item_stats(self):
+        from .analytics import refresh_item_analysis
+        from .models import TaskItemStats
+        from .regrade import regrade_task_executions
+        self.complete_execution({0: '43'})
+        refresh_item_analysis()
+        self.tasks[0].correct_answer = '43'
+        self.tasks[0].save()
+        regrade_task_executions(self.tasks[0])
+        stats = TaskItemStats.objects.get(variant=self.variant, task=self.tasks[0])
+        self.assertEqual((stats.executions_count, stats.correct_count, stats.wrong_answers), (1, 1, {}))
+
+    def test_late_commit_is_counted_once(self):
+        from datetime import timedelta
+        from .analytics import refresh_item_analysis
+        from .models import TaskItemStats
+        early = self.complete_execution({0: '42'})
+        self.complete_execution({0: '1'})
+        self.assertEqual(refresh_item_analysis(), 2)
+        
+        # Выполнение, завершенное раньше отметки, но зафиксированное после обработки
+        late = self.complete_execution({0: '42'})
+        VariantExecution.objects.filter(id=late.id).update(completed_at=early.completed_at - timedelta(seconds=1))
+        self.assertEqual(refresh_item_analysis(), 1)
+        self.assertEqual(refresh_item_analysis(), 0)
+        stats = TaskItemStats.objects.get(variant=self.variant, task=self.tasks[0])
+        self.assertEqual((stats.executions_count, stats.correct_count), (3, 2))
+
+    def test_report_page_only_reads_stats(self):
+        from .analytics import refresh_item_analysis
+        self.complete_execution({0: '42'})
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('variants:variant_item_analysis', args=[self.variant.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['items'][0]['solve_rate'])
+        
+        refresh_item_analysis()
+        response = self.client.get(reverse('variants:variant_item_analysis', args=[self.variant.id]))
+        self.assertEqual(response.context['items'][0]['solve_rate'], 1)
+
+
+class StudentMasteryTest(VariantTestMixin, TestCase):
+    def test_completion_updates_mastery(self):
+        from .models import StudentMastery
+        self.create_execution({str(self.tasks[0].id): '42'}).complete()
+        mastery = StudentMastery.objects.get(student=self.student, task_type='1', subtype='')
+        self.assertEqual((mastery.attempts, mastery.correct_count), (3, 1))
+        self.assertAlmostEqual(mastery.score, 0.49)
+        
+        self.create_execution({str(task.id): task.correct_answer for task in self.tasks}).complete()
+        mastery.refresh_from_db()
+        self.assertEqual((mastery.attempts, mastery.correct_count), (6, 4))
+        self.assertGreater(mastery.score, 0.8)
+
+    def test_rebuild_grades_executions_without_grade_map(self):
+        from .mastery import rebuild_student_mastery
+        from .models import StudentMastery
+        execution = self.create_execution({str(self.tasks[0].id): '42'})
+        execution.complete()
+        VariantExecution.objects.filter(id=execution.id).update(grade_map='')
+        self.assertEqual(rebuild_student_mastery([self.student.id]), (1, 1))
+        mastery = StudentMastery.objects.get(student=self.student, task_type='1', subtype='')
+        self.assertEqual((mastery.attempts, mastery.correct_count), (3, 1))
+
+    def test_group_heatmap(self):
+        group = Group.objects.create(name='Группа', created_by=self.teacher)
+        group.students.add(self.student)
+        self.create_execution({str(self.tasks[0].id): '42'}).complete()
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('variants:group_mastery', args=[group.id]))
+        self.assertEqual([value for value, label in response.context['task_types']], ['1'])
+        self.assertEqual(response.context['rows'][0]['cells'][0]['score_percent'], 49)
+        
+        response = self.client.get(reverse('variants:student_mastery', args=[self.student.id]))
+        self.assertEqual(response.status_code, 200)
+
+
+class GradebookExportTest(VariantTestMixin, TestCase):
+    def test_csv_is_streamed(self):
+        group = Group.objects.create(name='Группа', created_by=self.teacher)
+        idle = User.objects.create_user(
+            username='idle', first_name='Ученик', last_name='Без выполнений', role='student', password='student_psw'
+        )
+        group.students.add(self.student, idle)
+        self.create_execution({str(self.tasks[0].id): '42', str(self.tasks[1].id): '1'}).complete()
+        
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('variants:group_gradebook_export', args=[group.id]))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[0], 'Ученик;Логин;Вариант 1: результат;Вариант 1: статус;Вариант 1: №1;Вариант 1: №2;Вариант 1: №3')
+        self.assertEqual(lines[1], 'Без выполнений Ученик;idle;;;;;')
+        self.assertEqual(lines[2], 'Тестовый Ученик;student;1/3;Завершено;+;-;')
+
+
+class AnswersMatrixExportTest(VariantTestMixin, TestCase):
+    def test_export_writes_npy_bundle(self):
+        import json
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        from .answers_matrix import read_npy
+        self.create_execution({str(self.tasks[0].id): '41'}).complete()
+        # Учитывается последнее выполнение ученика
+        self.create_execution({str(self.tasks[0].id): '42', str(self.tasks[1].id): 'ответ'}).complete()
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('export_answers_matrix', output_dir, variant=[self.variant.id], stdout=StringIO())
+            with open(os.path.join(output_dir, 'manifest.json'), encoding='utf-8') as manifest_file:
+                manifest = json.load(manifest_file)
+            self.assertEqual(manifest['shape'], [1, 3])
+            self.assertEqual(read_npy(os.path.join(output_dir, 'students.npy'))[1].tolist(), [self.student.id])
+            self.assertEqual(read_npy(os.path.join(output_dir, 'tasks.npy'))[1].tolist(), [task.id for task in self.tasks])
+            shape, responses = read_npy(os.path.join(output_dir, 'responses.npy'))
+            self.assertEqual((shape, responses.tolist()), ((1, 3), [1, 2, 3]))
+
+            answer_ids = read_npy(os.path.join(output_dir, 'answer_ids.npy'))[1].tolist()
+            offsets = read_npy(os.path.join(output_dir, 'answer_offsets.npy'))[1].tolist()
+            with open(os.path.join(output_dir, 'answer_strings.bin'), 'rb') as strings_file:
+                strings = strings_file.read()
+            answers = [strings[offsets[i]:offsets[i + 1]].decode('utf-8') for i in answer_ids]
+            self.assertEqual(answers, ['42', 'ответ', ''])
+
+
+class DailyRollupTest(VariantTestMixin, TestCase):
+    def test_refresh_rolls_up_by_teacher_group_and_type(self):
+        from .analytics import refresh_rollups, get_rollup_report
+        group = Group.objects.create(name='Группа', created_by=self.teacher)
+        group.students.add(self.student)
+        self.create_execution({str(self.tasks[0].id): '42'}).complete()
+        self.assertEqual(refresh_rollups(), 1)
+        self.create_execution({str(self.tasks[0].id): '42', str(self.tasks[2].id): 'zxyw'}).complete()
+        self.assertEqual(refresh_rollups(), 1)
+        self.assertEqual(refresh_rollups(), 0)
+        
+        today = timezone.localdate()
+        for report_group in (None, group):
+            by_type, by_day = get_rollup_report(self.teacher, today, today, report_group)
+            self.assertEqual(len(by_type), 1)
+            row = by_type[0]
+            self.assertEqual((row['task_type'], row['completions'], row['attempts'], row['correct_count']), ('1', 2, 6, 3))
+            self.assertEqual(by_day[0]['day'], today)
+
+    def test_rollup_without_group_is_unique(self):
+        from django.db import IntegrityError
+        from .models import DailyRollup
+        DailyRollup.objects.create(teacher=self.teacher, task_type='1', day=timezone.localdate())
+        with self.assertRaises(IntegrityError):
+            DailyRollup.objects.create(teacher=self.teacher, task_type='1', day=timezone.localdate())
+
+    def test_analytics_page_only_reads_rollups(self):
+        from django.core.management import call_command
+        self.create_execution({str(self.tasks[0].id): '42'}).complete()
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('variants:teacher_analytics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['by_type'], [])
+        
+        call_command('refresh_rollups', stdout=io.StringIO())
+        response = self.client.get(reverse('variants:teacher_analytics'))
+        self.assertEqual(response.context['by_type'][0]['attempts'], 3)
+        self.assertIsNotNone(response.context['refreshed_at'])
+
+
+class ScheduledAssignmentTest(VariantTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.group = Group.objects.create(name='10А', created_by=self.teacher)
+        self.students = [self.student] + [
+            User.objects.create_user(username=f'student{number}', role='student', created_by=self.teacher)
+            for number in range(2)
+        ]
+        self.group.students.add(*self.students)
+        self.client.force_login(self.teacher)
+        opens_at = timezone.localtime() + timezone.timedelta(hours=1)
+        self.client.post(reverse('variants:assign_variants_to_group'), {
+            'group': self.group.id,
+            'variants': [self.variant.id],
+            'opens_at': opens_at.strftime('%Y-%m-%dT%H:%M'),
+            'mode': 'new',
+        })
+        self.assignment = VariantAssignment.objects.get(student=self.student, opens_at__isnull=False)
+
+    def test_executions_are_provisioned(self):
+        executions = VariantExecution.objects.filter(assignment__opens_at__isnull=False)
+        self.assertEqual(executions.count(), 3)
+        self.assertEqual(set(executions.values_list('status', flat=True)), {'not_started'})
+
+    def test_start_is_one_conditional_update(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('variants:variant_start', args=[self.variant.id]))
+        self.assertRedirects(response, reverse('variants:variant_list'), fetch_redirect_response=False)
+        execution = VariantExecution.objects.get(assignment=self.assignment)
+        self.assertEqual(execution.status, 'not_started')
+        
+        VariantAssignment.objects.filter(id=self.assignment.id).update(opens_at=timezone.now())
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('variants:variant_start', args=[self.variant.id]))
+        self.assertRedirects(response, reverse('variants:variant_execute', args=[execution.id]), fetch_redirect_response=False)
+        writes = [query['sql'] for query in queries if not query['sql'].startswith('SELECT')]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE "variants_variantexecution"'))
+        
+        execution.refresh_from_db()
+        started_at = execution.started_at
+        self.assertFalse(execution.start())
+        execution.refresh_from_db()
+        self.assertEqual((execution.status, execution.started_at), ('in_progress', started_at))
+
+    def test_get_execution_prefers_started(self):
+        started = self.create_execution()
+        VariantExecution.objects.create(variant=self.variant, student=self.student, assignment=self.assignment)
+        self.assertEqual(self.assignment.get_execution(), started)
+
+
+class GroupAssignmentModesTest(VariantTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.group = Group.objects.create(name='10А', created_by=self.teacher)
+        self.students = [self.student] + [
+            User.objects.create_user(username=f'student{number}', role='student', created_by=self.teacher)
+            for number in range(4)
+        ]
+        self.group.students.add(*self.students)
+        self.client.force_login(self.teacher)
+
+    def assign(self, mode):
+        return self.client.post(reverse('variants:assign_variants_to_group'), {
+            'group': self.group.id, 'variants': [self.variant.id], 'mode': mode,
+        })
+
+    def get_active_count(self):
+        return VariantAssignment.objects.filter(variant=self.variant, is_active=True).count()
+
+    def test_reuse_does_not_duplicate(self):
+        self.assign('reuse')
+        self.assign('reuse')
+        # У первого ученика уже было назначение из setUp
+        self.assertEqual(self.get_active_count(), 5)
+        self.assertEqual(VariantAssignment.objects.count(), 5)
+
+    def test_reuse_assigns_other_variant(self):
+        from .assignments import assign_variants
+        other_variant = Variant.objects.create(name='Вариант 2', created_by=self.teacher)
+        # Ученику выпадает второй вариант; назначение первого (из setUp) этому не мешает
+        with mock.patch('variants.assignments.random.shuffle', side_effect=lambda items: items.reverse()):
+            created, reused, _ = assign_variants([self.student], [self.variant, other_variant], self.teacher)
+            self.assertEqual((created, reused), (1, 0))
+            created, reused, _ = assign_variants([self.student], [self.variant, other_variant], self.teacher)
+            self.assertEqual((created, reused), (0, 1))
+        self.assertEqual(VariantAssignment.objects.filter(student=self.student, is_active=True).count(), 2)
+
+    def test_replace_and_revoke_are_set_based(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assign('replace')
+        assignment_writes = [
+            query for query in queries
+            if query['sql'].startswith(('INSERT', 'UPDATE')) and 'variants_variantassignment' in query['sql']
+        ]
+        self.assertEqual(len(assignment_writes), 2)
+        self.assertEqual(self.get_active_count(), 5)
+        self.assertFalse(VariantAssignment.objects.get(id=self.assignment.id).is_active)
+        
+        self.client.post(reverse('variants:revoke_variants_from_group'), {
+            'group': self.group.id, 'variants': [self.variant.id],
+        })
+        self.assertEqual(self.get_active_count(), 0)
+
+
+class AssignmentSweepTest(VariantTestMixin, TestCase):
+    def create_assignment(self, deadline_days_ago=None):
+        deadline = None
+        if deadline_days_ago is not None:
+            deadline = timezone.now() - timezone.timedelta(days=deadline_days_ago)
+        return VariantAssignment.objects.create(
+            variant=self.variant, student=self.student, assigned_by=self.teacher, deadline=deadline
+        )
+
+    def test_sweep_archives_stale_assignments(self):
+        from django.core.management import call_command
+        from .assignments import get_student_assignments, get_overdue_assignments
+        expired = self.create_assignment(deadline_days_ago=10)
+        overdue = self.create_assignment(deadline_days_ago=1)
+        self.create_execution().complete()
+        VariantExecution.objects.filter(assignment=self.assignment).update(
+            completed_at=timezone.now() - timezone.timedelta(days=40)
+        )
+        self.assertEqual(
+            [assignment.id for assignment in get_overdue_assignments(self.teacher)], [expired.id, overdue.id]
+        )
+        
+        call_command('sweep_assignments', stdout=io.StringIO())
+        active_ids = set(VariantAssignment.objects.filter(is_active=True).values_list('id', flat=True))
+        self.assertEqual(active_ids, {overdue.id})
+        self.assertEqual(
+            {assignment.id for assignment in get_student_assignments(self.student, archived=True)},
+            {expired.id, self.assignment.id}
+        )
+        self.assertEqual([assignment.id for assignment in get_overdue_assignments(self.teacher)], [overdue.id])
+        
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('variants:overdue_assignments'))
+        self.assertEqual([assignment.id for assignment in response.context['assignments']], [overdue.id])
+
+
+class AssignmentStatusServiceTest(VariantTestMixin, TestCase):
+    def test_split_and_keyset_pages(self):
+        from .assignments import get_student_assignments, get_assignments_page, build_assignment_items
+        self.create_execution().complete()
+        for _ in range(4):
+            VariantAssignment.objects.create(variant=self.variant, student=self.student, assigned_by=self.teacher)
+        
+        archived = build_assignment_items(get_student_assignments(self.student, archived=True))
+        self.assertEqual([item['assignment'].id for item in archived], [self.assignment.id])
+        self.assertTrue(archived[0]['is_completed'])
+        self.assertEqual((archived[0]['execution']['score'], archived[0]['tasks_count']), (0, 3))
+        
+        to_do = get_student_assignments(self.student)
+        first_page, cursor = get_assignments_page(to_do, page_size=3)
+        second_page, last_cursor = get_assignments_page(to_do, cursor, page_size=3)
+        self.assertEqual((len(first_page), len(second_page), last_cursor), (3, 1, None))
+        self.assertFalse({a.id for a in first_page} & {a.id for a in second_page})
+
+    def test_latest_execution_skips_not_started(self):
+        from .assignments import with_execution_status
+        execution = self.create_execution()
+        execution.complete()
+        # Более новое, но неначатое выполнение не считается последним
+        VariantExecution.objects.create(variant=self.variant, student=self.student, assignment=self.assignment)
+        assignment = with_execution_status(VariantAssignment.objects.filter(id=self.assignment.id)).get()
+        self.assertEqual((assignment.latest_execution_id, assignment.latest_execution_status), (execution.id, 'completed'))
+
+    def test_dashboard_queries_do_not_grow(self):
+        self.client.force_login(self.student)
+        # Первый запрос после входа продлевает сессию, его не считаем
+        self.client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(reverse('dashboard'))
+        for _ in range(5):
+            assignment = VariantAssignment.objects.create(
+                variant=self.variant, student=self.student, assigned_by=self.teacher
+            )
+            VariantExecution.objects.create(variant=self.variant, student=self.student, assignment=assignment).start()
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(len(response.context['variants_to_do']), 6)
+        self.assertEqual(len(many), len(single))
+        
+        response = self.client.get(reverse('variants:variant_list'), {'archive': '1'})
+        self.assertEqual(response.context['variants_data'], [])
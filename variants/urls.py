@@ -12,12 +12,23 @@ urlpatterns = [
     path('<int:variant_id>/delete/', views.variant_delete, name='variant_delete'),
     path('<int:variant_id>/start/', views.variant_start, name='variant_start'),
     path('<int:variant_id>/statistics/', views.variant_statistics, name='variant_statistics'),
+    path('<int:variant_id>/item-analysis/', views.variant_item_analysis, name='variant_item_analysis'),
+    path('mastery/student/<int:student_id>/', views.student_mastery, name='student_mastery'),
+    path('mastery/group/<int:group_id>/', views.group_mastery, name='group_mastery'),
+    path('gradebook/group/<int:group_id>/', views.group_gradebook_export, name='group_gradebook_export'),
+    path('analytics/', views.teacher_analytics, name='teacher_analytics'),
+    path('<int:variant_id>/statistics/feed/', views.variant_statistics_feed, name='variant_statistics_feed'),
     path('execute/<int:execution_id>/', views.variant_execute, name='variant_execute'),
+    path('execute/<int:execution_id>/content/', views.execution_content, name='execution_content'),
+    path('execute/<int:execution_id>/state/', views.execution_state, name='execution_state'),
     path('result/<int:execution_id>/', views.variant_result, name='variant_result'),
     path('executions/', views.variant_execution_list, name='variant_execution_list'),
     path('save-answer/<int:execution_id>/', views.save_answer, name='save_answer'),
+    path('sync-answers/<int:execution_id>/', views.sync_answers, name='sync_answers'),
     path('assign-to-student/', views.assign_variant_to_student, name='assign_variant_to_student'),
     path('assign-to-group/', views.assign_variants_to_group, name='assign_variants_to_group'),
+    path('revoke-from-group/', views.revoke_variants_from_group, name='revoke_variants_from_group'),
+    path('overdue/', views.overdue_assignments, name='overdue_assignments'),
     path('start-by-number/', views.variant_start_by_number, name='variant_start_by_number'),
 ]
 
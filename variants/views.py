@@ -2,55 +2,80 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Q
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, JsonResponse, Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import add_never_cache_headers, get_conditional_response, patch_cache_control
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 from django.contrib.auth import get_user_model
 import random
 import json
+from datetime import datetime, timedelta, timezone as dt_timezone
 
 from .models import Variant, VariantTask, VariantExecution, VariantAssignment
+from .analytics import (
+    get_item_analysis, get_refreshed_at, get_rollup_report, ITEM_ANALYSIS_WATERMARK, ROLLUPS_WATERMARK
+)
+from . import gradebook
+from .assignments import (
+    get_student_assignments, get_assignments_page, build_assignment_items, assign_variants, revoke_assignments,
+    get_overdue_assignments, LATEST_EXECUTION_ORDER
+)
+from .content import get_variant_content
+from .mastery import get_student_mastery, get_group_heatmap
+from .monitoring import (
+    get_stats_queryset, get_group_stats, get_stats_version, serialize_stats, format_cursor, parse_cursor,
+    wait_for_stats_changes, stream_stats_events, long_poll_waiters, LONG_POLL_BUSY_RETRY_AFTER
+)
 from .forms import (
     VariantFromTemplateForm, VariantFromSpecificTasksForm,
-    AssignVariantToStudentForm, AssignVariantsToGroupForm, VariantByNumberForm
+    AssignVariantToStudentForm, AssignVariantsToGroupForm, RevokeVariantsFromGroupForm, VariantByNumberForm, AnalyticsPeriodForm
 )
 from tasks.models import Task
 from users.models import Group
 
 User = get_user_model()
 
+# Период аналитики учителя по умолчанию (в днях)
+ANALYTICS_DEFAULT_PERIOD_DAYS = 30
+
+# Количество учеников на странице статистики варианта
+STATISTICS_PAGE_SIZE = 50
+
+# Сортировки таблицы статистики варианта
+STATISTICS_SORT_ORDERS = {
+    'name': ['student__last_name', 'student__first_name', 'student_id'],
+    'score': ['-correct_count', 'student__last_name', 'student__first_name', 'student_id'],
+    'status': ['status', 'student__last_name', 'student__first_name', 'student_id'],
+}
+
 
 @login_required
 def variant_list(request):
     """Список вариантов"""
     if request.user.role == 'student':
-        # Для учеников показываем только назначенные варианты
-        assignments = VariantAssignment.objects.filter(
-            student=request.user,
-            is_active=True
-        ).select_related('variant', 'variant__created_by').order_by('-assigned_at')
+        # Для учеников показываем только назначенные варианты:
+        # к выполнению или архив завершенных, постранично
+        archived = request.GET.get('archive') == '1'
+        assignments = get_student_assignments(request.user, archived=archived)
+        page, next_cursor = get_assignments_page(assignments, request.GET.get('after'))
         
         # Отладочная информация
-        if not assignments.exists():
+        if not page and not archived and not request.GET.get('after'):
             # Проверяем, есть ли назначения вообще (даже неактивные)
-            all_assignments = VariantAssignment.objects.filter(student=request.user)
-            if all_assignments.exists():
-                messages.warning(request, f'Найдено {all_assignments.count()} назначений, но они неактивны. Обратитесь к учителю.')
-        
-        variants_data = []
-        for assignment in assignments:
-            execution = assignment.get_execution()
-            variants_data.append({
-                'assignment': assignment,
-                'variant': assignment.variant,
-                'execution': execution,
-                'is_completed': assignment.is_completed(),
-                'is_overdue': assignment.is_overdue(),
-            })
+            inactive_count = VariantAssignment.objects.filter(
+                student=request.user, is_active=False, is_archived=False
+            ).count()
+            if inactive_count:
+                messages.warning(request, f'Найдено {inactive_count} назначений, но они неактивны. Обратитесь к учителю.')
         
         context = {
-            'variants_data': variants_data,
+            'variants_data': build_assignment_items(page),
+            'next_cursor': next_cursor,
+            'archived': archived,
             'is_student': True,
         }
         return render(request, 'variants/variant_list_student.html', context)
@@ -367,6 +392,12 @@ def variant_delete(request, variant_id):
     return render(request, 'variants/variant_delete.html', {'variant': variant})
 
 
+def get_not_open_message(assignment):
+    """Сообщение о варианте, время открытия которого еще не наступило"""
+    opens_at = timezone.localtime(assignment.opens_at).strftime('%d.%m.%Y %H:%M')
+    return f'Вариант откроется {opens_at}'
+
+
 @login_required
 def variant_start(request, variant_id):
     """Начать выполнение варианта"""
@@ -384,8 +415,12 @@ def variant_start(request, variant_id):
             messages.error(request, 'У вас нет доступа к этому варианту')
             return redirect('variants:variant_list')
         
+        if not assignment.is_open():
+            messages.error(request, get_not_open_message(assignment))
+            return redirect('variants:variant_list')
+        
         # Получаем выполнение для этого назначения
-        execution = VariantExecution.objects.filter(assignment=assignment).first()
+        execution = VariantExecution.objects.filter(assignment=assignment).order_by(*LATEST_EXECUTION_ORDER).first()
         
         if execution:
             # Если выполнение уже существует
@@ -423,7 +458,7 @@ def variant_start(request, variant_id):
             # Если выполнение в процессе, продолжаем его
             elif execution.status == 'in_progress':
                 return redirect('variants:variant_execute', execution_id=execution.id)
-            # Если выполнение не начато, начинаем его
+            # Если выполнение не начато (в том числе подготовлено заранее), начинаем его
             elif execution.status == 'not_started':
                 execution.start()
         else:
@@ -449,16 +484,16 @@ def variant_execute(request, execution_id):
         return redirect('variants:variant_result', execution_id=execution.id)
     
     if execution.status == 'not_started':
+        if execution.assignment_id and not execution.assignment.is_open():
+            messages.error(request, get_not_open_message(execution.assignment))
+            return redirect('variants:variant_list')
         execution.start()
     
     variant = execution.variant
-    tasks = variant.variant_tasks.select_related('task').order_by('order')
     
-    # Получаем ответы для каждого задания
-    task_answers = {}
-    for variant_task in tasks:
-        task_id = str(variant_task.task.id)
-        task_answers[str(variant_task.task.id)] = execution.answers.get(task_id, '')
+    # Страница содержит только состояние выполнения, задания загружаются
+    # отдельно из общего для варианта содержимого (execution_content)
+    task_answers = execution.answers or {}
     
     # Проверяем время, если установлено ограничение
     remaining_time = None
@@ -482,20 +517,24 @@ def variant_execute(request, execution_id):
             
             if current_task_order:
                 try:
-                    execution.current_task_order = int(current_task_order)
+                    current_task_order = int(current_task_order)
                 except ValueError:
                     pass
+                else:
+                    execution.record_event(VariantExecution.EVENT_ANSWER, current_task_order)
+                    execution.move_to_task(current_task_order)
             
-            execution.save()
+            execution.save_progress()
+            execution.refresh_progress_stats()
             return JsonResponse({'success': True})
         
         # Завершение варианта
         if 'complete' in request.POST:
             # Сохраняем все ответы из формы перед завершением
             answers = execution.answers.copy() if execution.answers else {}
-            for variant_task in tasks:
-                task_id = str(variant_task.task.id)
-                answer_key = f'answer_{variant_task.task.id}'
+            for task_id in variant.variant_tasks.values_list('task_id', flat=True):
+                task_id = str(task_id)
+                answer_key = f'answer_{task_id}'
                 # Сохраняем ответ из формы, даже если он пустой
                 if answer_key in request.POST:
                     answers[task_id] = request.POST.get(answer_key, '').strip()
@@ -504,14 +543,13 @@ def variant_execute(request, execution_id):
                 elif task_id not in answers:
                     answers[task_id] = ''
             execution.answers = answers
-            execution.save()  # Сохраняем перед завершением
+            execution.save(update_fields=['answers'])  # Сохраняем перед завершением
             execution.complete()
             return redirect('variants:variant_result', execution_id=execution.id)
     
     context = {
         'execution': execution,
         'variant': variant,
-        'tasks': tasks,
         'task_answers_json': json.dumps(task_answers),
         'task_answers': task_answers,
         'remaining_time': remaining_time,
@@ -520,6 +558,54 @@ def variant_execute(request, execution_id):
     return render(request, 'variants/variant_execute.html', context)
 
 
+@login_required
+def execution_content(request, execution_id):
+    """Содержимое заданий варианта в JSON (общее для всех учеников, с ETag)"""
+    variant_id = VariantExecution.objects.filter(
+        id=execution_id, student=request.user
+    ).values_list('variant_id', flat=True).first()
+    if variant_id is None:
+        raise Http404('Выполнение не найдено')
+    
+    variant = Variant(id=variant_id)
+    version = variant.get_content_version()
+    etag = f'"{variant_id}-{version}"'
+    
+    # Если у клиента актуальная версия, отдаем 304 без тела
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        content = get_variant_content(variant, version)
+        response = JsonResponse(content)
+    response['ETag'] = etag
+    # Разрешаем браузеру хранить содержимое, но проверять его при каждом использовании
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+def execution_state(request, execution_id):
+    """Состояние выполнения в JSON: ответы, оставшееся время, текущее задание"""
+    execution = get_object_or_404(
+        VariantExecution.objects.select_related('variant'), id=execution_id, student=request.user
+    )
+    
+    remaining_time = None
+    if execution.status == 'in_progress' and execution.variant.time_limit_minutes:
+        remaining_time = execution.get_remaining_time()
+        if remaining_time is not None and remaining_time <= 0:
+            execution.timeout()
+    
+    response = JsonResponse({
+        'status': execution.status,
+        'answers': execution.answers or {},
+        'current_task_order': execution.current_task_order,
+        'remaining_time': remaining_time,
+        'result_url': reverse('variants:variant_result', args=[execution.id]),
+    })
+    add_never_cache_headers(response)
+    return response
+
+
 @login_required
 def variant_result(request, execution_id):
     """Результаты выполнения варианта"""
@@ -548,15 +634,16 @@ def variant_result(request, execution_id):
     else:
         card_color = 'danger'
     
-    # Получаем ответы и правильность для каждого задания
+    # Получаем ответы и правильность для каждого задания (из сохраненной проверки)
+    grade_map = execution.get_grade_map()
     task_results = []
     answered_count = 0
-    for variant_task in tasks:
+    for index, variant_task in enumerate(tasks):
         task_id = str(variant_task.task.id)
         user_answer = execution.answers.get(task_id, '')
         if user_answer and user_answer.strip():
             answered_count += 1
-        is_correct = user_answer.strip() == variant_task.task.correct_answer.strip()
+        is_correct = index < len(grade_map) and grade_map[index] == '1'
         task_results.append({
             'variant_task': variant_task,
             'user_answer': user_answer,
@@ -620,19 +707,24 @@ def save_answer(request, execution_id):
         # Обновляем текущее задание, если указано
         if current_task_order:
             try:
-                execution.current_task_order = int(current_task_order)
+                current_task_order = int(current_task_order)
             except (ValueError, TypeError):
-                pass
+                current_task_order = None
         
         if task_id:
             answers = execution.answers.copy() if execution.answers else {}
             answers[str(task_id)] = answer
             execution.answers = answers
-            execution.save()
+            execution.record_event(VariantExecution.EVENT_ANSWER, current_task_order)
+            execution.move_to_task(current_task_order)
+            execution.save_progress()
+            execution.refresh_progress_stats()
             return JsonResponse({'success': True})
         elif current_task_order:
             # Если только обновление текущего задания без ответа
-            execution.save()
+            execution.move_to_task(current_task_order)
+            execution.save_progress()
+            execution.refresh_progress_stats()
             return JsonResponse({'success': True})
         
         return JsonResponse({'success': False, 'error': 'Неверные данные'})
@@ -640,6 +732,58 @@ def save_answer(request, execution_id):
         return JsonResponse({'success': False, 'error': f'Ошибка сохранения: {str(e)}'})
 
 
+@login_required
+@require_POST
+def sync_answers(request, execution_id):
+    """Синхронизация очереди ответов клиента (идемпотентно по номерам операций)"""
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError as e:
+        return JsonResponse({'success': False, 'error': f'Ошибка парсинга JSON: {str(e)}'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'success': False, 'error': 'Неверные данные'}, status=400)
+    
+    client_id = str(data.get('client_id') or '')[:64]
+    if not client_id:
+        return JsonResponse({'success': False, 'error': 'Не указан идентификатор клиента'}, status=400)
+    
+    raw_ops = data.get('ops') or []
+    if not isinstance(raw_ops, list) or not all(isinstance(op, dict) for op in raw_ops):
+        return JsonResponse({'success': False, 'error': 'Неверные данные'}, status=400)
+    
+    ops = []
+    try:
+        for op in raw_ops:
+            ops.append({
+                'seq': int(op['seq']),
+                'task_id': int(op['task_id']) if op.get('task_id') else None,
+                'answer': str(op.get('answer') or ''),
+                'current_task_order': int(op['current_task_order']) if op.get('current_task_order') else None,
+                # Время операции на клиенте (мс от начала эпохи), важно для офлайн-очереди
+                'at': datetime.fromtimestamp(int(op['at']) / 1000, tz=dt_timezone.utc) if op.get('at') else None,
+            })
+    except (KeyError, TypeError, ValueError, OverflowError, OSError):
+        return JsonResponse({'success': False, 'error': 'Неверные данные'}, status=400)
+    
+    with transaction.atomic():
+        execution = get_object_or_404(
+            VariantExecution.objects.select_for_update(), id=execution_id, student=request.user
+        )
+        if execution.status in ['completed', 'timeout']:
+            return JsonResponse({
+                'success': False,
+                'completed': True,
+                'error': 'Вариант уже завершен',
+                'acked_seq': (execution.client_seqs or {}).get(client_id, 0),
+                'result_url': reverse('variants:variant_result', args=[execution.id]),
+            })
+        acked_seq = execution.apply_client_ops(client_id, ops)
+        execution.save_progress()
+        execution.refresh_progress_stats()
+    
+    return JsonResponse({'success': True, 'acked_seq': acked_seq})
+
+
 # Новые функции для назначений
 
 @login_required
@@ -655,19 +799,16 @@ def assign_variant_to_student(request):
             variant = form.cleaned_data['variant']
             student = form.cleaned_data['student']
             deadline = form.cleaned_data.get('deadline')
+            opens_at = form.cleaned_data.get('opens_at')
             
-            # Всегда создаем новое назначение, даже если оно уже существует
-            from django.utils import timezone
-            assignment = VariantAssignment.objects.create(
-                variant=variant,
-                student=student,
-                assigned_by=request.user,
-                deadline=deadline,
-                is_active=True,
-                assigned_at=timezone.now()
+            created_count, reused_count, revoked_count = assign_variants(
+                [student], [variant], request.user, deadline, opens_at, form.cleaned_data['mode']
             )
             
-            messages.success(request, f'Вариант "{variant.name}" успешно назначен ученику {student.get_full_name()}')
+            if created_count:
+                messages.success(request, f'Вариант "{variant.name}" успешно назначен ученику {student.get_full_name()}')
+            else:
+                messages.info(request, f'Вариант "{variant.name}" уже назначен ученику {student.get_full_name()}')
             
             return redirect('variants:variant_list')
     else:
@@ -689,6 +830,7 @@ def assign_variants_to_group(request):
             group = form.cleaned_data['group']
             variants = form.cleaned_data['variants']
             deadline = form.cleaned_data.get('deadline')
+            opens_at = form.cleaned_data.get('opens_at')
             
             # Получаем всех учеников группы
             students = group.students.all()
@@ -697,39 +839,17 @@ def assign_variants_to_group(request):
                 messages.error(request, 'В группе нет учеников')
                 return render(request, 'variants/assign_variants_to_group.html', {'form': form})
             
-            # Распределяем варианты между учениками
-            variants_list = list(variants)
-            students_list = list(students)
-            
-            created_count = 0
-            
-            from django.utils import timezone
-            import random
-            # Перемешиваем список вариантов для случайного распределения
-            shuffled_variants = variants_list.copy()
-            random.shuffle(shuffled_variants)
-            
-            for i, student in enumerate(students_list):
-                # Выбираем вариант для ученика (распределение по кругу с перемешанными вариантами)
-                variant = shuffled_variants[i % len(shuffled_variants)]
-                
-                # Всегда создаем новое назначение, даже если оно уже существует
-                VariantAssignment.objects.create(
-                    variant=variant,
-                    student=student,
-                    assigned_by=request.user,
-                    deadline=deadline,
-                    is_active=True,
-                    assigned_at=timezone.now()
-                )
-                created_count += 1
-            
-            messages.success(
-                request,
-                f'Варианты успешно назначены группе "{group.name}". '
-                f'Создано назначений: {created_count}'
+            created_count, reused_count, revoked_count = assign_variants(
+                students, variants, request.user, deadline, opens_at, form.cleaned_data['mode']
             )
             
+            message = f'Варианты успешно назначены группе "{group.name}". Создано назначений: {created_count}'
+            if reused_count:
+                message += f', уже были назначены: {reused_count}'
+            if revoked_count:
+                message += f', отозвано прежних: {revoked_count}'
+            messages.success(request, message)
+            
             return redirect('variants:variant_list')
     else:
         form = AssignVariantsToGroupForm(user=request.user)
@@ -737,6 +857,39 @@ def assign_variants_to_group(request):
     return render(request, 'variants/assign_variants_to_group.html', {'form': form})
 
 
+@login_required
+def overdue_assignments(request):
+    """Просроченные незавершенные назначения учителя"""
+    if request.user.role not in ['admin', 'teacher']:
+        messages.error(request, 'У вас нет прав для просмотра назначений')
+        return redirect('dashboard')
+    
+    paginator = Paginator(get_overdue_assignments(request.user), 50)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    return render(request, 'variants/overdue_assignments.html', {'assignments': page_obj})
+
+
+@login_required
+def revoke_variants_from_group(request):
+    """Отзыв назначений вариантов у учеников группы"""
+    if request.user.role not in ['admin', 'teacher']:
+        messages.error(request, 'У вас нет прав для назначения вариантов')
+        return redirect('dashboard')
+    
+    if request.method == 'POST':
+        form = RevokeVariantsFromGroupForm(request.POST, user=request.user)
+        if form.is_valid():
+            group = form.cleaned_data['group']
+            revoked_count = revoke_assignments(group.students.all(), form.cleaned_data['variants'])
+            messages.success(request, f'У группы "{group.name}" отозвано назначений: {revoked_count}')
+            return redirect('variants:variant_list')
+    else:
+        form = RevokeVariantsFromGroupForm(user=request.user)
+    
+    return render(request, 'variants/revoke_variants_from_group.html', {'form': form})
+
+
 @login_required
 def variant_start_by_number(request):
     """Начать выполнение варианта по номеру"""
@@ -795,6 +948,9 @@ def variant_start_by_number(request):
                 return redirect('variants:variant_result', execution_id=execution.id)
             
             if execution.status == 'not_started':
+                if assignment and not assignment.is_open():
+                    messages.error(request, get_not_open_message(assignment))
+                    return render(request, 'variants/variant_start_by_number.html', {'form': form})
                 execution.start()
             
             return redirect('variants:variant_execute', execution_id=execution.id)
@@ -824,104 +980,38 @@ def variant_statistics(request, variant_id):
     # Выбранная группа
     selected_group_id = request.GET.get('group')
     selected_group = None
-    students = []
     
     if selected_group_id:
         try:
             selected_group = groups.get(id=selected_group_id)
-            # Если группа выбрана, показываем всех учеников группы
-            students = selected_group.students.all().order_by('last_name', 'first_name')
-        except Group.DoesNotExist:
+        except (Group.DoesNotExist, ValueError):
             pass
+    
+    sort = request.GET.get('sort', 'name')
+    if sort not in STATISTICS_SORT_ORDERS:
+        sort = 'name'
+
+    # Курсор для ленты изменений берется до чтения сводок, чтобы не пропустить
+    # изменения, сделанные во время рендеринга страницы
+    feed_cursor = get_stats_version(variant.id)
+
+    # Сводки учеников поддерживаются при изменении выполнений
+    # (см. VariantStudentStats), поэтому страница только читает их
+    if selected_group:
+        # Если группа выбрана, показываем всех учеников группы, в том числе не начинавших
+        stats = get_group_stats(variant, selected_group, STATISTICS_SORT_ORDERS[sort])
     else:
-        # Если группа не выбрана, показываем всех, кто выполнял или выполняет вариант
-        executions = VariantExecution.objects.filter(variant=variant).select_related('student')
-        student_ids = executions.values_list('student_id', flat=True).distinct()
-        from users.models import User
-        students = User.objects.filter(id__in=student_ids, role='student').order_by('last_name', 'first_name')
-    
-    # Получаем статистику для каждого ученика
-    students_statistics = []
-    tasks = variant.variant_tasks.select_related('task').order_by('order')
+        stats = get_stats_queryset(variant).order_by(*STATISTICS_SORT_ORDERS[sort])
     
-    for student in students:
-        # Получаем последнее выполнение для ученика (если их несколько)
-        execution = VariantExecution.objects.filter(
-            variant=variant,
-            student=student
-        ).order_by('-started_at', '-id').first()
-        
-        # Получаем статус каждого задания
-        task_statuses = []
-        current_task = None
-        remaining_time = None
-        
-        elapsed_time_formatted = None
-        if execution:
-            if execution.status == 'in_progress':
-                current_task = execution.get_current_task()
-            # Вычисляем оставшееся время для всех статусов, если есть ограничение по времени
-            if variant.time_limit_minutes:
-                remaining_time = execution.get_remaining_time()
-            
-            # Вычисляем время выполнения для завершенных вариантов типа "контроль"
-            if variant.variant_type == 'control' and execution.status in ['completed', 'timeout']:
-                elapsed = execution.get_elapsed_time()
-                if elapsed:
-                    total_seconds = int(elapsed.total_seconds())
-                    hours = total_seconds // 3600
-                    minutes = (total_seconds % 3600) // 60
-                    seconds = total_seconds % 60
-                    
-                    time_parts = []
-                    if hours > 0:
-                        time_parts.append(f"{hours}ч")
-                    if minutes > 0:
-                        time_parts.append(f"{minutes}м")
-                    time_parts.append(f"{seconds}с")
-                    
-                    elapsed_time_formatted = " ".join(time_parts)
-            
-            for variant_task in tasks:
-                task_id = str(variant_task.task.id)
-                user_answer = execution.answers.get(task_id, '')
-                
-                # Определяем статус задания
-                if not user_answer or user_answer.strip() == '':
-                    # Если вариант завершен, но ответ пустой - это не начато (ученик видел задание, но не ответил)
-                    # Если вариант в процессе и ответ пустой - это тоже не начато
-                    status = 'not_started'
-                else:
-                    # Есть ответ - проверяем правильность
-                    is_correct = user_answer.strip() == variant_task.task.correct_answer.strip()
-                    status = 'correct' if is_correct else 'incorrect'
-                
-                task_statuses.append({
-                    'order': variant_task.order,
-                    'status': status,
-                })
-        else:
-            # Если выполнение не начато, все задания не начаты
-            for variant_task in tasks:
-                task_statuses.append({
-                    'order': variant_task.order,
-                    'status': 'not_started',
-                })
-        
-        # Подсчитываем правильные ответы
-        correct_count = sum(1 for ts in task_statuses if ts['status'] == 'correct')
-        total_count = len(task_statuses)
-        
-        students_statistics.append({
-            'student': student,
-            'execution': execution,
-            'task_statuses': task_statuses,
-            'current_task': current_task,
-            'remaining_time': remaining_time,
-            'elapsed_time_formatted': elapsed_time_formatted,
-            'correct_count': correct_count,
-            'total_count': total_count,
-        })
+    paginator = Paginator(stats, STATISTICS_PAGE_SIZE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    tasks = list(variant.variant_tasks.order_by('order').values_list('order', flat=True))
+    students_statistics = [serialize_stats(stat, variant, len(tasks)) for stat in page_obj]
+    
+    feed_url = reverse('variants:variant_statistics_feed', args=[variant.id])
+    if selected_group:
+        feed_url += f'?group={selected_group.id}'
     
     context = {
         'variant': variant,
@@ -929,6 +1019,176 @@ def variant_statistics(request, variant_id):
         'selected_group': selected_group,
         'students_statistics': students_statistics,
         'tasks': tasks,
+        'page_obj': page_obj,
+        'sort': sort,
+        'feed_url': feed_url,
+        'feed_cursor': format_cursor(feed_cursor),
+        # SSE держит соединение открытым, поэтому используется только под ASGI
+        'feed_mode': 'sse' if isinstance(request, ASGIRequest) else 'poll',
     }
     
     return render(request, 'variants/variant_statistics.html', context)
+
+
+@login_required
+def variant_item_analysis(request, variant_id):
+    """Анализ заданий варианта: решаемость, различающая способность, частые ошибки"""
+    variant = get_object_or_404(Variant, id=variant_id)
+    
+    if request.user.role not in ['admin', 'teacher']:
+        messages.error(request, 'У вас нет прав для просмотра статистики')
+        return redirect('dashboard')
+    
+    if variant.created_by != request.user:
+        messages.error(request, 'У вас нет прав для просмотра статистики этого варианта')
+        return redirect('variants:variant_list')
+    
+    # Статистику заданий обновляет команда refresh_item_analysis по расписанию
+    context = {
+        'variant': variant,
+        'items': get_item_analysis(variant),
+        'refreshed_at': get_refreshed_at(ITEM_ANALYSIS_WATERMARK),
+    }
+    
+    return render(request, 'variants/variant_item_analysis.html', context)
+
+
+@login_required
+def student_mastery(request, student_id):
+    """Профиль освоения типов заданий учеником"""
+    student = get_object_or_404(User, id=student_id, role='student')
+    
+    # Профиль доступен самому ученику, его учителю и администратору
+    if request.user != student and not (
+        request.user.can_manage_user(student) or
+        (request.user.role == 'teacher' and student.student_groups.filter(created_by=request.user).exists())
+    ):
+        messages.error(request, 'У вас нет прав для просмотра профиля этого ученика')
+        return redirect('dashboard')
+    
+    context = {
+        'student': student,
+        'mastery_list': get_student_mastery(student),
+    }
+    
+    return render(request, 'variants/student_mastery.html', context)
+
+
+@login_required
+def group_mastery(request, group_id):
+    """Тепловая карта освоения типов заданий учениками группы"""
+    if request.user.role not in ['admin', 'teacher']:
+        messages.error(request, 'У вас нет прав для просмотра групп')
+        return redirect('dashboard')
+    
+    group = get_object_or_404(Group, id=group_id, created_by=request.user)
+    task_types, rows = get_group_heatmap(group)
+    
+    context = {
+        'group': group,
+        'task_types': task_types,
+        'rows': rows,
+    }
+    
+    return render(request, 'variants/group_mastery.html', context)
+
+
+@login_required
+def group_gradebook_export(request, group_id):
+    """Выгрузка журнала оценок группы (CSV или XLSX)"""
+    if request.user.role not in ['admin', 'teacher']:
+        messages.error(request, 'У вас нет прав для просмотра групп')
+        return redirect('dashboard')
+    
+    group = get_object_or_404(Group, id=group_id, created_by=request.user)
+    filename = f'gradebook_group_{group.id}_{timezone.localdate():%Y%m%d}'
+    
+    if request.GET.get('format') == 'xlsx':
+        if gradebook.openpyxl is None:
+            messages.error(request, 'Выгрузка в XLSX недоступна: не установлен пакет openpyxl')
+            return redirect('group_detail', group_id=group.id)
+        return FileResponse(
+            gradebook.build_gradebook_xlsx(group, request.user),
+            as_attachment=True,
+            filename=f'{filename}.xlsx',
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    
+    response = StreamingHttpResponse(
+        gradebook.stream_gradebook_csv(group, request.user),
+        content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+@login_required
+def teacher_analytics(request):
+    """Аналитика учителя за период по дневным итогам"""
+    if request.user.role not in ['admin', 'teacher']:
+        messages.error(request, 'У вас нет прав для просмотра аналитики')
+        return redirect('dashboard')
+    
+    form = AnalyticsPeriodForm(request.GET or None, user=request.user)
+    group = None
+    date_to = timezone.localdate()
+    date_from = date_to - timedelta(days=ANALYTICS_DEFAULT_PERIOD_DAYS - 1)
+    if form.is_valid():
+        group = form.cleaned_data['group']
+        date_from = form.cleaned_data['date_from'] or date_from
+        date_to = form.cleaned_data['date_to'] or date_to
+    
+    # Итоги обновляет команда refresh_rollups по расписанию
+    by_type, by_day = get_rollup_report(request.user, date_from, date_to, group)
+    
+    context = {
+        'form': form,
+        'group': group,
+        'date_from': date_from,
+        'date_to': date_to,
+        'by_type': by_type,
+        'by_day': by_day,
+        'refreshed_at': get_refreshed_at(ROLLUPS_WATERMARK),
+    }
+    
+    return render(request, 'variants/teacher_analytics.html', context)
+
+
+@login_required
+def variant_statistics_feed(request, variant_id):
+    """Лента изменений статистики варианта (SSE под ASGI, иначе long-poll)"""
+    variant = get_object_or_404(Variant, id=variant_id)
+    
+    if request.user.role not in ['admin', 'teacher'] or variant.created_by != request.user:
+        return JsonResponse({'success': False, 'error': 'Нет прав для просмотра статистики'}, status=403)
+    
+    selected_group = None
+    selected_group_id = request.GET.get('group')
+    if selected_group_id:
+        try:
+            selected_group = Group.objects.get(id=selected_group_id, created_by=request.user)
+        except (Group.DoesNotExist, ValueError):
+            return JsonResponse({'success': False, 'error': 'Группа не найдена'}, status=404)
+    
+    since = parse_cursor(request.headers.get('Last-Event-ID') or request.GET.get('since'))
+    if since is None:
+        return JsonResponse({'success': False, 'error': 'Неверный курсор'}, status=400)
+    
+    if isinstance(request, ASGIRequest) and 'text/event-stream' in request.headers.get('Accept', ''):
+        response = StreamingHttpResponse(
+            stream_stats_events(variant, selected_group, since),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    with long_poll_waiters.admit() as admitted:
+        # Без свободного места ожидания отвечаем сразу, клиент повторит запрос позже
+        changes, cursor = wait_for_stats_changes(variant, selected_group, since, None if admitted else 0)
+    payload = {'success': True, 'cursor': format_cursor(cursor), 'changes': changes}
+    if not admitted:
+        payload['retry_after'] = LONG_POLL_BUSY_RETRY_AFTER
+    response = JsonResponse(payload)
+    add_never_cache_headers(response)
+    return response